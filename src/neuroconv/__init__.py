@@ -1,4 +1,32 @@
+from importlib import import_module
+
 from .nwbconverter import NWBConverter
-from .datainterfaces import *
-from .tools import spikeinterface, roiextractors, neo
-from .tools.yaml_conversion_specification import run_conversion_from_yaml
+from .datainterfaces import _interface_modules
+
+# The data interfaces and tools pull in heavy readers (spikeinterface, roiextractors, neo, dandi, ...), so they are
+# only imported on first access
+_lazy_attributes = dict(
+    {interface_name: ".datainterfaces" for interface_name in _interface_modules},
+    interface_list=".datainterfaces",
+    run_conversion_from_yaml=".tools.yaml_conversion_specification",
+)
+_lazy_submodules = dict(
+    spikeinterface=".tools.spikeinterface.spikeinterface",
+    roiextractors=".tools.roiextractors.roiextractors",
+    neo=".tools.neo.neo",
+)
+
+
+def __getattr__(name: str):
+    if name in _lazy_attributes:
+        attribute = getattr(import_module(_lazy_attributes[name], package=__name__), name)
+    elif name in _lazy_submodules:
+        attribute = import_module(_lazy_submodules[name], package=__name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = attribute
+    return attribute
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_attributes) | set(_lazy_submodules))
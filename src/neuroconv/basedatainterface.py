@@ -6,17 +6,26 @@ from typing import Optional
 from pynwb import NWBFile
 
 from .utils import get_base_schema, get_schema_from_method_signature
+from .utils.caching import CachedMetadataMixin, cache_method
 
 
-class BaseDataInterface(ABC):
-    """Abstract class defining the structure of all DataInterfaces."""
+class BaseDataInterface(CachedMetadataMixin, ABC):
+    """
+    Abstract class defining the structure of all DataInterfaces.
+
+    The schemas are cached per class and the metadata and metadata schema per instance, including any overrides of
+    these methods in child classes, so that the source files are only read once. Each call returns a copy of the
+    cached value. Call `clear_cache` to recompute them, for instance after changing the source data.
+    """
 
     @classmethod
+    @cache_method
     def get_source_schema(cls):
         """Infer the JSON schema for the source_data from the method signature (annotation typing)."""
         return get_schema_from_method_signature(cls.__init__, exclude=["source_data"])
 
     @classmethod
+    @cache_method
     def get_conversion_options_schema(cls):
         """Infer the JSON schema for the conversion options from the method signature (annotation typing)."""
         return get_schema_from_method_signature(cls.run_conversion, exclude=["nwbfile", "metadata"])
@@ -24,6 +33,7 @@ class BaseDataInterface(ABC):
     def __init__(self, **source_data):
         self.source_data = source_data
 
+    @cache_method
     def get_metadata_schema(self):
         """Retrieve JSON schema for metadata."""
         metadata_schema = get_base_schema(
@@ -35,6 +45,7 @@ class BaseDataInterface(ABC):
         )
         return metadata_schema
 
+    @cache_method
     def get_metadata(self):
         """Child DataInterface classes should override this to match their metadata."""
 
@@ -1,94 +1,62 @@
-from .ecephys.tutorial.recordingtutorialdatainterface import RecordingTutorialInterface
-from .ecephys.tutorial.sortingtutorialdatainterface import SortingTutorialInterface
-from .ecephys.neuroscope.neuroscopedatainterface import (
-    NeuroscopeRecordingInterface,
-    NeuroscopeLFPInterface,
-    NeuroscopeMultiRecordingTimeInterface,
-    NeuroscopeSortingInterface,
-)
-from .ecephys.spikeglx.spikeglxdatainterface import SpikeGLXRecordingInterface, SpikeGLXLFPInterface
-from .ecephys.spikegadgets.spikegadgetsdatainterface import SpikeGadgetsRecordingInterface
-from .ecephys.spikeinterface.sipickledatainterfaces import (
-    SIPickleRecordingExtractorInterface,
-    SIPickleSortingExtractorInterface,
-)
-from .ecephys.intan.intandatainterface import IntanRecordingInterface
-from .ecephys.ced.ceddatainterface import CEDRecordingInterface
-from .ecephys.cellexplorer.cellexplorerdatainterface import CellExplorerSortingInterface
-from .ecephys.blackrock.blackrockdatainterface import (
-    BlackrockRecordingExtractorInterface,
-    BlackrockSortingExtractorInterface,
-)
-from .ecephys.openephys.openephysdatainterface import (
-    OpenEphysRecordingExtractorInterface,
-    OpenEphysSortingExtractorInterface,
-)
-from .ecephys.axona.axonadatainterface import (
-    AxonaRecordingExtractorInterface,
-    AxonaPositionDataInterface,
-    AxonaLFPDataInterface,
-    AxonaUnitRecordingExtractorInterface,
-)
-from .ecephys.neuralynx.neuralynxdatainterface import NeuralynxRecordingInterface, NeuralynxSortingInterface
-from .ecephys.phy.phydatainterface import PhySortingInterface
-from .ecephys.kilosort.kilosortdatainterface import KilosortSortingInterface
-from .ecephys.edf.edfdatainterface import EDFRecordingInterface
+"""Data interfaces are imported on first access, so only the readers of the interfaces in use are loaded."""
+from importlib import import_module
 
-from .ophys.caiman.caimandatainterface import CaimanSegmentationInterface
-from .ophys.cnmfe.cnmfedatainterface import CnmfeSegmentationInterface
-from .ophys.suite2p.suite2pdatainterface import Suite2pSegmentationInterface
-from .ophys.extract.extractdatainterface import ExtractSegmentationInterface
-from .ophys.sima.simadatainterface import SimaSegmentationInterface
+# Maps the name of each data interface to the module defining it, in the order of `interface_list`
+_interface_modules = dict(
+    RecordingTutorialInterface=".ecephys.tutorial.recordingtutorialdatainterface",
+    SortingTutorialInterface=".ecephys.tutorial.sortingtutorialdatainterface",
+    NeuralynxRecordingInterface=".ecephys.neuralynx.neuralynxdatainterface",
+    NeuralynxSortingInterface=".ecephys.neuralynx.neuralynxdatainterface",
+    NeuroscopeRecordingInterface=".ecephys.neuroscope.neuroscopedatainterface",
+    NeuroscopeMultiRecordingTimeInterface=".ecephys.neuroscope.neuroscopedatainterface",
+    NeuroscopeSortingInterface=".ecephys.neuroscope.neuroscopedatainterface",
+    NeuroscopeLFPInterface=".ecephys.neuroscope.neuroscopedatainterface",
+    SpikeGLXRecordingInterface=".ecephys.spikeglx.spikeglxdatainterface",
+    SpikeGLXLFPInterface=".ecephys.spikeglx.spikeglxdatainterface",
+    SpikeGadgetsRecordingInterface=".ecephys.spikegadgets.spikegadgetsdatainterface",
+    SIPickleRecordingExtractorInterface=".ecephys.spikeinterface.sipickledatainterfaces",
+    SIPickleSortingExtractorInterface=".ecephys.spikeinterface.sipickledatainterfaces",
+    IntanRecordingInterface=".ecephys.intan.intandatainterface",
+    CEDRecordingInterface=".ecephys.ced.ceddatainterface",
+    CellExplorerSortingInterface=".ecephys.cellexplorer.cellexplorerdatainterface",
+    BlackrockRecordingExtractorInterface=".ecephys.blackrock.blackrockdatainterface",
+    BlackrockSortingExtractorInterface=".ecephys.blackrock.blackrockdatainterface",
+    OpenEphysRecordingExtractorInterface=".ecephys.openephys.openephysdatainterface",
+    OpenEphysSortingExtractorInterface=".ecephys.openephys.openephysdatainterface",
+    PhySortingInterface=".ecephys.phy.phydatainterface",
+    KilosortSortingInterface=".ecephys.kilosort.kilosortdatainterface",
+    AxonaRecordingExtractorInterface=".ecephys.axona.axonadatainterface",
+    AxonaPositionDataInterface=".ecephys.axona.axonadatainterface",
+    AxonaLFPDataInterface=".ecephys.axona.axonadatainterface",
+    AxonaUnitRecordingExtractorInterface=".ecephys.axona.axonadatainterface",
+    CaimanSegmentationInterface=".ophys.caiman.caimandatainterface",
+    CnmfeSegmentationInterface=".ophys.cnmfe.cnmfedatainterface",
+    Suite2pSegmentationInterface=".ophys.suite2p.suite2pdatainterface",
+    ExtractSegmentationInterface=".ophys.extract.extractdatainterface",
+    SimaSegmentationInterface=".ophys.sima.simadatainterface",
+    SbxImagingInterface=".ophys.sbx.sbxdatainterface",
+    TiffImagingInterface=".ophys.tiff.tiffdatainterface",
+    Hdf5ImagingInterface=".ophys.hdf5.hdf5datainterface",
+    MovieInterface=".behavior.movie.moviedatainterface",
+    DeepLabCutInterface=".behavior.deeplabcut.deeplabcutdatainterface",
+    AbfInterface=".icephys.abf.abfdatainterface",
+    ScanImageImagingInterface=".ophys.scanimage.scanimageimaginginterface",
+    EDFRecordingInterface=".ecephys.edf.edfdatainterface",
+)
 
-from .ophys.sbx.sbxdatainterface import SbxImagingInterface
-from .ophys.tiff.tiffdatainterface import TiffImagingInterface
-from .ophys.hdf5.hdf5datainterface import Hdf5ImagingInterface
-from .ophys.scanimage.scanimageimaginginterface import ScanImageImagingInterface
+__all__ = list(_interface_modules) + ["interface_list"]
 
-from .behavior.movie.moviedatainterface import MovieInterface
-from .behavior.deeplabcut.deeplabcutdatainterface import DeepLabCutInterface
 
-from .icephys.abf.abfdatainterface import AbfInterface
+def __getattr__(name: str):
+    if name in _interface_modules:
+        data_interface = getattr(import_module(_interface_modules[name], package=__name__), name)
+        globals()[name] = data_interface
+        return data_interface
+    if name == "interface_list":
+        globals()[name] = [__getattr__(interface_name) for interface_name in _interface_modules]
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
-interface_list = [
-    RecordingTutorialInterface,
-    SortingTutorialInterface,
-    NeuralynxRecordingInterface,
-    NeuralynxSortingInterface,
-    NeuroscopeRecordingInterface,
-    NeuroscopeMultiRecordingTimeInterface,
-    NeuroscopeSortingInterface,
-    NeuroscopeLFPInterface,
-    SpikeGLXRecordingInterface,
-    SpikeGLXLFPInterface,
-    SpikeGadgetsRecordingInterface,
-    SIPickleRecordingExtractorInterface,
-    SIPickleSortingExtractorInterface,
-    IntanRecordingInterface,
-    CEDRecordingInterface,
-    CellExplorerSortingInterface,
-    BlackrockRecordingExtractorInterface,
-    BlackrockSortingExtractorInterface,
-    OpenEphysRecordingExtractorInterface,
-    OpenEphysSortingExtractorInterface,
-    PhySortingInterface,
-    KilosortSortingInterface,
-    AxonaRecordingExtractorInterface,
-    AxonaPositionDataInterface,
-    AxonaLFPDataInterface,
-    AxonaUnitRecordingExtractorInterface,
-    CaimanSegmentationInterface,
-    CnmfeSegmentationInterface,
-    Suite2pSegmentationInterface,
-    ExtractSegmentationInterface,
-    SimaSegmentationInterface,
-    SbxImagingInterface,
-    TiffImagingInterface,
-    Hdf5ImagingInterface,
-    MovieInterface,
-    DeepLabCutInterface,
-    AbfInterface,
-    ScanImageImagingInterface,
-    EDFRecordingInterface,
-]
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
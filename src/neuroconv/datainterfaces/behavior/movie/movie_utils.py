@@ -1,10 +1,15 @@
 """Authors: Saksham Sharda, Cody Baker."""
-from typing import Tuple, Iterable
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from threading import local
+from typing import Tuple, Iterable, Optional
 
 import numpy as np
 from tqdm import tqdm
-from hdmf.data_utils import GenericDataChunkIterator
 
+from ....tools.hdmf import GenericDataChunkIterator
 from ....utils import FilePathType
 
 
@@ -16,6 +21,106 @@ except ImportError:
     HAVE_OPENCV = False
 INSTALL_MESSAGE = "Please install opencv to use the VideoCaptureContext class! (pip install opencv-python)"
 
+try:
+    import av
+
+    HAVE_PYAV = True
+except ImportError:
+    HAVE_PYAV = False
+
+
+def get_timestamps_cache_file_path(file_path: FilePathType) -> Path:
+    """The location of the sidecar file caching the timestamps of the movie at 'file_path'."""
+    file_path = Path(file_path)
+    return file_path.with_name(f".{file_path.name}.timestamps.json")
+
+
+def _get_file_signature(file_path: FilePathType) -> dict:
+    """Identify the current version of a file by its size and modification time."""
+    file_stat = Path(file_path).stat()
+    return dict(file_size=file_stat.st_size, file_mtime_ns=file_stat.st_mtime_ns)
+
+
+def _get_container_index(file_path: FilePathType) -> Optional[dict]:
+    """
+    Read the presentation time of every frame, and which are keyframes, from the packet index of the container.
+
+    No frame is decoded. Returns None if PyAV is not installed, or if any packet of the video stream lacks a
+    presentation time.
+
+    Returns
+    -------
+    container_index : dict
+        'timestamps' holds the presentation times in seconds relative to the start of the video stream, as reported by
+        OpenCV (CAP_PROP_POS_MSEC), and 'keyframe_indices' the frame numbers of the keyframes in presentation order.
+    """
+    if not HAVE_PYAV:
+        return None
+    with av.open(str(file_path)) as container:
+        stream = container.streams.video[0]
+        presentation_times = []
+        keyframe_flags = []
+        for packet in container.demux(stream):
+            if packet.size == 0:  # the empty packet flushing the decoder
+                continue
+            if packet.pts is None:
+                return None
+            presentation_times.append(packet.pts)
+            keyframe_flags.append(packet.is_keyframe)
+        start_time = min(presentation_times, default=0) if stream.start_time is None else stream.start_time
+        time_base = float(stream.time_base)
+
+    # Packets are stored in decoding order, which differs from the presentation order for bidirectional frames
+    presentation_order = np.argsort(presentation_times, kind="stable")
+    frame_numbers = np.empty(shape=len(presentation_order), dtype="int64")
+    frame_numbers[presentation_order] = np.arange(len(presentation_order))
+    return dict(
+        timestamps=(np.array(presentation_times, dtype="int64")[presentation_order] - start_time) * time_base,
+        keyframe_indices=np.sort(frame_numbers[np.array(keyframe_flags, dtype=bool)]),
+    )
+
+
+def _read_frame_range(
+    video_capture_ob: "VideoCaptureContext",
+    frame_range: Tuple[int, int],
+    frame_shape: tuple,
+    dtype: np.dtype,
+    keyframe_indices: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Decode a range of frames into a new array; frames past the end of a truncated movie are left as zeros."""
+    start_frame, end_frame = frame_range
+    if video_capture_ob.current_frame != start_frame:
+        video_capture_ob.seek_frame(frame_number=start_frame, keyframe_indices=keyframe_indices)
+    frames = np.empty(shape=(end_frame - start_frame, *frame_shape), dtype=dtype)
+    number_of_frames_read = video_capture_ob.read_frames(frames=frames)
+    frames[number_of_frames_read:] = 0
+    return frames
+
+
+_worker_state = local()
+_movie_properties_cache = dict()
+
+
+def _read_frame_range_in_worker(
+    file_path: str,
+    frame_range: Tuple[int, int],
+    frame_shape: tuple,
+    dtype: np.dtype,
+    keyframe_indices: Optional[np.ndarray],
+) -> np.ndarray:
+    """Decode a range of frames on a worker thread or process, reusing the movie it opened for previous ranges."""
+    if not hasattr(_worker_state, "video_captures"):
+        _worker_state.video_captures = dict()
+    if file_path not in _worker_state.video_captures:
+        _worker_state.video_captures[file_path] = VideoCaptureContext(file_path=file_path)
+    return _read_frame_range(
+        video_capture_ob=_worker_state.video_captures[file_path],
+        frame_range=frame_range,
+        frame_shape=frame_shape,
+        dtype=dtype,
+        keyframe_indices=keyframe_indices,
+    )
+
 
 class VideoCaptureContext:
     """Retrieving video metadata and frames using a context manager."""
@@ -26,29 +131,141 @@ class VideoCaptureContext:
         self.file_path = file_path
         self._current_frame = 0
         self._frame_count = None
+        self._bgr_frame = None
+        self._movie_properties = None
         self._movie_open_msg = "The Movie file is not open!"
 
-    def get_movie_timestamps(self):
-        """Return numpy array of the timestamps(s) for a movie file."""
+    def get_movie_timestamps(self, use_cache: bool = True):
+        """
+        Return numpy array of the timestamps(s) for a movie file.
+
+        The presentation times are read from the packet index of the container if PyAV is installed (pip install av),
+        and otherwise by grabbing every frame. The timestamps of the full movie are cached in a hidden sidecar file
+        next to it (see get_timestamps_cache_file_path), which is reused as long as the size and modification time
+        of the movie are unchanged. If the folder is not writable, the timestamps are simply not cached.
+
+        Parameters
+        ----------
+        use_cache : bool, optional
+            Whether to read and write the sidecar file. The default is True.
+        """
+        frame_count = self.get_movie_frame_count()
+        return np.array(self._get_movie_index(use_cache=use_cache)["timestamps"][:frame_count])
+
+    def get_keyframe_indices(self, use_cache: bool = True) -> Optional[np.ndarray]:
+        """
+        Return the frame numbers of the keyframes of a movie file, from which decoding can start.
+
+        They are read from the packet index of the container, and cached along with the timestamps (see
+        get_movie_timestamps). Returns None if PyAV is not installed and they were not cached before.
+        """
+        movie_index = self._get_movie_index(use_cache=use_cache, decode=False)
+        if movie_index is None or movie_index["keyframe_indices"] is None:
+            return None
+        return np.array(movie_index["keyframe_indices"], dtype="int64")
+
+    def _get_movie_index(self, use_cache: bool = True, decode: bool = True) -> Optional[dict]:
+        """
+        The 'timestamps' and 'keyframe_indices' of the movie, from the sidecar file or the container if possible.
+
+        Otherwise, and only if 'decode', the timestamps are found by grabbing the frames, and the keyframes are unknown.
+        """
+        cache_file_path = get_timestamps_cache_file_path(file_path=self.file_path)
+        file_signature = _get_file_signature(file_path=self.file_path)
+        if use_cache and cache_file_path.is_file():
+            with open(file=cache_file_path, mode="r") as file:
+                cache = json.load(file)
+            if all(cache.get(key) == value for key, value in file_signature.items()):
+                return cache
+
+        try:
+            movie_index = _get_container_index(file_path=self.file_path)
+        except OSError:  # PyAV cannot demux the container, but OpenCV may still decode it
+            movie_index = None
+        if movie_index is None:
+            if not decode:
+                return None
+            frame_count = self.get_movie_frame_count()
+            movie_index = dict(timestamps=self._get_decoded_timestamps(frame_count=frame_count), keyframe_indices=None)
+            if frame_count < self._movie_frame_count():  # only the full movie is worth caching
+                return movie_index
+        if use_cache:
+            try:
+                with open(file=cache_file_path, mode="w") as file:
+                    json.dump(
+                        dict(
+                            file_signature,
+                            timestamps=movie_index["timestamps"].tolist(),
+                            keyframe_indices=None
+                            if movie_index["keyframe_indices"] is None
+                            else movie_index["keyframe_indices"].tolist(),
+                        ),
+                        file,
+                    )
+            except OSError:
+                pass
+        return movie_index
+
+    def _get_decoded_timestamps(self, frame_count: int) -> np.ndarray:
+        """Grab (without converting to RGB) the frames one by one to query their timestamps."""
+        initial_frame_number = self.current_frame
+        self.current_frame = 0
         timestamps = []
-        for _ in tqdm(range(self.get_movie_frame_count()), desc="retrieving timestamps"):
-            success, _ = self.vc.read()
+        for _ in tqdm(range(frame_count), desc="retrieving timestamps"):
+            success = self.vc.grab()
             if not success:
                 break
             timestamps.append(self.vc.get(cv2.CAP_PROP_POS_MSEC))
+        self.current_frame = initial_frame_number
         return np.array(timestamps) / 1000
 
+    def get_movie_properties(self) -> dict:
+        """
+        Return the properties of a movie file, probed once for every version of the file in this process.
+
+        The probe reads the container properties and decodes the first frame a single time; every VideoCaptureContext,
+        MovieDataChunkIterator, and MovieInterface of the same file shares the result until its size or modification
+        time changes.
+
+        Returns
+        -------
+        movie_properties : dict
+            The 'frame_shape' and 'dtype' of the first frame (None if it cannot be decoded), the 'fps', the
+            'frame_count' reported by the container, and the 'codec' as a FourCC string.
+        """
+        assert self.isOpened(), self._movie_open_msg
+        if self._movie_properties is None:
+            cache_key = (str(Path(self.file_path).resolve()), *_get_file_signature(file_path=self.file_path).values())
+            if cache_key not in _movie_properties_cache:
+                _movie_properties_cache[cache_key] = self._probe_movie_properties()
+            self._movie_properties = _movie_properties_cache[cache_key]
+        return self._movie_properties
+
+    def _probe_movie_properties(self) -> dict:
+        initial_frame_number = self.current_frame
+        self.current_frame = 0
+        success, frame = self.vc.read()
+        self.current_frame = initial_frame_number
+        fourcc = int(self.vc.get(self.get_cv_attribute("CAP_PROP_FOURCC")))
+        return dict(
+            frame_shape=frame.shape if success else None,
+            dtype=frame.dtype if success else None,
+            fps=self.vc.get(self.get_cv_attribute("CAP_PROP_FPS")),
+            frame_count=int(self.vc.get(self.get_cv_attribute("CAP_PROP_FRAME_COUNT"))),
+            codec="".join(chr((fourcc >> 8 * byte) & 0xFF) for byte in range(4)),
+        )
+
     def get_movie_fps(self):
         """Return the internal frames per second (fps) for a movie file."""
-        assert self.isOpened(), self._movie_open_msg
-        prop = self.get_cv_attribute("CAP_PROP_FPS")
-        return self.vc.get(prop)
+        return self.get_movie_properties()["fps"]
+
+    def get_movie_codec(self) -> str:
+        """Return the FourCC code of the codec of a movie file."""
+        return self.get_movie_properties()["codec"]
 
     def get_frame_shape(self) -> Tuple:
         """Return the shape of frames from a movie file."""
-        frame = self.get_movie_frame(0)
-        if frame is not None:
-            return frame.shape
+        return self.get_movie_properties()["frame_shape"]
 
     @property
     def frame_count(self):
@@ -69,9 +286,7 @@ class VideoCaptureContext:
 
     def _movie_frame_count(self):
         """Return the total number of frames for a movie file."""
-        assert self.isOpened(), self._movie_open_msg
-        prop = self.get_cv_attribute("CAP_PROP_FRAME_COUNT")
-        return int(self.vc.get(prop))
+        return self.get_movie_properties()["frame_count"]
 
     @staticmethod
     def get_cv_attribute(attribute_name: str):
@@ -105,9 +320,65 @@ class VideoCaptureContext:
 
     def get_movie_frame_dtype(self):
         """Return the dtype for frame in a movie file."""
-        frame = self.get_movie_frame(0)
-        if frame is not None:
-            return frame.dtype
+        return self.get_movie_properties()["dtype"]
+
+    def seek_frame(self, frame_number: int, keyframe_indices: Optional[np.ndarray] = None):
+        """
+        Position the movie so that the next frame read is the given one.
+
+        Parameters
+        ----------
+        frame_number : int
+        keyframe_indices : numpy.ndarray, optional
+            The frame numbers of the keyframes of the movie (see get_keyframe_indices). If given, seeks to the last
+            keyframe at or before the frame, unless the movie is already positioned between the two, and grabs the
+            frames in between without converting them. Otherwise, the seek is left to OpenCV.
+        """
+        assert self.isOpened(), self._movie_open_msg
+        if keyframe_indices is None:
+            self.current_frame = frame_number
+            return
+        preceding_keyframe_indices = keyframe_indices[keyframe_indices <= frame_number]
+        keyframe_number = int(preceding_keyframe_indices[-1]) if len(preceding_keyframe_indices) else 0
+        if not keyframe_number <= self._current_frame <= frame_number:
+            self.current_frame = keyframe_number
+        while self._current_frame < frame_number:
+            if not self.vc.grab():
+                raise ValueError(f"Could not seek to frame number {frame_number}.")
+            self._current_frame += 1
+
+    def read_frames(self, frames: np.ndarray) -> int:
+        """
+        Decode the next frames directly into a preallocated array, as RGB.
+
+        Each frame is decoded into a single reusable BGR frame and converted into its place in the array, so that no
+        memory is allocated per frame.
+
+        Parameters
+        ----------
+        frames : numpy.ndarray
+            Of shape (number of frames, *frame shape) and of the dtype of the frames (see get_movie_frame_dtype).
+
+        Returns
+        -------
+        number_of_frames_read : int
+            Less than the length of the array only if the movie, or its frame_count, ends first.
+        """
+        assert self.isOpened(), self._movie_open_msg
+        if (
+            self._bgr_frame is None
+            or self._bgr_frame.shape != frames.shape[1:]
+            or self._bgr_frame.dtype != frames.dtype
+        ):
+            self._bgr_frame = np.empty(shape=frames.shape[1:], dtype=frames.dtype)
+        number_of_frames_to_read = min(len(frames), self.frame_count - self._current_frame)
+        for frame_index in range(number_of_frames_to_read):
+            success, _ = self.vc.read(image=self._bgr_frame)
+            if not success:
+                return frame_index
+            self._current_frame += 1
+            cv2.cvtColor(src=self._bgr_frame, code=cv2.COLOR_BGR2RGB, dst=frames[frame_index])
+        return number_of_frames_to_read
 
     def release(self):
         self.vc.release()
@@ -132,7 +403,9 @@ class VideoCaptureContext:
             raise StopIteration
 
     def __enter__(self):
-        self.vc = cv2.VideoCapture(self.file_path)
+        if not self.vc.isOpened():  # reopen only once released
+            self.vc = cv2.VideoCapture(self.file_path)
+            self._current_frame = 0
         return self
 
     def __exit__(self, *args):
@@ -151,16 +424,86 @@ class MovieDataChunkIterator(GenericDataChunkIterator):
         buffer_gb: float = None,
         chunk_shape: tuple = None,
         stub_test: bool = False,
+        prefetch_buffers: int = 0,
+        prefetch_gb: Optional[float] = None,
+        number_of_jobs: int = 1,
+        use_processes: bool = False,
+        progress_bar_options: Optional[dict] = None,
     ):
+        """
+        Iterate over the frames of a movie file in buffers of whole frames.
+
+        Parameters
+        ----------
+        movie_file : FilePathType
+        buffer_gb : float, optional
+            The upper bound on the size in gigabytes (GB) of each buffer. The default is 1 GB, shrunk so that every
+            buffer held at once (including those being decoded) fits within the memory budget.
+        chunk_shape : tuple, optional
+            The shape of the chunks of the dataset. The default fits as many whole frames as possible within 1 MB.
+        stub_test : bool, optional
+            Whether to only iterate over the first 10 frames. The default is False.
+        prefetch_buffers : int, optional
+            The number of buffers to read ahead on a background thread; see GenericDataChunkIterator.
+        prefetch_gb : float, optional
+            The upper bound on the size of the buffers read ahead; see GenericDataChunkIterator.
+        number_of_jobs : int, optional
+            The number of workers decoding disjoint ranges of frames at once, each one buffer. Every worker seeks to
+            the keyframe preceding its range, as indexed by the container (see VideoCaptureContext.get_keyframe_indices),
+            and the buffers are still returned in order. The default of 1 decodes every buffer in turn; -1 uses all
+            available cores.
+        use_processes : bool, optional
+            Whether to decode in a pool of processes instead of threads. OpenCV releases the GIL while decoding, so
+            threads (the default) avoid the cost of copying every buffer from another process.
+        progress_bar_options : dict, optional
+            Keyword arguments of the tqdm progress bar displayed while iterating, such as its 'desc'.
+        """
         self.video_capture_ob = VideoCaptureContext(movie_file)
         self._full_frame_size_mb, self._full_frame_shape = self._get_frame_details()
         if stub_test:
             self.video_capture_ob.frame_count = 10
+        self.number_of_jobs = os.cpu_count() if number_of_jobs == -1 else number_of_jobs
+        assert self.number_of_jobs >= 1, f"number_of_jobs ({number_of_jobs}) must be positive or -1!"
+        self.use_processes = use_processes
+        self._keyframe_indices = None
+        self._keyframe_indices_loaded = False
+        self._decoding_executor = None
+        self._decoding_futures = dict()
+        self._number_of_submitted_frame_ranges = 0
         super().__init__(
             buffer_gb=buffer_gb,
             chunk_shape=chunk_shape,
             display_progress=True,
+            progress_bar_options=progress_bar_options,
+            prefetch_buffers=prefetch_buffers,
+            prefetch_gb=prefetch_gb,
         )
+        self._set_frame_ranges()
+
+    def _set_frame_ranges(self):
+        self._frame_ranges = [
+            (start_frame, min(start_frame + self.buffer_shape[0], self.maxshape[0]))
+            for start_frame in range(0, self.maxshape[0], self.buffer_shape[0])
+        ]
+        self._frame_range_positions = {frame_range: position for position, frame_range in enumerate(self._frame_ranges)}
+
+    def _get_buffers_held(self) -> int:
+        """Every worker also holds a buffer being decoded."""
+        return super()._get_buffers_held() + (self.number_of_jobs if self.number_of_jobs > 1 else 0)
+
+    def _get_minimum_buffer_gb(self, chunk_shape: Optional[tuple], chunk_mb: Optional[float]) -> float:
+        return max(
+            super()._get_minimum_buffer_gb(chunk_shape=chunk_shape, chunk_mb=chunk_mb), self._full_frame_size_mb / 1e3
+        )
+
+    def _fit_buffers_to_budget(self):
+        super()._fit_buffers_to_budget()
+        self._set_frame_ranges()
+
+    def close(self):
+        if getattr(self, "_decoding_executor", None) is not None:
+            self._stop_decoding()
+        super().close()
 
     def _get_default_chunk_shape(self, chunk_mb):
         """Shape is either one frame or a subset: scaled frame size but with all pixel colors"""
@@ -193,14 +536,74 @@ class MovieDataChunkIterator(GenericDataChunkIterator):
         min_frame_size_mb = (np.prod(frame_shape) * self._get_dtype().itemsize) / 1e6
         return min_frame_size_mb, frame_shape
 
+    def _get_keyframe_indices(self) -> Optional[np.ndarray]:
+        if not self._keyframe_indices_loaded:
+            self._keyframe_indices = self.video_capture_ob.get_keyframe_indices()
+            self._keyframe_indices_loaded = True
+        return self._keyframe_indices
+
     def _get_data(self, selection: Tuple[slice]) -> np.ndarray:
-        start_frame = selection[0].start
-        end_frame = selection[0].stop
-        frames = np.empty(shape=[end_frame - start_frame, *self._maxshape[1:]])
-        for frame_number in range(end_frame - start_frame):
-            frames[frame_number] = next(self.video_capture_ob)
+        frame_range = (selection[0].start, selection[0].stop)
+        frames = None
+        if self.number_of_jobs > 1 and frame_range in self._frame_range_positions:
+            frames = self._get_decoded_frame_range(frame_range=frame_range)
+        if frames is None:
+            frames = _read_frame_range(
+                video_capture_ob=self.video_capture_ob,
+                frame_range=frame_range,
+                frame_shape=self._maxshape[1:],
+                dtype=self.dtype,
+                keyframe_indices=self._get_keyframe_indices(),
+            )
+        return frames[(slice(None), *selection[1:])]
+
+    def _get_decoded_frame_range(self, frame_range: Tuple[int, int]) -> Optional[np.ndarray]:
+        """
+        Collect a buffer from the workers, after submitting those up to `number_of_jobs` buffers ahead of it.
+
+        Returns None if the buffer was already collected, in which case it has to be decoded again.
+        """
+        if self._decoding_executor is None:
+            executor_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+            self._decoding_executor = executor_class(max_workers=self.number_of_jobs)
+        keyframe_indices = self._get_keyframe_indices()
+        last_position = min(self._frame_range_positions[frame_range] + self.number_of_jobs, len(self._frame_ranges))
+        while self._number_of_submitted_frame_ranges < last_position:
+            submitted_frame_range = self._frame_ranges[self._number_of_submitted_frame_ranges]
+            self._decoding_futures[submitted_frame_range] = self._decoding_executor.submit(
+                _read_frame_range_in_worker,
+                file_path=str(self.video_capture_ob.file_path),
+                frame_range=submitted_frame_range,
+                frame_shape=self._maxshape[1:],
+                dtype=self.dtype,
+                keyframe_indices=keyframe_indices,
+            )
+            self.memory_budget.reserve(owner=self, nbytes=self._get_frame_range_bytes(submitted_frame_range))
+            self._number_of_submitted_frame_ranges += 1
+
+        future = self._decoding_futures.pop(frame_range, None)
+        if future is None:
+            return None
+        try:
+            frames = future.result()
+        finally:
+            self.memory_budget.release(owner=self, nbytes=self._get_frame_range_bytes(frame_range))
+            if self._number_of_submitted_frame_ranges == len(self._frame_ranges) and not self._decoding_futures:
+                self._stop_decoding()
         return frames
 
+    def _get_frame_range_bytes(self, frame_range: Tuple[int, int]) -> int:
+        return (frame_range[1] - frame_range[0]) * int(np.prod(self._maxshape[1:])) * self.dtype.itemsize
+
+    def _stop_decoding(self):
+        """Shut down the workers, discarding any buffers still being decoded."""
+        for frame_range, future in self._decoding_futures.items():
+            future.cancel()
+            self.memory_budget.release(owner=self, nbytes=self._get_frame_range_bytes(frame_range))
+        self._decoding_futures = dict()
+        self._decoding_executor.shutdown(wait=False)
+        self._decoding_executor = None
+
     def _get_dtype(self):
         return self.video_capture_ob.get_movie_frame_dtype()
 
@@ -1,4 +1,6 @@
 """Authors: Saksham Sharda, Cody Baker and Ben Dichter."""
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 from typing import Optional
 from warnings import warn
@@ -11,8 +13,9 @@ from pynwb import NWBFile
 from pynwb.image import ImageSeries
 from tqdm import tqdm
 
-from .movie_utils import VideoCaptureContext
+from .movie_utils import MovieDataChunkIterator, VideoCaptureContext
 from ....basedatainterface import BaseDataInterface
+from ....tools.codec_selection import select_codec
 from ....tools.nwb_helpers import get_module
 from ....utils import get_schema_from_hdmf_class, get_base_schema, calculate_regular_series_rate
 
@@ -51,6 +54,38 @@ def _check_duplicates(movies_metadata, file_paths):
     return movies_metadata_unique, file_paths_list
 
 
+def _probe_movie(file_path: str, external_mode: bool, stub_test: bool, read_timestamps: bool, sample_frames: bool):
+    """
+    Read what writing a movie file requires from it besides its frames; run for every movie file at once.
+
+    Returns
+    -------
+    movie_probe : dict
+        The 'fps' of the movie and its 'timestamps' (None unless `read_timestamps`). Unless `external_mode`, also its
+        'total_frames' and 'frame_shape' and, if `sample_frames`, the 'sample_frames' the compression is selected on
+        (compression="auto").
+    """
+    with VideoCaptureContext(str(file_path)) as video_capture_ob:
+        if stub_test and not external_mode:
+            video_capture_ob.frame_count = 10
+        movie_probe = dict(
+            fps=video_capture_ob.get_movie_fps(),
+            timestamps=video_capture_ob.get_movie_timestamps() if read_timestamps else None,
+        )
+        if external_mode:
+            return movie_probe
+        total_frames = video_capture_ob.get_movie_frame_count()
+        movie_probe.update(total_frames=total_frames, frame_shape=video_capture_ob.get_frame_shape())
+        if sample_frames:
+            sample_frame_numbers = np.unique(np.linspace(0, total_frames - 1, num=min(total_frames, 4)))
+            movie_probe.update(
+                sample_frames=np.stack(
+                    [video_capture_ob.get_movie_frame(int(frame_number)) for frame_number in sample_frame_numbers]
+                )
+            )
+    return movie_probe
+
+
 class MovieInterface(BaseDataInterface):
     """Data interface for writing movies as ImageSeries."""
 
@@ -110,6 +145,7 @@ class MovieInterface(BaseDataInterface):
         module_description: Optional[str] = None,
         compression: Optional[str] = "gzip",
         compression_options: Optional[int] = None,
+        number_of_jobs: int = 1,
     ):
         """
         Convert the movie data files to :py:class:`~pynwb.image.ImageSeries` and write them in the
@@ -155,11 +191,14 @@ class MovieInterface(BaseDataInterface):
         timestamps : list, optional
             List of timestamps for the movies. If unspecified, timestamps are extracted from each movie data.
         chunk_data : bool
-            If True, uses a DataChunkIterator to read and write the movie, reducing overhead RAM usage at the cost of
-            reduced conversion speed (compared to loading video entirely into RAM as an array). This will also force to
-            True, even if manually set to False, whenever the video file size exceeds available system RAM by a factor
-            of 70 (from compression experiments). Based on experiments for a ~30 FPS system of ~400 x ~600 color
-            frames, the equivalent uncompressed RAM usage is around 2GB per minute of video. The default is True.
+            If True, uses a MovieDataChunkIterator to read and write the movie in buffers of whole frames of up to
+            100 MB each, reducing overhead RAM usage at the cost of reduced conversion speed (compared to loading video
+            entirely into RAM as an array). One buffer is held per decoding job (see `number_of_jobs`), plus one read
+            ahead per movie when several are written to the file, all shrunk to fit the memory budget
+            (see neuroconv.tools.memory_budget). This will also force to True, even if manually set to False,
+            whenever the video file size exceeds available system RAM by a factor of 70 (from compression experiments).
+            Based on experiments for a ~30 FPS system of ~400 x ~600 color frames, the equivalent uncompressed RAM
+            usage is around 2GB per minute of video. The default is True.
         module_name: str, optional
             Name of the processing module to add the ImageSeries object to. Default behavior is to add as acquisition.
         module_description: str, optional
@@ -169,9 +208,14 @@ class MovieInterface(BaseDataInterface):
             Compression strategy to use for :py:class:`hdmf.backends.hdf5.h5_utils.H5DataIO`. For full list of currently
             supported filters, see
             https://docs.h5py.org/en/latest/high/dataset.html#lossless-compression-filters
+            Set to "auto" to benchmark the available filters on a few frames of each movie and select the one with the
+            best compression ratio per second (see neuroconv.tools.codec_selection.select_codec).
         compression_options: int, optional
             Parameter(s) for compression filter. Currently only supports the compression level (integer from 0 to 9) of
             compression="gzip".
+        number_of_jobs: int, optional
+            The number of workers decoding disjoint ranges of frames of each movie at once when chunk_data is True
+            (see MovieDataChunkIterator). The default of 1 decodes the frames in turn; -1 uses all available cores.
         """
         file_paths = self.source_data["file_paths"]
 
@@ -213,13 +257,31 @@ class MovieInterface(BaseDataInterface):
             else:
                 raise ValueError("provide starting times as a list of len " f"{len(movies_metadata_unique)}")
 
-        for j, (image_series_kwargs, file_list) in enumerate(zip(movies_metadata_unique, file_paths_list)):
+        # Probe every movie at once, since each probe mostly waits on reading its file
+        with ThreadPoolExecutor() as executor:
+            movie_probes = list(
+                executor.map(
+                    partial(
+                        _probe_movie,
+                        external_mode=external_mode,
+                        stub_test=stub_test,
+                        read_timestamps=not external_mode or timestamps is None,
+                        sample_frames=compression == "auto",
+                    ),
+                    [str(file_list[0]) for file_list in file_paths_list],
+                )
+            )
+        # When several movies are written to the file, every chunked movie is read ahead on its own thread while the
+        # others are written, one buffer each in turn
+        read_ahead = not external_mode and len(file_paths_list) > 1
 
+        for j, (image_series_kwargs, file_list) in enumerate(zip(movies_metadata_unique, file_paths_list)):
+            movie_probe = movie_probes[j]
+            fps = movie_probe["fps"]
             if external_mode:
-                with VideoCaptureContext(str(file_list[0])) as vc:
-                    fps = vc.get_movie_fps()
-                    if timestamps is None:
-                        timestamps = starting_times[j] + vc.get_movie_timestamps()
+                series_timestamps = (
+                    timestamps if timestamps is not None else starting_times[j] + movie_probe["timestamps"]
+                )
                 image_series_kwargs.update(
                     format="external",
                     external_file=file_list,
@@ -234,37 +296,34 @@ class MovieInterface(BaseDataInterface):
                         f"array ({round(available_memory/1e9, 2)} GB available)! Forcing chunk_data to True."
                     )
                     chunk_data = True
-                with VideoCaptureContext(str(file)) as video_capture_ob:
-                    if stub_test:
-                        video_capture_ob.frame_count = 10
-                    total_frames = video_capture_ob.get_movie_frame_count()
-                    frame_shape = video_capture_ob.get_frame_shape()
-                    timestamps = starting_times[j] + video_capture_ob.get_movie_timestamps()
-                    fps = video_capture_ob.get_movie_fps()
+                total_frames = movie_probe["total_frames"]
+                frame_shape = movie_probe["frame_shape"]
+                series_timestamps = starting_times[j] + movie_probe["timestamps"]
                 maxshape = (total_frames, *frame_shape)
                 best_gzip_chunk = (1, frame_shape[0], frame_shape[1], 3)
+                codec_selection = None
+                if compression == "auto":
+                    codec_selection = select_codec(data=movie_probe["sample_frames"], chunk_shape=best_gzip_chunk)
+                    compression_kwargs = codec_selection["data_io_kwargs"]
+                else:
+                    compression_kwargs = dict(compression=compression, compression_opts=compression_options)
                 tqdm_pos, tqdm_mininterval = (0, 10)
                 if chunk_data:
-                    video_capture_ob = VideoCaptureContext(str(file))
-                    if stub_test:
-                        video_capture_ob.frame_count = 10
-                    iterable = DataChunkIterator(
-                        data=tqdm(
-                            iterable=video_capture_ob,
-                            desc=f"Copying movie data for {Path(file).name}",
+                    iterable = MovieDataChunkIterator(
+                        movie_file=str(file),
+                        buffer_gb=0.1,
+                        chunk_shape=best_gzip_chunk,
+                        stub_test=stub_test,
+                        prefetch_buffers=1 if read_ahead else 0,
+                        number_of_jobs=number_of_jobs,
+                        progress_bar_options=dict(
+                            desc=f"Writing movie data for {Path(file).name}",
                             position=tqdm_pos,
-                            total=total_frames,
                             mininterval=tqdm_mininterval,
                         ),
-                        iter_axis=0,  # nwb standard is time as zero axis
-                        maxshape=maxshape,
-                    )
-                    data = H5DataIO(
-                        iterable,
-                        compression=compression,
-                        compression_opts=compression_options,
-                        chunks=best_gzip_chunk,
                     )
+                    iterable.writes_round_robin = read_ahead
+                    data = H5DataIO(iterable, **compression_kwargs)
                 else:
                     iterable = np.zeros(shape=maxshape, dtype="uint8")
                     with VideoCaptureContext(str(file)) as video_capture_ob:
@@ -290,12 +349,12 @@ class MovieInterface(BaseDataInterface):
                             iter_axis=0,  # nwb standard is time as zero axis
                             maxshape=maxshape,
                         ),
-                        compression="gzip",
-                        compression_opts=compression_options,
                         chunks=best_gzip_chunk,
+                        **compression_kwargs,
                     )
+                data.codec_selection = codec_selection  # reported by ConversionInstrumentation
                 image_series_kwargs.update(data=data)
-            rate = calculate_regular_series_rate(series=timestamps)
+            rate = calculate_regular_series_rate(series=series_timestamps)
             if rate is not None:
                 if fps != rate:
                     warn(
@@ -305,7 +364,7 @@ class MovieInterface(BaseDataInterface):
                     )
                 image_series_kwargs.update(starting_time=starting_times[j], rate=rate)
             else:
-                image_series_kwargs.update(timestamps=timestamps)
+                image_series_kwargs.update(timestamps=series_timestamps)
 
             if module_name is None:
                 nwbfile.add_acquisition(ImageSeries(**image_series_kwargs))
@@ -109,6 +109,7 @@ class BaseRecordingExtractorInterface(BaseDataInterface, ABC):
         compression_opts: Optional[int] = None,
         iterator_type: Optional[str] = "v2",
         iterator_opts: Optional[dict] = None,
+        number_of_jobs: int = 1,
         save_path: OptionalFilePathType = None,  # TODO: to be removed, depreceation applied at tools level
     ):
         """
@@ -143,6 +144,7 @@ class BaseRecordingExtractorInterface(BaseDataInterface, ABC):
             Key in metadata dictionary containing metadata info for the specific electrical series
         compression: str (optional, defaults to "gzip")
             Type of compression to use. Valid types are "gzip" and "lzf".
+            Set to "auto" to select the best filter for the traces; see add_electrical_series.
             Set to None to disable all compression.
         compression_opts: int (optional, defaults to 4)
             Only applies to compression="gzip". Controls the level of the GZIP.
@@ -158,6 +160,9 @@ class BaseRecordingExtractorInterface(BaseDataInterface, ABC):
                 chunk_mb : float (optional, defaults to 1 MB)
                     Should be below 1 MB. Automatically calculates suitable chunk shape.
             If manual specification of buffer_shape and chunk_shape are desired, these may be specified as well.
+        number_of_jobs: int (optional, defaults to 1)
+            The number of workers compressing the traces in parallel with direct chunk writes.
+            Set to -1 to use all available cores.
         """
         if stub_test or self.subset_channels is not None:
             recording = self.subset_recording(stub_test=stub_test)
@@ -180,5 +185,6 @@ class BaseRecordingExtractorInterface(BaseDataInterface, ABC):
             compression_opts=compression_opts,
             iterator_type=iterator_type,
             iterator_opts=iterator_opts,
+            number_of_jobs=number_of_jobs,
             save_path=save_path,  # TODO: to be removed, depreceation applied at tools level
         )
@@ -1,12 +1,13 @@
 """Authors: Cody Baker and Ben Dichter."""
-import json
-from jsonschema import validate
+from jsonschema.exceptions import best_match
 from typing import Optional, Dict
 from pathlib import Path
 
 from pynwb import NWBFile
 from pynwb.file import Subject
 
+from .tools.conversion_planning import get_dataset_plans, summarize_dataset_plans
+from .tools.instrumentation import ConversionInstrumentation, _measure
 from .tools.nwb_helpers import get_default_nwbfile_metadata, make_nwbfile_from_metadata, make_or_load_nwbfile
 from .utils import (
     get_schema_from_hdmf_class,
@@ -17,15 +18,29 @@ from .utils import (
     fill_defaults,
 )
 
-from .utils.json_schema import NWBMetaDataEncoder
+from .utils.caching import CachedMetadataMixin, cache_method
+from .utils.json_schema import get_schema_validator
 
 
-class NWBConverter:
-    """Primary class for all NWB conversion classes."""
+def _raise_best_validation_error(validator, instance):
+    """Raise the most relevant error of validating the instance, as jsonschema.validate does."""
+    error = best_match(validator.iter_errors(instance=instance))
+    if error is not None:
+        raise error
+
+
+class NWBConverter(CachedMetadataMixin):
+    """
+    Primary class for all NWB conversion classes.
+
+    As for the data interfaces, the schemas are cached per class and the metadata and metadata schema per instance,
+    including any overrides of these methods in child classes. Call `clear_cache` to recompute them.
+    """
 
     data_interface_classes = None
 
     @classmethod
+    @cache_method
     def get_source_schema(cls):
         """Compile input schemas from each of the data interface classes."""
         source_schema = get_base_schema(
@@ -40,6 +55,7 @@ class NWBConverter:
         return source_schema
 
     @classmethod
+    @cache_method
     def get_conversion_options_schema(cls):
         """Compile conversion option schemas from each of the data interface classes."""
         conversion_options_schema = get_base_schema(
@@ -70,6 +86,7 @@ class NWBConverter:
             if name in source_data
         }
 
+    @cache_method
     def get_metadata_schema(self):
         """Compile metadata schemas from each of the data interface objects."""
         metadata_schema = get_base_schema(
@@ -89,6 +106,7 @@ class NWBConverter:
         fill_defaults(metadata_schema, default_values)
         return metadata_schema
 
+    @cache_method
     def get_metadata(self):
         """Auto-fill as much of the metadata as possible. Must comply with metadata schema."""
         metadata = get_default_nwbfile_metadata()
@@ -97,6 +115,12 @@ class NWBConverter:
             metadata = dict_deep_update(metadata, interface_metadata)
         return metadata
 
+    def clear_cache(self):
+        """Forget the cached metadata and metadata schema of this converter and of all its data interfaces."""
+        super().clear_cache()
+        for data_interface in self.data_interface_objects.values():
+            data_interface.clear_cache()
+
     def get_conversion_options(self):
         """Auto-fill as much of the conversion options as possible. Must comply with conversion_options_schema."""
         conversion_options = dict()
@@ -106,25 +130,103 @@ class NWBConverter:
 
     def validate_metadata(self, metadata: Dict[str, dict]):
         """Validate metadata against Converter metadata_schema."""
-        encoder = NWBMetaDataEncoder()
-        # The encoder produces a serialiazed object so we de serialized it for comparison
-        serialized_metadata = encoder.encode(metadata)
-        decoded_metadata = json.loads(serialized_metadata)
-        validate(instance=decoded_metadata, schema=self.get_metadata_schema())
+        _raise_best_validation_error(validator=self._get_metadata_validator(), instance=metadata)
         if self.verbose:
             print("Metadata is valid!")
 
+    @cache_method(copy=False)
+    def _get_metadata_validator(self):
+        """The metadata schema depends on the data interface objects, so its validator is compiled per instance."""
+        return get_schema_validator(schema=self.get_metadata_schema())
+
     def validate_conversion_options(self, conversion_options: Dict[str, dict]):
         """Validate conversion_options against Converter conversion_options_schema."""
-        validate(instance=conversion_options, schema=self.get_conversion_options_schema())
+        _raise_best_validation_error(validator=self._get_conversion_options_validator(), instance=conversion_options)
         if self.verbose:
             print("conversion_options is valid!")
 
-    def _validate_source_data(self, source_data: Dict[str, dict], verbose: bool = True):
-        validate(instance=source_data, schema=self.get_source_schema())
+    @classmethod
+    @cache_method(copy=False)
+    def _get_conversion_options_validator(cls):
+        """Compiled once per converter class and shared by all its instances."""
+        return get_schema_validator(schema=cls.get_conversion_options_schema())
+
+    @classmethod
+    def _validate_source_data(cls, source_data: Dict[str, dict], verbose: bool = True):
+        _raise_best_validation_error(validator=cls._get_source_validator(), instance=source_data)
         if verbose:
             print("Source data is valid!")
 
+    @classmethod
+    @cache_method(copy=False)
+    def _get_source_validator(cls):
+        """Compiled once per converter class and shared by all its instances."""
+        return get_schema_validator(schema=cls.get_source_schema())
+
+    def plan_conversion(
+        self,
+        metadata: Optional[dict] = None,
+        conversion_options: Optional[dict] = None,
+        sample_data: bool = True,
+        conversion_rate_mb: float = 17.0,
+    ) -> dict:
+        """
+        Estimate what run_conversion will write, and how long and how much memory it will take, without writing.
+
+        Each data interface adds its data to an in-memory NWBFile exactly as it would during the conversion, which
+        wraps large datasets in iterators rather than reading them. Every dataset of that NWBFile is then described.
+        Note that this runs the `run_conversion` of every interface, so data that an interface reads into memory
+        instead of wrapping it in an iterator (as many non-ecephys interfaces do) is read in full while planning.
+
+        Parameters
+        ----------
+        metadata: dict, optional
+            Metadata dictionary, as would be passed to run_conversion.
+        conversion_options: dict, optional
+            Similar to source_data, a dictionary containing keywords for each interface for which non-default
+            conversion specification is requested.
+        sample_data: bool, optional
+            Whether to read and compress the first chunk of each compressed dataset to estimate its compressed size
+            and conversion rate. The default is True.
+        conversion_rate_mb: float, optional
+            The rate in MB/s assumed for the datasets which are not sampled. The default is 17 MB/s.
+
+        Returns
+        -------
+        plan: dict
+            'datasets' lists every dataset with its 'path', 'source' (the name of the interface that added it),
+            'shape', 'dtype', 'chunk_shape', 'buffer_shape', 'compression', 'uncompressed_bytes',
+            'estimated_compressed_bytes', 'estimated_memory_bytes', and 'estimated_runtime' in seconds.
+            'interfaces' sums the bytes and runtime by interface, and the remaining keys over the whole file,
+            including 'estimated_peak_memory_bytes'; see neuroconv.tools.conversion_planning.summarize_dataset_plans.
+        """
+        if metadata is None:
+            metadata = self.get_metadata()
+        self.validate_metadata(metadata=metadata)
+
+        if conversion_options is None:
+            conversion_options = dict()
+        default_conversion_options = self.get_conversion_options()
+        conversion_options_to_run = dict_deep_update(default_conversion_options, conversion_options)
+        self.validate_conversion_options(conversion_options=conversion_options_to_run)
+
+        nwbfile = make_nwbfile_from_metadata(metadata=metadata)
+        # The containers created from the metadata alone are not attributed to any interface
+        container_labels = {container.object_id: None for container in nwbfile.all_children()}
+        for interface_name, data_interface in self.data_interface_objects.items():
+            data_interface.run_conversion(
+                nwbfile=nwbfile, metadata=metadata, **conversion_options_to_run.get(interface_name, dict())
+            )
+            for container in nwbfile.all_children():
+                container_labels.setdefault(container.object_id, interface_name)
+        dataset_plans = get_dataset_plans(
+            nwbfile=nwbfile,
+            sample_data=sample_data,
+            conversion_rate_mb=conversion_rate_mb,
+            container_labels=container_labels,
+        )
+        return summarize_dataset_plans(dataset_plans=dataset_plans, sources=list(self.data_interface_objects))
+
     def run_conversion(
         self,
         nwbfile_path: Optional[str] = None,
@@ -132,6 +234,10 @@ class NWBConverter:
         metadata: Optional[dict] = None,
         overwrite: bool = False,
         conversion_options: Optional[dict] = None,
+        backend: str = "hdf5",
+        number_of_jobs: int = 1,
+        resume: bool = False,
+        instrumentation: Optional[ConversionInstrumentation] = None,
     ) -> NWBFile:
         """
         Run the NWB conversion over all the instantiated data interfaces.
@@ -154,6 +260,21 @@ class NWBConverter:
         conversion_options: dict, optional
             Similar to source_data, a dictionary containing keywords for each interface for which non-default
             conversion specification is requested.
+        backend: str, optional
+            The storage backend of the NWBFile at 'nwbfile_path'; either "hdf5" (the default) for a single HDF5 file,
+            or "zarr" for an NWB-Zarr directory store.
+        number_of_jobs: int, optional
+            Only applies to backend="zarr". The number of workers writing the chunks of large datasets such as raw
+            traces, imaging frames, and movie frames concurrently. Set to -1 to use all available cores.
+        resume: bool, optional
+            Only applies to backend="hdf5" when writing a new NWBFile. If True, checkpoints the progress of the write
+            next to the NWBFile so that, if it is interrupted, calling run_conversion again with the same arguments
+            continues from the last buffer committed to the file instead of starting over.
+            The default is False.
+        instrumentation: ConversionInstrumentation, optional
+            If specified, records the wall time and peak memory of each stage of the conversion, including the
+            run_conversion of every data interface, and the throughput of each dataset written from an iterator.
+            See neuroconv.tools.instrumentation.ConversionInstrumentation for its events and JSON report.
 
         Returns
         -------
@@ -161,14 +282,17 @@ class NWBConverter:
             The in-memory NWBFile object after all conversion operations are complete.
         """
         if metadata is None:
-            metadata = self.get_metadata()
-        self.validate_metadata(metadata=metadata)
+            with _measure(instrumentation=instrumentation, stage="get_metadata"):
+                metadata = self.get_metadata()
+        with _measure(instrumentation=instrumentation, stage="validate_metadata"):
+            self.validate_metadata(metadata=metadata)
 
         if conversion_options is None:
             conversion_options = dict()
         default_conversion_options = self.get_conversion_options()
         conversion_options_to_run = dict_deep_update(default_conversion_options, conversion_options)
-        self.validate_conversion_options(conversion_options=conversion_options_to_run)
+        with _measure(instrumentation=instrumentation, stage="validate_conversion_options"):
+            self.validate_conversion_options(conversion_options=conversion_options_to_run)
 
         with make_or_load_nwbfile(
             nwbfile_path=nwbfile_path,
@@ -176,9 +300,18 @@ class NWBConverter:
             metadata=metadata,
             overwrite=overwrite,
             verbose=self.verbose,
+            backend=backend,
+            number_of_jobs=number_of_jobs,
+            resume=resume,
+            instrumentation=instrumentation,
         ) as nwbfile_out:
+            if instrumentation is not None:
+                instrumentation.label_containers(nwbfile=nwbfile_out, source=None)
             for interface_name, data_interface in self.data_interface_objects.items():
-                data_interface.run_conversion(
-                    nwbfile=nwbfile_out, metadata=metadata, **conversion_options_to_run.get(interface_name, dict())
-                )
+                with _measure(instrumentation=instrumentation, stage="interface", name=interface_name):
+                    data_interface.run_conversion(
+                        nwbfile=nwbfile_out, metadata=metadata, **conversion_options_to_run.get(interface_name, dict())
+                    )
+                if instrumentation is not None:
+                    instrumentation.label_containers(nwbfile=nwbfile_out, source=interface_name)
         return nwbfile_out
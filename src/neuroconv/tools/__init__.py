@@ -1,3 +1,14 @@
-from .spikeinterface import spikeinterface
-from .roiextractors import roiextractors
-from .neo import neo
+from importlib import import_module
+
+# Each of these subpackages imports the library it wraps, so it is only imported on first access
+_lazy_submodules = ["spikeinterface", "roiextractors", "neo"]
+
+
+def __getattr__(name: str):
+    if name not in _lazy_submodules:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return import_module(f".{name}", package=__name__)
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_submodules))
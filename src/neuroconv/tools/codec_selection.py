@@ -0,0 +1,219 @@
+"""Benchmark HDF5 compression filters on samples of a dataset and select the one best suited to it."""
+import uuid
+from time import perf_counter
+from typing import List, Optional
+
+import h5py
+import numpy as np
+
+from .hdmf import HAVE_BLOSC, GenericDataChunkIterator
+
+CODEC_SELECTION_POLICIES = ["balanced", "ratio", "speed"]
+
+
+def _get_plugin_candidate(name: str, h5_filter, shuffle: bool = False) -> dict:
+    h5py_kwargs = dict(compression=h5_filter.filter_id, compression_opts=h5_filter.filter_options, shuffle=shuffle)
+    return dict(name=name, data_io_kwargs=dict(h5py_kwargs, allow_plugin_filters=True), h5py_kwargs=h5py_kwargs)
+
+
+def get_codec_candidates(direct_chunk_write: bool = False) -> List[dict]:
+    """
+    List the compression filters to benchmark.
+
+    Parameters
+    ----------
+    direct_chunk_write : bool, optional
+        Whether the dataset will be written by a DirectChunkWriteH5DataIO, which supports only GZIP and Blosc.
+        The default is False.
+
+    Returns
+    -------
+    candidates : list of dict
+        Each with the 'name' of the filter, the 'data_io_kwargs' to pass to the H5DataIO (or the
+        DirectChunkWriteH5DataIO), and the equivalent 'h5py_kwargs' for h5py.Group.create_dataset.
+        GZIP at levels 1, 4, and 9 and, unless `direct_chunk_write`, LZF are always included, with and without the
+        HDF5 shuffle filter. Blosc (LZ4 and Zstd) and, unless `direct_chunk_write`, Zstd are included if hdf5plugin
+        and blosc are installed.
+    """
+    if HAVE_BLOSC:
+        import hdf5plugin
+
+    candidates = []
+    for shuffle in [False, True]:
+        suffix = "+shuffle" if shuffle else ""
+        for level in [1, 4, 9]:
+            h5py_kwargs = dict(compression="gzip", compression_opts=level, shuffle=shuffle)
+            candidates.append(dict(name=f"gzip-{level}{suffix}", data_io_kwargs=h5py_kwargs, h5py_kwargs=h5py_kwargs))
+        if not direct_chunk_write:
+            h5py_kwargs = dict(compression="lzf", shuffle=shuffle)
+            candidates.append(dict(name=f"lzf{suffix}", data_io_kwargs=h5py_kwargs, h5py_kwargs=h5py_kwargs))
+        if HAVE_BLOSC and not direct_chunk_write:
+            candidates.append(
+                _get_plugin_candidate(name=f"zstd-3{suffix}", h5_filter=hdf5plugin.Zstd(), shuffle=shuffle)
+            )
+    if not HAVE_BLOSC:
+        return candidates
+
+    # Blosc has its own byte shuffle in place of the HDF5 filter
+    for cname in ["lz4", "zstd"]:
+        for blosc_shuffle, suffix in [(hdf5plugin.Blosc.NOSHUFFLE, ""), (hdf5plugin.Blosc.SHUFFLE, "+shuffle")]:
+            name = f"blosc-{cname}-5{suffix}"
+            h5_filter = hdf5plugin.Blosc(cname=cname, clevel=5, shuffle=blosc_shuffle)
+            if direct_chunk_write:
+                candidates.append(
+                    dict(
+                        name=name,
+                        data_io_kwargs=dict(
+                            compression="blosc", compression_opts=dict(cname=cname, clevel=5, shuffle=blosc_shuffle)
+                        ),
+                        h5py_kwargs=dict(compression=h5_filter.filter_id, compression_opts=h5_filter.filter_options),
+                    )
+                )
+            else:
+                candidates.append(_get_plugin_candidate(name=name, h5_filter=h5_filter))
+    return candidates
+
+
+def sample_chunks(data, chunk_shape: Optional[tuple] = None, number_of_samples: int = 4) -> List[np.ndarray]:
+    """
+    Read the first chunk of a few buffers spread evenly across the data, without consuming any iterator.
+
+    Parameters
+    ----------
+    data : GenericDataChunkIterator or array-like
+        Any other data must support slicing, such as a numpy array, np.memmap, or h5py.Dataset.
+    chunk_shape : tuple, optional
+        The shape of the chunks of the dataset. Required unless the data is a GenericDataChunkIterator, in which case
+        the buffers are its own; otherwise every chunk is treated as a buffer.
+    number_of_samples : int, optional
+        The number of buffers to sample. The default is 4.
+
+    Returns
+    -------
+    samples : list of numpy.ndarray
+        Each of the full chunk shape, zero padded on the edges of the data as HDF5 stores them.
+    """
+    if isinstance(data, GenericDataChunkIterator):
+        chunk_shape = data.chunk_shape
+        buffer_shape = data.buffer_shape
+        maxshape = data.maxshape
+        dtype = np.dtype(data.dtype)
+        read = data.read_selection
+    else:
+        assert (
+            chunk_shape is not None
+        ), "A chunk_shape is required to sample data that is not a GenericDataChunkIterator!"
+        buffer_shape = chunk_shape
+        maxshape = data.shape
+        dtype = np.dtype(data.dtype)
+        read = data.__getitem__
+
+    buffers_per_axis = [int(np.ceil(axis / buffer_axis)) for axis, buffer_axis in zip(maxshape, buffer_shape)]
+    number_of_buffers = int(np.prod(buffers_per_axis))
+    buffer_indices = np.unique(np.linspace(0, number_of_buffers - 1, num=min(number_of_samples, number_of_buffers)))
+    samples = []
+    for buffer_index in buffer_indices.astype(int):
+        buffer_start = np.array(np.unravel_index(buffer_index, shape=buffers_per_axis)) * np.array(buffer_shape)
+        selection = tuple(
+            slice(int(start), int(min(start + chunk_axis, axis)))
+            for start, chunk_axis, axis in zip(buffer_start, chunk_shape, maxshape)
+        )
+        sample = np.zeros(shape=chunk_shape, dtype=dtype)
+        chunk = np.asarray(read(selection))
+        sample[tuple(slice(0, axis) for axis in chunk.shape)] = chunk
+        samples.append(sample)
+    return samples
+
+
+def benchmark_codecs(samples: List[np.ndarray], candidates: List[dict]) -> List[dict]:
+    """
+    Measure the compression ratio and rate of each candidate filter on sample chunks.
+
+    Each candidate writes the samples through the HDF5 filter pipeline of an in-memory file without chunk cache, so
+    that the measured time covers the compression of every chunk.
+
+    Returns
+    -------
+    results : list of dict
+        For each candidate: its 'name' and 'data_io_kwargs', the 'ratio' of uncompressed to compressed bytes, and the
+        'rate_mb' in MB/s of uncompressed data.
+    """
+    stacked_samples = np.stack(samples)
+    results = []
+    with h5py.File(name=f"{uuid.uuid4()}.h5", mode="w", driver="core", backing_store=False, rdcc_nbytes=0) as file:
+        for candidate in candidates:
+            dataset = file.create_dataset(
+                name=candidate["name"],
+                shape=stacked_samples.shape,
+                dtype=stacked_samples.dtype,
+                chunks=(1,) + stacked_samples.shape[1:],
+                **candidate["h5py_kwargs"],
+            )
+            start_time = perf_counter()
+            dataset[...] = stacked_samples
+            file.flush()
+            write_time = perf_counter() - start_time
+            results.append(
+                dict(
+                    name=candidate["name"],
+                    data_io_kwargs=candidate["data_io_kwargs"],
+                    ratio=stacked_samples.nbytes / max(dataset.id.get_storage_size(), 1),
+                    rate_mb=stacked_samples.nbytes / 1e6 / max(write_time, 1e-9),
+                )
+            )
+    return results
+
+
+def select_codec(
+    data,
+    chunk_shape: Optional[tuple] = None,
+    policy: str = "balanced",
+    min_rate_mb: Optional[float] = None,
+    number_of_samples: int = 4,
+    direct_chunk_write: bool = False,
+) -> dict:
+    """
+    Benchmark the candidate filters on samples of the data and select one according to a policy.
+
+    Parameters
+    ----------
+    data : GenericDataChunkIterator or array-like
+        The data to be written; see `sample_chunks`.
+    chunk_shape : tuple, optional
+        The shape of the chunks of the dataset. Required unless the data is a GenericDataChunkIterator.
+    policy : {'balanced', 'ratio', 'speed'}, optional
+        'balanced' (the default) selects the highest compression ratio per second spent compressing a MB, that is,
+        the product of the ratio and the rate; 'ratio' the highest compression ratio; and 'speed' the highest rate.
+    min_rate_mb : float, optional
+        Excludes the filters that compress slower than this rate in MB/s, unless none is fast enough, in which case
+        the fastest is selected.
+    number_of_samples : int, optional
+        The number of buffers to sample a chunk from. The default is 4.
+    direct_chunk_write : bool, optional
+        Whether the dataset will be written by a DirectChunkWriteH5DataIO. The default is False.
+
+    Returns
+    -------
+    codec_selection : dict
+        The 'policy', the 'name' and 'data_io_kwargs' of the selected filter, and the 'candidates' as returned by
+        `benchmark_codecs`.
+    """
+    assert policy in CODEC_SELECTION_POLICIES, f"policy ({policy}) must be one of {CODEC_SELECTION_POLICIES}!"
+    samples = sample_chunks(data=data, chunk_shape=chunk_shape, number_of_samples=number_of_samples)
+    results = benchmark_codecs(samples=samples, candidates=get_codec_candidates(direct_chunk_write=direct_chunk_write))
+
+    eligible_results = [result for result in results if min_rate_mb is None or result["rate_mb"] >= min_rate_mb]
+    if not eligible_results:
+        eligible_results = [max(results, key=lambda result: result["rate_mb"])]
+    scores = dict(
+        balanced=lambda result: result["ratio"] * result["rate_mb"],
+        ratio=lambda result: result["ratio"],
+        speed=lambda result: result["rate_mb"],
+    )
+    selected_result = max(eligible_results, key=scores[policy])
+    return dict(
+        policy=policy,
+        name=selected_result["name"],
+        data_io_kwargs=selected_result["data_io_kwargs"],
+        candidates=results,
+    )
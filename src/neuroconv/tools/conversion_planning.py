@@ -0,0 +1,193 @@
+"""Estimate what writing an in-memory NWBFile will cost, without consuming its DataChunkIterators."""
+from time import perf_counter
+from typing import List, Optional
+
+import numpy as np
+from hdmf.data_utils import AbstractDataChunkIterator, DataIO, GenericDataChunkIterator as HDMFGenericDataChunkIterator
+from pynwb import NWBFile, get_manager
+
+from .hdmf import (
+    DirectChunkWriteH5DataIO,
+    GenericDataChunkIterator,
+    HAVE_BLOSC,
+    _compress_chunk,
+    _iter_dataset_builders,
+)
+
+
+def _get_storage_settings(data) -> dict:
+    """Unwrap the data of a dataset builder into the data itself and how it will be chunked and compressed."""
+    if isinstance(data, DirectChunkWriteH5DataIO):
+        return dict(
+            data=data.data_chunk_iterator,
+            chunk_shape=data.data_chunk_iterator.chunk_shape,
+            compression=data.compression,
+            compression_opts=data.compression_opts,
+            shuffle=data.shuffle,
+            buffers_held=2,  # the buffer being compressed alongside the one being read
+        )
+    if isinstance(data, DataIO):
+        io_settings = getattr(data, "io_settings", dict())
+        compression = io_settings.get("compression")
+        chunks = io_settings.get("chunks")
+        return dict(
+            data=data.data,
+            chunk_shape=chunks if isinstance(chunks, (tuple, list)) else getattr(data.data, "chunk_shape", None),
+            compression="gzip" if compression is True else compression,
+            compression_opts=io_settings.get("compression_opts"),
+            shuffle=io_settings.get("shuffle", False),
+            buffers_held=1,
+        )
+    return dict(
+        data=data,
+        chunk_shape=getattr(data, "chunk_shape", None),
+        compression=None,
+        compression_opts=None,
+        shuffle=False,
+        buffers_held=1,
+    )
+
+
+def _sample_chunk(data, chunk_shape) -> Optional[np.ndarray]:
+    """Read the first chunk of the data, or None if that cannot be done without consuming an iterator."""
+    if isinstance(data, GenericDataChunkIterator):
+        selection = tuple(slice(0, min(chunk_axis, axis)) for chunk_axis, axis in zip(chunk_shape, data.maxshape))
+        return data.read_selection(selection=selection)
+    if isinstance(data, AbstractDataChunkIterator) or chunk_shape is None:
+        return None
+    return np.asarray(data[tuple(slice(0, chunk_axis) for chunk_axis in chunk_shape)])
+
+
+def get_dataset_plans(
+    nwbfile: NWBFile, sample_data: bool = True, conversion_rate_mb: float = 17.0, container_labels: dict = None
+) -> List[dict]:
+    """
+    Describe every dataset that writing an in-memory NWBFile will produce, with estimates of its cost.
+
+    Parameters
+    ----------
+    nwbfile : NWBFile
+        The in-memory NWBFile, whose large datasets are typically wrapped in DataChunkIterators.
+        Any data not wrapped in an iterator has already been read into memory by whatever added it to the NWBFile.
+    sample_data : bool, optional
+        Whether to read and compress the first chunk of each compressed dataset to estimate its compressed size and
+        the rate at which it is converted. Iterators other than a neuroconv GenericDataChunkIterator are never sampled.
+        The default is True.
+    conversion_rate_mb : float, optional
+        The rate in MB/s at which datasets that are not sampled are assumed to be read, compressed, and written.
+        The default of 17 MB/s is the one assumed by 'estimate_total_conversion_runtime'.
+    container_labels : dict, optional
+        Maps the object_id of containers to a label reported as the 'source' of their datasets.
+
+    Returns
+    -------
+    dataset_plans : list of dict
+        For each dataset: its 'path' in the file, 'source', 'shape', 'dtype', 'chunk_shape', 'buffer_shape',
+        'compression', 'uncompressed_bytes', 'estimated_compressed_bytes', 'estimated_memory_bytes' (the buffers
+        of an iterator held at once, or the size of data already in memory), and 'estimated_runtime' in seconds.
+    """
+    container_labels = container_labels or dict()
+    builder = get_manager().build(nwbfile, root=True)
+    dataset_plans = []
+    for path, dataset_builder, object_id in _iter_dataset_builders(group_builder=builder):
+        storage_settings = _get_storage_settings(data=dataset_builder.data)
+        data = storage_settings["data"]
+        if isinstance(data, AbstractDataChunkIterator):
+            shape = tuple(data.maxshape)
+            dtype = np.dtype(data.dtype)
+            buffer_shape = tuple(data.buffer_shape) if isinstance(data, HDMFGenericDataChunkIterator) else None
+        else:
+            array = np.asarray(data)
+            shape = array.shape
+            dtype = array.dtype
+            buffer_shape = None
+        uncompressed_bytes = int(np.prod(shape, dtype="int64")) * dtype.itemsize
+        chunk_shape = None if storage_settings["chunk_shape"] is None else tuple(storage_settings["chunk_shape"])
+
+        if buffer_shape is not None:
+            buffers_held = storage_settings["buffers_held"] + getattr(data, "prefetch_buffers", 0)
+            estimated_memory_bytes = buffers_held * int(np.prod(buffer_shape)) * dtype.itemsize
+        elif isinstance(data, AbstractDataChunkIterator):
+            estimated_memory_bytes = 0 if chunk_shape is None else int(np.prod(chunk_shape)) * dtype.itemsize
+        else:
+            estimated_memory_bytes = uncompressed_bytes
+
+        compressed_fraction = 1.0
+        estimated_runtime = uncompressed_bytes / 1e6 / conversion_rate_mb
+        compression = storage_settings["compression"]
+        can_compress = compression == "gzip" or (compression == "blosc" and HAVE_BLOSC)
+        start_time = perf_counter()
+        sample = _sample_chunk(data=data, chunk_shape=chunk_shape) if sample_data and can_compress else None
+        if sample is not None and sample.size > 0:
+            padded_sample = np.zeros(shape=chunk_shape, dtype=dtype)  # chunks are always stored at their full shape
+            padded_sample[tuple(slice(0, axis) for axis in sample.shape)] = sample
+            compressed_sample = _compress_chunk(
+                chunk=padded_sample,
+                compression=compression,
+                compression_opts=storage_settings["compression_opts"],
+                shuffle=storage_settings["shuffle"],
+            )
+            sample_time = perf_counter() - start_time
+            compressed_fraction = len(compressed_sample) / padded_sample.nbytes
+            estimated_runtime = uncompressed_bytes / padded_sample.nbytes * sample_time
+
+        dataset_plans.append(
+            dict(
+                path=path,
+                source=container_labels.get(object_id),
+                shape=shape,
+                dtype=str(dtype),
+                chunk_shape=chunk_shape,
+                buffer_shape=buffer_shape,
+                compression=compression,
+                uncompressed_bytes=uncompressed_bytes,
+                estimated_compressed_bytes=int(uncompressed_bytes * compressed_fraction),
+                estimated_memory_bytes=estimated_memory_bytes,
+                estimated_runtime=estimated_runtime,
+            )
+        )
+    return dataset_plans
+
+
+def summarize_dataset_plans(dataset_plans: List[dict], sources: List[str]) -> dict:
+    """
+    Total the estimates of each dataset plan, overall and by source.
+
+    Parameters
+    ----------
+    dataset_plans : list of dict
+        As returned by 'get_dataset_plans'.
+    sources : list of str
+        The sources to total the bytes and runtime of.
+
+    Returns
+    -------
+    plan : dict
+        'datasets' holds the dataset plans, 'interfaces' the totals by source, and the remaining keys the totals over
+        the whole file. The peak memory assumes that iterators are exhausted round-robin (the worst case), so besides
+        all data already in memory, it counts a single buffer being written plus every buffer held by the read-ahead
+        or compression of each iterator.
+    """
+    summed_keys = ["uncompressed_bytes", "estimated_compressed_bytes", "estimated_runtime"]
+    plan = dict(
+        datasets=dataset_plans,
+        interfaces={
+            source: {
+                key: sum(dataset_plan[key] for dataset_plan in dataset_plans if dataset_plan["source"] == source)
+                for key in summed_keys
+            }
+            for source in sources
+        },
+    )
+    plan.update({f"total_{key}": sum(dataset_plan[key] for dataset_plan in dataset_plans) for key in summed_keys})
+
+    peak_memory_bytes = 0
+    buffer_bytes = [0]
+    for dataset_plan in dataset_plans:
+        if dataset_plan["buffer_shape"] is None:
+            peak_memory_bytes += dataset_plan["estimated_memory_bytes"]
+            continue
+        buffer_bytes.append(int(np.prod(dataset_plan["buffer_shape"])) * np.dtype(dataset_plan["dtype"]).itemsize)
+        peak_memory_bytes += dataset_plan["estimated_memory_bytes"] - buffer_bytes[-1]
+    plan.update(estimated_peak_memory_bytes=peak_memory_bytes + max(buffer_bytes))
+    return plan
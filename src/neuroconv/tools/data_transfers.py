@@ -239,6 +239,9 @@ def estimate_total_conversion_runtime(
     """
     Estimate how long the combined process of data transfer, conversion, and upload is expected to take.
 
+    For estimates of the size and conversion time of each dataset of a particular conversion, which sample the
+    compression of the source data, see `NWBConverter.plan_conversion`.
+
     Parameters
     ----------
     total_mb: float
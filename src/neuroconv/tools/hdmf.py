@@ -1,11 +1,367 @@
 """Collection of modifications of HDMF functions that are to be tested/used on this repo until propagation upstream."""
-from typing import Tuple
+import os
+import json
+import weakref
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from functools import lru_cache
+from importlib.util import find_spec
+from itertools import product
+from pathlib import Path
+from queue import Queue, Full
+from threading import Thread, Event, Condition, current_thread
+from time import perf_counter
+from typing import Callable, Tuple, Optional, Union
 
 import numpy as np
-from hdmf.data_utils import GenericDataChunkIterator as HDMFGenericDataChunkIterator
+from hdmf.data_utils import GenericDataChunkIterator as HDMFGenericDataChunkIterator, DataChunk, DataIO
+from hdmf.backends.hdf5 import HDF5IO
+from hdmf.backends.hdf5.h5_utils import H5DataIO, HDF5IODataChunkIteratorQueue
+from hdmf.build import GroupBuilder
+from pynwb import NWBFile, NWBHDF5IO
+
+from .memory_budget import get_memory_budget
+
+# The optional backends are only imported when they are used, so that importing neuroconv stays light
+HAVE_BLOSC = find_spec("hdf5plugin") is not None and find_spec("blosc") is not None
+BLOSC_INSTALL_MESSAGE = "Please install hdf5plugin and blosc to use Blosc compression! (pip install hdf5plugin blosc)"
+
+HAVE_HDMF_ZARR = find_spec("hdmf_zarr") is not None
+HDMF_ZARR_INSTALL_MESSAGE = "Please install hdmf-zarr to use the Zarr backend! (pip install hdmf-zarr)"
+
+# The registered HDF5 filter IDs of the hdf5plugin filters that compression="auto" may select
+BLOSC_FILTER_ID = 32001
+ZSTD_FILTER_ID = 32015
+BLOSC_COMPRESSOR_NAMES = ["blosclz", "lz4", "lz4hc", "snappy", "zlib", "zstd"]  # indexed by the Blosc compressor code
+
+
+class _PrefetchSentinel:
+    """Marks the end of the background read-ahead stream."""
+
+
+class _ReadAhead:
+    """The state shared between an iterator and its background read-ahead thread, which does not reference it."""
+
+    def __init__(self, prefetch_buffers: int, prefetch_gb: Optional[float]):
+        self.queue = Queue(maxsize=prefetch_buffers)
+        self.condition = Condition()
+        self.stop_event = Event()
+        self.max_queued_bytes = None if prefetch_gb is None else prefetch_gb * 1e9
+        self.queued_bytes = 0
+
+    def put(self, item, should_stop: Callable) -> bool:
+        """Block until the item is queued or iteration has been stopped; returns False in the latter case."""
+        while not should_stop():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+
+def _read_ahead(iterator_reference: weakref.ref, read_ahead: _ReadAhead):
+    """
+    Background loop reading the buffers of an iterator in order until exhausted, bounded by both queue length and memory.
+
+    The iterator is only referenced while a buffer is read from it, so that an abandoned iterator is still garbage
+    collected; the loop then stops.
+    """
+
+    def should_stop() -> bool:
+        return read_ahead.stop_event.is_set() or iterator_reference() is None
+
+    iterator = iterator_reference()
+    if iterator is None:
+        return
+    buffer_selection_generator = iterator.buffer_selection_generator
+    itemsize = iterator.dtype.itemsize
+    memory_budget = iterator.memory_budget
+    del iterator
+    try:
+        for buffer_selection in buffer_selection_generator:
+            buffer_bytes = np.prod([s.stop - s.start for s in buffer_selection]) * itemsize
+
+            wait_start = perf_counter()
+            with read_ahead.condition:
+                while (
+                    read_ahead.max_queued_bytes is not None
+                    and read_ahead.queued_bytes > 0
+                    and read_ahead.queued_bytes + buffer_bytes > read_ahead.max_queued_bytes
+                    and not should_stop()
+                ):
+                    read_ahead.condition.wait(timeout=0.1)
+                read_ahead.queued_bytes += buffer_bytes
+            # Only wait on the memory budget while the writer has queued buffers to make progress on
+            if not read_ahead.queue.empty() and not memory_budget.wait_for_room(
+                nbytes=buffer_bytes, should_stop=should_stop
+            ):
+                return
+            write_stall_time = perf_counter() - wait_start
+
+            iterator = iterator_reference()
+            if iterator is None or read_ahead.stop_event.is_set():
+                return
+            memory_budget.reserve(owner=iterator, nbytes=buffer_bytes)
+            read_start = perf_counter()
+            data = np.asarray(iterator._get_data(selection=buffer_selection))
+            iterator.read_time += perf_counter() - read_start
+            iterator.bytes_read += data.nbytes
+            if data.nbytes > buffer_bytes:  # Track the true size of what was read rather than the estimate
+                memory_budget.reserve(owner=iterator, nbytes=data.nbytes - buffer_bytes)
+            else:
+                memory_budget.release(owner=iterator, nbytes=buffer_bytes - data.nbytes)
+            del iterator
+            with read_ahead.condition:
+                read_ahead.queued_bytes += data.nbytes - buffer_bytes
+
+            wait_start = perf_counter()
+            queued = read_ahead.put(item=DataChunk(data=data, selection=buffer_selection), should_stop=should_stop)
+            write_stall_time += perf_counter() - wait_start
+            iterator = iterator_reference()
+            if not queued or iterator is None:
+                return
+            iterator.write_stall_time += write_stall_time
+            del iterator
+        read_ahead.put(item=_PrefetchSentinel(), should_stop=should_stop)
+    except BaseException as exception:  # Re-raised on the writing thread
+        read_ahead.put(item=exception, should_stop=should_stop)
 
 
 class GenericDataChunkIterator(HDMFGenericDataChunkIterator):
+    # Whether the reads of this iterator are shared with other iterators, such as through a cache of their common
+    # source; make_or_load_nwbfile then writes all iterators round-robin so that they advance together
+    shares_reads = False
+    # Whether this iterator should advance along with the others even though it shares no reads with them, such as to
+    # read ahead while they are written; make_or_load_nwbfile then also writes all iterators round-robin
+    writes_round_robin = False
+
+    def __init__(self, prefetch_buffers: int = 0, prefetch_gb: Optional[float] = None, **kwargs):
+        """
+        Break a dataset into buffers containing multiple chunks to be written into an HDF5 dataset.
+
+        Parameters
+        ----------
+        prefetch_buffers : int, optional
+            The number of buffers to read ahead on a background thread while the current buffer is being compressed
+            and written. The default of 0 disables prefetching and reads each buffer synchronously.
+        prefetch_gb : float, optional
+            The upper bound on the total size in gigabytes (GB) of buffers held by the read-ahead queue.
+            At least one buffer is always allowed in flight, regardless of this value.
+            The default is no bound beyond the number of `prefetch_buffers`.
+        **kwargs
+            Passed to the HDMF GenericDataChunkIterator; see
+            https://hdmf.readthedocs.io/en/stable/hdmf.data_utils.html#hdmf.data_utils.GenericDataChunkIterator
+            Unless a `buffer_shape` is given, the `buffer_gb` (1 GB by default) is shrunk so that the buffer being
+            written and those read ahead (`prefetch_buffers` queued and one more waiting for the queue) fit within the
+            process-wide memory budget together, as shared with every other iterator; see
+            neuroconv.tools.memory_budget. The buffers are fit again before the first one is read, since the
+            iterators of the other datasets written along with this one are usually created after it.
+        """
+        assert prefetch_buffers >= 0, f"prefetch_buffers ({prefetch_buffers}) must be greater than or equal to zero!"
+        assert prefetch_gb is None or prefetch_gb > 0, f"prefetch_gb ({prefetch_gb}) must be greater than zero!"
+        self.prefetch_buffers = prefetch_buffers
+        self.prefetch_gb = prefetch_gb
+        self.read_stall_time = 0.0
+        self.write_stall_time = 0.0
+        self.bytes_read = 0
+        self.read_time = 0.0
+        self.write_time = 0.0
+        self._buffer_returned_time = None
+        self._prefetch_thread = None
+        self._read_ahead = None
+        self._closed = False
+        self.memory_budget = get_memory_budget()
+        self._returned_buffer_bytes = 0
+        self.memory_budget.register(owner=self, buffers_held=self._get_buffers_held())
+        self._buffers_fitted = kwargs.get("buffer_shape") is not None
+        if not self._buffers_fitted:
+            self._requested_buffer_gb = 1.0 if kwargs.get("buffer_gb") is None else kwargs["buffer_gb"]
+            self._minimum_buffer_gb = self._get_minimum_buffer_gb(
+                chunk_shape=kwargs.get("chunk_shape"), chunk_mb=kwargs.get("chunk_mb")
+            )
+            kwargs.update(
+                buffer_gb=self.memory_budget.fit_buffer_gb(
+                    buffer_gb=self._requested_buffer_gb,
+                    buffers_held=self._get_buffers_held(),
+                    minimum_gb=self._minimum_buffer_gb,
+                    owner=self,
+                )
+            )
+        super().__init__(**kwargs)
+
+    def __del__(self):
+        if hasattr(self, "memory_budget"):
+            self.close()
+
+    def close(self):
+        """
+        Stop the iteration, including any read-ahead, and release the buffers held from the memory budget.
+
+        make_or_load_nwbfile closes every iterator once the NWBFile is written, even if the write failed, since an
+        iteration abandoned part of the way would otherwise keep its read-ahead thread and buffers alive.
+        """
+        self._closed = True
+        if self._prefetch_thread is not None:
+            self._stop_prefetching()
+        self.memory_budget.release(owner=self)
+        self.memory_budget.unregister(owner=self)
+
+    def _get_buffers_held(self) -> int:
+        """The number of buffers held at once; any being read ahead are a full queue plus one waiting for a slot."""
+        return self.prefetch_buffers + 2 if self.prefetch_buffers else 1
+
+    def _fit_buffers_to_budget(self):
+        """Shrink the default buffers to their share of the memory budget among every iterator, before the first read."""
+        if self._buffers_fitted:
+            return
+        self._buffers_fitted = True
+        buffer_gb = self.memory_budget.fit_buffer_gb(
+            buffer_gb=self._requested_buffer_gb,
+            buffers_held=self._get_buffers_held(),
+            minimum_gb=self._minimum_buffer_gb,
+            owner=self,
+        )
+        buffer_shape = tuple(int(x) for x in self._get_default_buffer_shape(buffer_gb=buffer_gb))
+        if buffer_shape == tuple(self.buffer_shape):
+            return
+
+        maxshape = tuple(self.maxshape)  # so that the generator, read by the read-ahead thread, does not reference self
+        self.buffer_shape = buffer_shape
+        self.num_buffers = int(
+            np.prod([np.ceil(axis / buffer_axis) for axis, buffer_axis in zip(maxshape, buffer_shape)])
+        )
+        self.buffer_selection_generator = (
+            tuple(
+                slice(start, min(start + buffer_axis, axis))
+                for start, buffer_axis, axis in zip(buffer_starts, buffer_shape, maxshape)
+            )
+            for buffer_starts in product(
+                *[range(0, axis, buffer_axis) for axis, buffer_axis in zip(maxshape, buffer_shape)]
+            )
+        )
+        if self.display_progress:
+            self.progress_bar.total = self.num_buffers
+            self.progress_bar.refresh()
+
+    def _get_minimum_buffer_gb(self, chunk_shape: Optional[tuple], chunk_mb: Optional[float]) -> float:
+        """The size of a single chunk, below which the buffers cannot shrink to fit the memory budget."""
+        if chunk_shape is not None:
+            return np.prod(chunk_shape) * np.dtype(self._get_dtype()).itemsize / 1e9
+        return (chunk_mb or 1.0) / 1e3
+
+    def __next__(self):
+        """Retrieve the next DataChunk object, timing how long the writer spent on the previous one."""
+        if self._buffer_returned_time is not None:
+            self.write_time += perf_counter() - self._buffer_returned_time
+            self._buffer_returned_time = None
+        self.memory_budget.release(owner=self, nbytes=self._returned_buffer_bytes)  # the buffer has been written
+        self._returned_buffer_bytes = 0
+        if self._closed:
+            raise StopIteration
+        self._fit_buffers_to_budget()
+        try:
+            data_chunk = self._next_data_chunk()
+        except BaseException:
+            self.memory_budget.release(owner=self)
+            self.memory_budget.unregister(owner=self)
+            raise
+        self._returned_buffer_bytes = np.asarray(data_chunk.data).nbytes
+        self._buffer_returned_time = perf_counter()
+        return data_chunk
+
+    def _next_data_chunk(self) -> DataChunk:
+        """Retrieve the next DataChunk object, from the read-ahead queue if prefetching is enabled."""
+        if not self.prefetch_buffers:
+            read_start = perf_counter()
+            data_chunk = super().__next__()
+            self.read_time += perf_counter() - read_start
+            self.bytes_read += np.asarray(data_chunk.data).nbytes
+            self.memory_budget.reserve(owner=self, nbytes=np.asarray(data_chunk.data).nbytes)
+            return data_chunk
+
+        if self._prefetch_thread is None:
+            self._start_prefetching()
+        if self.display_progress:
+            self.progress_bar.update(n=1)
+
+        wait_start = perf_counter()
+        data_chunk = self._read_ahead.queue.get()
+        self.read_stall_time += perf_counter() - wait_start
+
+        if isinstance(data_chunk, _PrefetchSentinel):
+            self._stop_prefetching()
+            if self.display_progress:
+                self.progress_bar.write("\n")  # Allows text to be written to new lines after completion
+            raise StopIteration
+        if isinstance(data_chunk, BaseException):
+            self._stop_prefetching()
+            raise data_chunk
+
+        with self._read_ahead.condition:
+            self._read_ahead.queued_bytes -= data_chunk.data.nbytes
+            self._read_ahead.condition.notify_all()
+        return data_chunk
+
+    def read_selection(self, selection: Tuple[slice]) -> np.ndarray:
+        """
+        Read any selection of the data without advancing the iteration, such as to sample it before it is written.
+
+        Parameters
+        ----------
+        selection : tuple of slices
+            The slice of each axis of the data to read.
+
+        Returns
+        -------
+        data : numpy.ndarray
+        """
+        return np.asarray(self._get_data(selection=selection))
+
+    def get_io_statistics(self) -> dict:
+        """
+        Report how much data was read, and how long was spent reading it and writing it.
+
+        Returns
+        -------
+        io_statistics : dict
+            'bytes_read' is the total size of the buffers read. 'read_time' is the total time in seconds spent reading
+            them, on the background thread when prefetching. 'write_time' is the total time in seconds between
+            returning each buffer and the next being requested; that is, spent compressing and writing it.
+        """
+        return dict(bytes_read=self.bytes_read, read_time=self.read_time, write_time=self.write_time)
+
+    def get_stall_times(self) -> dict:
+        """
+        Report how long the iteration has stalled on either side of the read-ahead queue.
+
+        Returns
+        -------
+        stall_times : dict
+            'read_stall_time' is the total time in seconds the writer spent waiting on data to be read.
+            'write_stall_time' is the total time in seconds the background reader spent waiting on the writer to
+            consume its buffers. Both are zero when prefetching is disabled.
+        """
+        return dict(read_stall_time=self.read_stall_time, write_stall_time=self.write_stall_time)
+
+    def _start_prefetching(self):
+        self._read_ahead = _ReadAhead(prefetch_buffers=self.prefetch_buffers, prefetch_gb=self.prefetch_gb)
+        self._prefetch_thread = Thread(
+            target=_read_ahead,
+            kwargs=dict(iterator_reference=weakref.ref(self), read_ahead=self._read_ahead),
+            name=f"{type(self).__name__}Prefetch",
+            daemon=True,
+        )
+        self._prefetch_thread.start()
+
+    def _stop_prefetching(self):
+        self._read_ahead.stop_event.set()
+        with self._read_ahead.condition:
+            self._read_ahead.condition.notify_all()
+        if self._prefetch_thread is not current_thread():  # unless collected once the thread let go of it
+            self._prefetch_thread.join()
+        self.memory_budget.release(owner=self)  # including any buffers left on the queue
+
     def _get_default_buffer_shape(self, buffer_gb: float = 1.0) -> Tuple[int]:
         num_axes = len(self.maxshape)
         chunk_bytes = np.prod(self.chunk_shape) * self.dtype.itemsize
@@ -90,3 +446,431 @@ class SliceableDataChunkIterator(GenericDataChunkIterator):
 
     def _get_data(self, selection: Tuple[slice]) -> np.ndarray:
         return self.data[selection]
+
+
+def _compress_chunk(chunk: np.ndarray, compression: str, compression_opts: Union[int, dict, None], shuffle: bool):
+    """Encode a single full-size chunk exactly as the equivalent HDF5 filter pipeline would store it."""
+    chunk = np.ascontiguousarray(chunk)
+    if compression == "blosc":
+        import blosc
+
+        blosc_opts = dict(dict(cname="lz4", clevel=5, shuffle=blosc.SHUFFLE), **(compression_opts or dict()))
+        return blosc.compress(chunk.tobytes(), typesize=chunk.itemsize, **blosc_opts)
+
+    # The HDF5 shuffle filter groups the n-th byte of every element together before deflating
+    chunk_bytes = chunk.view(np.uint8).reshape(-1, chunk.itemsize).T.tobytes() if shuffle else chunk.tobytes()
+    return zlib.compress(chunk_bytes, 4 if compression_opts is None else compression_opts)
+
+
+class DirectChunkWriteH5DataIO(H5DataIO):
+    """
+    H5DataIO that compresses chunks from a GenericDataChunkIterator in parallel and commits them with direct writes.
+
+    HDF5 applies its filter pipeline to one chunk at a time on a single core. This class instead requests an empty
+    chunked dataset with the usual filters, encodes each chunk in a pool of workers, and writes the encoded bytes
+    with H5Dwrite_chunk. The resulting dataset is indistinguishable from one written through the filter pipeline.
+    """
+
+    def __init__(
+        self,
+        data: HDMFGenericDataChunkIterator,
+        compression: str = "gzip",
+        compression_opts: Union[int, dict, None] = None,
+        shuffle: bool = False,
+        number_of_jobs: int = -1,
+        use_processes: bool = False,
+    ):
+        """
+        Wrap a data chunk iterator for parallel compression.
+
+        Parameters
+        ----------
+        data : GenericDataChunkIterator
+            The iterator over the data to write. Its chunk_shape determines the chunking of the dataset.
+        compression : {'gzip', 'blosc'}, optional
+            The filter to apply. 'blosc' requires the hdf5plugin and blosc packages. The default is 'gzip'.
+        compression_opts : int or dict, optional
+            For 'gzip', the compression level (0 - 9; defaults to 4).
+            For 'blosc', a dictionary with any of the keys 'cname', 'clevel', and 'shuffle'
+            (defaults to dict(cname="lz4", clevel=5, shuffle=blosc.SHUFFLE)).
+        shuffle : bool, optional
+            Whether to apply the HDF5 shuffle filter before 'gzip' compression. The default is False.
+        number_of_jobs : int, optional
+            The number of workers that compress chunks. The default of -1 uses all available cores.
+        use_processes : bool, optional
+            Whether to compress in a pool of processes instead of threads. Both zlib and Blosc release the GIL, so
+            threads (the default) avoid the cost of copying every chunk to another process.
+        """
+        assert compression in ["gzip", "blosc"], f"compression ({compression}) must be either 'gzip' or 'blosc'!"
+        assert isinstance(
+            data, HDMFGenericDataChunkIterator
+        ), "Parallel compression requires the data to be wrapped in a GenericDataChunkIterator!"
+        assert not (shuffle and compression == "blosc"), "Set the shuffle of 'blosc' through 'compression_opts'!"
+        if compression == "blosc":
+            assert HAVE_BLOSC, BLOSC_INSTALL_MESSAGE
+        self.data_chunk_iterator = data
+        self.compression = compression
+        self.compression_opts = compression_opts
+        self.shuffle = shuffle
+        self.number_of_jobs = os.cpu_count() if number_of_jobs == -1 else number_of_jobs
+        self.use_processes = use_processes
+
+        h5_filter_kwargs = dict(compression=compression, compression_opts=compression_opts, shuffle=shuffle)
+        if compression == "blosc":
+            import hdf5plugin
+
+            blosc_opts = dict(compression_opts or dict())
+            h5_blosc_filter = hdf5plugin.Blosc(
+                cname=blosc_opts.get("cname", "lz4"),
+                clevel=blosc_opts.get("clevel", 5),
+                shuffle=blosc_opts.get("shuffle", hdf5plugin.Blosc.SHUFFLE),
+            )
+            h5_filter_kwargs = dict(
+                compression=h5_blosc_filter.filter_id,
+                compression_opts=h5_blosc_filter.filter_options,
+                allow_plugin_filters=True,
+            )
+        super().__init__(
+            shape=data.maxshape,
+            dtype=data.dtype,
+            chunks=data.chunk_shape,
+            maxshape=data.maxshape,
+            **h5_filter_kwargs,
+        )
+
+    @property
+    def maxshape(self):
+        return self.shape
+
+    @H5DataIO.dataset.setter
+    def dataset(self, dataset):
+        """Called by the HDF5 backend once the empty dataset has been created; this is when the data is written."""
+        H5DataIO.dataset.fset(self, dataset)
+        self._write_direct_chunks(dataset=dataset)
+
+    def _iter_chunks(self, data_chunk: DataChunk):
+        """Split a buffer into its full-size chunks, zero padding those on the edges of the dataset."""
+        chunk_shape = self.data_chunk_iterator.chunk_shape
+        chunk_ranges = [
+            range(selection.start, selection.stop, chunk_axis)
+            for selection, chunk_axis in zip(data_chunk.selection, chunk_shape)
+        ]
+        for chunk_offset in product(*chunk_ranges):
+            buffer_slices = tuple(
+                slice(offset - selection.start, offset - selection.start + chunk_axis)
+                for offset, selection, chunk_axis in zip(chunk_offset, data_chunk.selection, chunk_shape)
+            )
+            chunk = data_chunk.data[buffer_slices]
+            if chunk.shape != chunk_shape:
+                padded_chunk = np.zeros(shape=chunk_shape, dtype=self.data_chunk_iterator.dtype)
+                padded_chunk[tuple(slice(0, axis_length) for axis_length in chunk.shape)] = chunk
+                chunk = padded_chunk
+            yield chunk_offset, np.asarray(chunk, dtype=self.data_chunk_iterator.dtype)
+
+    def _write_direct_chunks(self, dataset):
+        """Compress the chunks of one buffer while the next buffer is being read, then commit them in order."""
+        executor_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        with executor_class(max_workers=self.number_of_jobs) as executor:
+            pending_chunks = []
+            for data_chunk in self.data_chunk_iterator:
+                submitted_chunks = [
+                    (
+                        chunk_offset,
+                        executor.submit(_compress_chunk, chunk, self.compression, self.compression_opts, self.shuffle),
+                    )
+                    for chunk_offset, chunk in self._iter_chunks(data_chunk=data_chunk)
+                ]
+                for chunk_offset, future in pending_chunks:
+                    dataset.id.write_direct_chunk(chunk_offset, future.result())
+                pending_chunks = submitted_chunks
+            for chunk_offset, future in pending_chunks:
+                dataset.id.write_direct_chunk(chunk_offset, future.result())
+
+
+def _get_zarr_data_io(data_io: H5DataIO) -> "ZarrDataIO":
+    """Translate the HDF5 storage settings of an H5DataIO into the nearest equivalent ZarrDataIO."""
+    import numcodecs
+    from hdmf_zarr.utils import ZarrDataIO
+
+    if isinstance(data_io, DirectChunkWriteH5DataIO):
+        data = data_io.data_chunk_iterator
+        compression, compression_opts, shuffle = data_io.compression, data_io.compression_opts, data_io.shuffle
+    else:
+        data = data_io.data
+        compression = data_io.io_settings.get("compression")
+        compression_opts = data_io.io_settings.get("compression_opts")
+        shuffle = data_io.io_settings.get("shuffle", False)
+
+    zarr_kwargs = dict()
+    chunks = data_io.io_settings.get("chunks")
+    if isinstance(chunks, (list, tuple)):
+        zarr_kwargs.update(chunks=chunks)
+    if compression in [None, False]:
+        zarr_kwargs.update(compressor=False)
+    elif compression == "gzip":
+        zarr_kwargs.update(compressor=numcodecs.GZip(level=4 if compression_opts is None else compression_opts))
+    elif compression == "blosc":
+        zarr_kwargs.update(
+            compressor=numcodecs.Blosc(**dict(dict(cname="lz4", clevel=5), **(compression_opts or dict())))
+        )
+    elif compression == BLOSC_FILTER_ID:  # the options of the HDF5 Blosc filter end with the level, shuffle, and codec
+        clevel, blosc_shuffle, compressor_code = compression_opts[-3:]
+        zarr_kwargs.update(
+            compressor=numcodecs.Blosc(
+                cname=BLOSC_COMPRESSOR_NAMES[compressor_code], clevel=clevel, shuffle=blosc_shuffle
+            )
+        )
+    elif compression == ZSTD_FILTER_ID:
+        zarr_kwargs.update(compressor=numcodecs.Zstd(level=compression_opts[0] if compression_opts else 3))
+    else:  # Filters without a Zarr counterpart (such as 'lzf') fall back to the default Zarr compressor
+        zarr_kwargs.update(compressor=True)
+    if shuffle:
+        zarr_kwargs.update(
+            filters=[numcodecs.Shuffle(elementsize=np.dtype(getattr(data, "dtype", "float64")).itemsize)]
+        )
+    zarr_data_io = ZarrDataIO(data=data, **zarr_kwargs)
+    zarr_data_io.codec_selection = getattr(data_io, "codec_selection", None)
+    return zarr_data_io
+
+
+def _replace_dci_queue(io, io_class: type, dci_queue):
+    """
+    Replace the queue of DataChunkIterators that an HDMF IO exhausts at the end of every write.
+
+    Neither HDF5IO nor ZarrIO exposes this queue (as of hdmf 3.4 and hdmf-zarr 0.3), so it is swapped through the
+    name-mangled attribute that their `write` methods read. If a release renames it, fail here rather than silently
+    write with the default queue.
+    """
+    attribute_name = f"_{io_class.__name__}__dci_queue"
+    assert isinstance(getattr(io, attribute_name, None), type(dci_queue).__mro__[1]), (
+        f"{io_class.__name__} no longer stores its queue of DataChunkIterators in '{attribute_name}'; "
+        "this version of hdmf is not supported by the customized IO!"
+    )
+    setattr(io, attribute_name, dci_queue)
+
+
+@lru_cache(maxsize=None)
+def _get_parallel_zarr_io_classes() -> dict:
+    """Define the Zarr IO classes on first use, so that hdmf-zarr is only imported with the Zarr backend."""
+    from hdmf_zarr.backend import ZarrIO
+    from hdmf_zarr.nwb import NWBZarrIO
+    from hdmf_zarr.utils import ZarrIODataChunkIteratorQueue
+
+    class ParallelZarrIODataChunkIteratorQueue(ZarrIODataChunkIteratorQueue):
+        """
+        Exhausts queued DataChunkIterators with a pool of threads that encode and store chunks concurrently.
+
+        Buffers of a GenericDataChunkIterator always span whole chunks of the Zarr array (except at its end), so every
+        buffer maps to its own set of chunk files and can be written without any locking. The queued iterators are still
+        read round-robin from a single thread; all other iterators are written serially as usual.
+        """
+
+        def __init__(self, number_of_jobs: int = 1):
+            self.number_of_jobs = os.cpu_count() if number_of_jobs == -1 else number_of_jobs
+            super().__init__()
+
+        @staticmethod
+        def _is_chunk_aligned(dataset, data) -> bool:
+            if isinstance(data, GenericDataChunkIterator):
+                data._fit_buffers_to_budget()
+            return isinstance(data, HDMFGenericDataChunkIterator) and all(
+                buffer_axis % chunk_axis == 0 for buffer_axis, chunk_axis in zip(data.buffer_shape, dataset.chunks)
+            )
+
+        def exhaust_queue(self):
+            if self.number_of_jobs == 1:
+                return super().exhaust_queue()
+
+            max_pending_buffers = 2 * self.number_of_jobs  # bounds the number of buffers held in memory
+            with ThreadPoolExecutor(max_workers=self.number_of_jobs) as executor:
+                pending_writes = set()
+                while len(self) > 0:
+                    dataset, data = self.popleft()
+                    if not self._is_chunk_aligned(dataset=dataset, data=data):
+                        if self.__write_chunk__(dataset, data):
+                            self.append(dataset=dataset, data=data)
+                        continue
+
+                    try:
+                        data_chunk = next(data)
+                    except StopIteration:
+                        continue
+                    if len(pending_writes) >= max_pending_buffers:
+                        done_writes, pending_writes = wait(pending_writes, return_when=FIRST_COMPLETED)
+                        for done_write in done_writes:
+                            done_write.result()
+                    pending_writes.add(executor.submit(dataset.__setitem__, data_chunk.selection, data_chunk.data))
+                    self.append(dataset=dataset, data=data)
+                for pending_write in pending_writes:
+                    pending_write.result()
+
+    class ParallelNWBZarrIO(NWBZarrIO):
+        """
+        NWBZarrIO that writes the chunks of large datasets with several workers at once.
+
+        Datasets wrapped in an H5DataIO by the conversion tools are written with the equivalent Zarr compressor, so the
+        same in-memory NWBFile can be written to either backend.
+        """
+
+        def __init__(self, number_of_jobs: int = 1, **kwargs):
+            super().__init__(**kwargs)
+            _replace_dci_queue(
+                io=self, io_class=ZarrIO, dci_queue=ParallelZarrIODataChunkIteratorQueue(number_of_jobs=number_of_jobs)
+            )
+
+        def write_dataset(self, **kwargs):
+            data = kwargs["builder"].data if kwargs.get("force_data") is None else kwargs["force_data"]
+            if isinstance(data, H5DataIO):
+                kwargs.update(force_data=_get_zarr_data_io(data_io=data))
+            return super().write_dataset(**kwargs)
+
+    return dict(
+        ParallelZarrIODataChunkIteratorQueue=ParallelZarrIODataChunkIteratorQueue, ParallelNWBZarrIO=ParallelNWBZarrIO
+    )
+
+
+def __getattr__(name: str):
+    if name in ["ParallelZarrIODataChunkIteratorQueue", "ParallelNWBZarrIO"]:
+        assert HAVE_HDMF_ZARR, HDMF_ZARR_INSTALL_MESSAGE
+        return _get_parallel_zarr_io_classes()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_checkpoint_file_path(nwbfile_path) -> Path:
+    """The location of the checkpoint recorded by a resumable write of the NWBFile at 'nwbfile_path'."""
+    nwbfile_path = Path(nwbfile_path)
+    return nwbfile_path.with_name(f"{nwbfile_path.name}.checkpoint.json")
+
+
+def load_checkpoint(checkpoint_file_path) -> Optional[dict]:
+    """Load a checkpoint recorded by a resumable write, or return None if there is none."""
+    checkpoint_file_path = Path(checkpoint_file_path)
+    if not checkpoint_file_path.is_file():
+        return None
+    with open(file=checkpoint_file_path, mode="r") as file:
+        return json.load(file)
+
+
+def _describe_data_chunk_iterator(data) -> dict:
+    """The layout of the buffers of an iterator, which must be unchanged for its progress to be resumed."""
+    if isinstance(data, GenericDataChunkIterator):
+        data._fit_buffers_to_budget()  # as it would before its first buffer is read
+    if isinstance(data, HDMFGenericDataChunkIterator):
+        return dict(maxshape=[int(x) for x in data.maxshape], buffer_shape=[int(x) for x in data.buffer_shape])
+    return dict()
+
+
+class CheckpointedHDF5IODataChunkIteratorQueue(HDF5IODataChunkIteratorQueue):
+    """
+    Exhausts queued DataChunkIterators round-robin, recording every committed buffer in a checkpoint file.
+
+    HDF5IO only queues the iterators once the rest of the file (groups, attributes, and references) has been written,
+    so the checkpoint records that the structure is complete, then the number of buffers committed to each dataset.
+    The file is flushed before each update of the checkpoint, which is itself replaced atomically.
+    """
+
+    def __init__(self, checkpoint_file_path: Path, checkpoint: Optional[dict] = None):
+        self.checkpoint_file_path = Path(checkpoint_file_path)
+        self.checkpoint = checkpoint or dict(structure_written=False, datasets=dict())
+        super().__init__()
+
+    def write_checkpoint(self):
+        temporary_file_path = self.checkpoint_file_path.with_name(f"{self.checkpoint_file_path.name}.tmp")
+        with open(file=temporary_file_path, mode="w") as file:
+            json.dump(self.checkpoint, file, indent=4)
+        os.replace(temporary_file_path, self.checkpoint_file_path)
+
+    def exhaust_queue(self):
+        datasets = self.checkpoint["datasets"]
+        for dataset, data in self:
+            datasets.setdefault(
+                dataset.name, dict(committed_buffers=0, complete=False, **_describe_data_chunk_iterator(data=data))
+            )
+        if len(self) > 0:
+            self[0][0].file.flush()
+        self.checkpoint.update(structure_written=True)
+        self.write_checkpoint()
+
+        while len(self) > 0:
+            dataset, data = self.popleft()
+            if self._write_chunk(dataset, data):
+                self.append(dataset=dataset, data=data)
+                datasets[dataset.name]["committed_buffers"] += 1
+            else:
+                datasets[dataset.name]["complete"] = True
+            dataset.file.flush()
+            self.write_checkpoint()
+
+
+def _iter_dataset_builders(group_builder: GroupBuilder, path: str = "", object_id: Optional[str] = None):
+    """Yield the HDF5 path, builder, and the object_id of the nearest typed parent of every dataset in a group."""
+    object_id = group_builder.attributes.get("object_id", object_id)
+    for name, dataset_builder in group_builder.datasets.items():
+        yield f"{path}/{name}", dataset_builder, dataset_builder.attributes.get("object_id", object_id)
+    for name, sub_group_builder in group_builder.groups.items():
+        yield from _iter_dataset_builders(group_builder=sub_group_builder, path=f"{path}/{name}", object_id=object_id)
+
+
+class ResumableNWBHDF5IO(NWBHDF5IO):
+    """
+    NWBHDF5IO that checkpoints the progress of writing DataChunkIterators, and can resume a write that was interrupted.
+
+    Only iterators queued by HDF5IO, which is how they are written with `exhaust_dci=False`, are checkpointed; data
+    written any other way (such as by a DirectChunkWriteH5DataIO) is part of the structure of the file. The buffers of
+    a GenericDataChunkIterator are resumed from the last one committed; any other iterator is rewritten from its start.
+    """
+
+    def __init__(self, checkpoint_file_path, **kwargs):
+        super().__init__(**kwargs)
+        self.checkpoint_file_path = Path(checkpoint_file_path)
+        # A new file starts a new checkpoint; otherwise the write being resumed is described by the existing one
+        checkpoint = None if kwargs.get("mode", "r") == "w" else load_checkpoint(self.checkpoint_file_path)
+        assert checkpoint is not None or kwargs.get("mode", "r") == "w", f"There is no checkpoint of {self.source}!"
+        _replace_dci_queue(
+            io=self,
+            io_class=HDF5IO,
+            dci_queue=CheckpointedHDF5IODataChunkIteratorQueue(
+                checkpoint_file_path=self.checkpoint_file_path, checkpoint=checkpoint
+            ),
+        )
+
+    def write(self, container, **kwargs):
+        self._HDF5IO__dci_queue.write_checkpoint()  # so that a file interrupted before its structure is discarded
+        super().write(container, **kwargs)
+
+    def resume(self, nwbfile: NWBFile):
+        """
+        Finish writing the datasets of an interrupted write, as recorded in the checkpoint.
+
+        Parameters
+        ----------
+        nwbfile : NWBFile
+            The in-memory NWBFile object, constructed exactly as it was for the interrupted write.
+            Only the data of its unfinished DataChunkIterators is read.
+        """
+        queue = self._HDF5IO__dci_queue
+        assert queue.checkpoint[
+            "structure_written"
+        ], f"The write of {self.source} was interrupted before its structure was complete; it cannot be resumed!"
+
+        builder = self.manager.build(nwbfile, source=self.source, root=True)
+        dataset_builders = {
+            dataset_path: dataset_builder for dataset_path, dataset_builder, _ in _iter_dataset_builders(builder)
+        }
+        for dataset_path, dataset_progress in queue.checkpoint["datasets"].items():
+            if dataset_progress["complete"]:
+                continue
+            assert dataset_path in dataset_builders, f"'{dataset_path}' is missing from the NWBFile; cannot resume!"
+            data = dataset_builders[dataset_path].data
+            data = data.data if isinstance(data, DataIO) else data
+            dataset_layout = _describe_data_chunk_iterator(data=data)
+            assert all(
+                dataset_progress.get(key) == value for key, value in dataset_layout.items()
+            ), f"The buffers of '{dataset_path}' no longer match those of the checkpoint; cannot resume!"
+            if isinstance(data, HDMFGenericDataChunkIterator):
+                for _ in range(dataset_progress["committed_buffers"]):
+                    next(data.buffer_selection_generator)
+            else:
+                dataset_progress.update(committed_buffers=0)
+            queue.append(dataset=self._file[dataset_path], data=data)
+        queue.exhaust_queue()
@@ -0,0 +1,177 @@
+"""Record where the time, bytes, and memory of a conversion go."""
+import json
+from contextlib import contextmanager, nullcontext
+from threading import Event, Thread
+from time import perf_counter
+from typing import Callable, Optional
+
+import psutil
+from hdmf.data_utils import DataIO
+from pynwb import NWBFile
+
+from .hdmf import DirectChunkWriteH5DataIO, GenericDataChunkIterator, _iter_dataset_builders
+from .memory_budget import get_memory_budget
+from ..utils import FilePathType
+
+
+def _measure(instrumentation: Optional["ConversionInstrumentation"], stage: str, name: Optional[str] = None):
+    """Measure a stage with the instrumentation, or do nothing if there is none."""
+    return nullcontext() if instrumentation is None else instrumentation.measure(stage=stage, name=name)
+
+
+class ConversionInstrumentation:
+    """
+    Collects timing, throughput, and memory events from `NWBConverter.run_conversion` and `make_or_load_nwbfile`.
+
+    Each event is a dictionary with the 'stage' it measures ('get_metadata', 'validate_metadata',
+    'validate_conversion_options', 'interface', 'write', or 'dataset'), a 'name', its 'wall_time' in seconds, and
+    the 'peak_rss_bytes' of the process during that stage. The 'interface' stage times the `run_conversion` of each
+    data interface, which adds its data to the in-memory NWBFile, while the large datasets are typically only read,
+    compressed, and written during the 'write' stage. Once written, every dataset whose data was a neuroconv
+    GenericDataChunkIterator gets a 'dataset' event named by its path in the file, with the 'source' interface,
+    the 'bytes_read' from the source, the 'bytes_written' to storage, the 'read_time' and 'write_time' (which
+    includes compression), and the 'read_rate_mb' and 'write_rate_mb' in MB/s of uncompressed data. HDF5 compresses
+    chunks when they leave its chunk cache, so the chunks still cached at the end only count toward 'write'.
+    Datasets whose compression was selected automatically (compression="auto") also get a 'codec' event with the
+    'source' interface, the 'policy', the 'selected' filter, and the ratio and rate measured for every 'candidate'.
+    """
+
+    def __init__(self, callback: Optional[Callable[[dict], None]] = None, memory_sampling_interval: float = 0.05):
+        """
+        Start collecting events.
+
+        Parameters
+        ----------
+        callback : callable, optional
+            Called with each event as soon as it is recorded; for instance, `print` or a logging function.
+        memory_sampling_interval : float, optional
+            The interval in seconds at which the resident memory of the process is sampled during each stage.
+            The default is 0.05.
+        """
+        self.callback = callback
+        self.memory_sampling_interval = memory_sampling_interval
+        self.events = []
+        self.container_sources = dict()
+        self._process = psutil.Process()
+
+    def record(self, event: dict):
+        self.events.append(event)
+        if self.callback is not None:
+            self.callback(event)
+
+    @contextmanager
+    def measure(self, stage: str, name: Optional[str] = None):
+        """Record the wall time and peak resident memory of the body of the context as one event."""
+        peak_rss_bytes = self._process.memory_info().rss
+        stop_sampling = Event()
+
+        def sample_memory():
+            nonlocal peak_rss_bytes
+            while not stop_sampling.wait(timeout=self.memory_sampling_interval):
+                peak_rss_bytes = max(peak_rss_bytes, self._process.memory_info().rss)
+
+        sampling_thread = Thread(target=sample_memory, name=f"{type(self).__name__}Sampler", daemon=True)
+        sampling_thread.start()
+        start_time = perf_counter()
+        try:
+            yield
+        finally:
+            wall_time = perf_counter() - start_time
+            stop_sampling.set()
+            sampling_thread.join()
+            peak_rss_bytes = max(peak_rss_bytes, self._process.memory_info().rss)
+            self.record(dict(stage=stage, name=name, wall_time=wall_time, peak_rss_bytes=peak_rss_bytes))
+
+    def label_containers(self, nwbfile: NWBFile, source: Optional[str]):
+        """Attribute all containers of the NWBFile which do not have a source yet to the given one."""
+        for container in nwbfile.all_children():
+            self.container_sources.setdefault(container.object_id, source)
+
+    def record_datasets(self, root_builder, root):
+        """
+        Record the throughput of every dataset written from a neuroconv GenericDataChunkIterator, and the codec
+        selected for every dataset compressed with compression="auto".
+
+        Parameters
+        ----------
+        root_builder : GroupBuilder
+            The builder the NWBFile was written from.
+        root : h5py.File or zarr.Group
+            The open root of the written file.
+        """
+        for path, dataset_builder, object_id in _iter_dataset_builders(group_builder=root_builder):
+            data = dataset_builder.data
+            codec_selection = getattr(data, "codec_selection", None)
+            if codec_selection is not None:
+                self.record(
+                    dict(
+                        stage="codec",
+                        name=path,
+                        source=self.container_sources.get(object_id),
+                        policy=codec_selection["policy"],
+                        selected=codec_selection["name"],
+                        candidates=[
+                            dict(name=candidate["name"], ratio=candidate["ratio"], rate_mb=candidate["rate_mb"])
+                            for candidate in codec_selection["candidates"]
+                        ],
+                    )
+                )
+            if isinstance(data, DirectChunkWriteH5DataIO):
+                data = data.data_chunk_iterator
+            elif isinstance(data, DataIO):
+                data = data.data
+            if not isinstance(data, GenericDataChunkIterator):
+                continue
+
+            dataset = root[path]
+            bytes_written = (
+                dataset.nbytes_stored if hasattr(dataset, "nbytes_stored") else dataset.id.get_storage_size()
+            )
+            self.record(
+                dict(
+                    stage="dataset",
+                    name=path,
+                    source=self.container_sources.get(object_id),
+                    bytes_read=data.bytes_read,
+                    bytes_written=int(bytes_written),
+                    read_time=data.read_time,
+                    write_time=data.write_time,
+                    read_rate_mb=data.bytes_read / 1e6 / data.read_time if data.read_time else None,
+                    write_rate_mb=data.bytes_read / 1e6 / data.write_time if data.write_time else None,
+                )
+            )
+
+    def get_report(self) -> dict:
+        """
+        Summarize the events recorded so far.
+
+        Returns
+        -------
+        report : dict
+            'events' lists every event in the order they were recorded. 'interfaces' gives for each data interface
+            the 'wall_time' of its `run_conversion` and the total 'bytes_read', 'bytes_written', 'read_time', and
+            'write_time' of its datasets. 'wall_time' and 'peak_rss_bytes' cover all stages. 'memory_budget' is the
+            current usage of the memory budget the buffers of iterators are reserved from.
+        """
+        interfaces = dict()
+        for event in self.events:
+            if event["stage"] == "interface":
+                interfaces.setdefault(event["name"], dict(bytes_read=0, bytes_written=0, read_time=0.0, write_time=0.0))
+                interfaces[event["name"]].update(wall_time=event["wall_time"])
+        for event in self.events:
+            if event["stage"] == "dataset" and event["source"] in interfaces:
+                for key in ["bytes_read", "bytes_written", "read_time", "write_time"]:
+                    interfaces[event["source"]][key] += event[key]
+        stage_events = [event for event in self.events if event["stage"] not in ["dataset", "codec"]]
+        return dict(
+            events=self.events,
+            interfaces=interfaces,
+            wall_time=sum(event["wall_time"] for event in stage_events),
+            peak_rss_bytes=max((event["peak_rss_bytes"] for event in stage_events), default=None),
+            memory_budget=get_memory_budget().get_usage(),
+        )
+
+    def write_report(self, file_path: FilePathType):
+        """Write the summary of `get_report` to a JSON file."""
+        with open(file=file_path, mode="w") as file:
+            json.dump(self.get_report(), file, indent=4)
@@ -0,0 +1,206 @@
+"""A process-wide bound on the memory held by the buffers of all neuroconv data chunk iterators."""
+from threading import Condition
+from typing import Callable, Optional
+from weakref import WeakKeyDictionary
+
+import psutil
+
+
+class MemoryBudget:
+    """
+    Tracks the bytes of the buffers that data chunk iterators hold in memory, against a total they all share.
+
+    Every neuroconv GenericDataChunkIterator registers the number of buffers it holds at once, and shrinks its default
+    buffer shape so that those fit within both what is left of the total and an equal share of it among the buffers
+    of every iterator registered, which is fit again once the first buffer is read, by when the iterators of the other
+    datasets written along with it are usually registered as well. It then reserves each buffer it reads, and releases
+    it once the next buffer is requested. The read-ahead of an iterator waits for memory to be released before exceeding the
+    total. The buffer being written is always granted without waiting, so that concurrent iterators can never wait on
+    each other indefinitely; the budget therefore counts that buffer but does not bound it, and the reserved bytes
+    may exceed the total by up to one buffer per iterator being written at once.
+    """
+
+    def __init__(self, total_gb: Optional[float] = None):
+        """
+        Create a memory budget.
+
+        Parameters
+        ----------
+        total_gb : float, optional
+            The total size in gigabytes (GB) of the buffers that may be held at once.
+            The default is the memory available to the system when the budget is created.
+        """
+        assert total_gb is None or total_gb > 0, f"total_gb ({total_gb}) must be greater than zero!"
+        self.total_bytes = int(psutil.virtual_memory().available if total_gb is None else total_gb * 1e9)
+        self.reserved_bytes = 0
+        self.peak_reserved_bytes = 0
+        self._reservations = dict()
+        self._registrations = WeakKeyDictionary()  # the number of buffers held at once by each registered owner
+        self._condition = Condition()
+
+    @property
+    def available_bytes(self) -> int:
+        return max(self.total_bytes - self.reserved_bytes, 0)
+
+    def register(self, owner: object, buffers_held: int = 1):
+        """Count the buffers an owner, such as an iterator, holds at once among those sharing the budget."""
+        with self._condition:
+            self._registrations[owner] = buffers_held
+
+    def unregister(self, owner: object):
+        """Stop counting the buffers of an owner, such as an iterator that has been exhausted."""
+        with self._condition:
+            self._registrations.pop(owner, None)
+
+    def fit_buffer_gb(
+        self, buffer_gb: float, buffers_held: int = 1, minimum_gb: float = 0.0, owner: Optional[object] = None
+    ) -> float:
+        """
+        Shrink the size of the buffers of an iterator so that all those it holds at once fit within the budget.
+
+        The buffers are sized against the bytes still available, so that a new iterator does not claim memory
+        already reserved by the buffers of others, and against an equal share of the total among the buffers of every
+        registered owner, so that iterators sized before any of them reserves its buffers do not all claim the total.
+
+        Parameters
+        ----------
+        buffer_gb : float
+            The requested size in gigabytes (GB) of each buffer.
+        buffers_held : int, optional
+            The number of buffers the iterator holds at once; that is, the one being written plus those read ahead.
+            The default is 1.
+        minimum_gb : float, optional
+            The size below which the budget does not shrink a buffer, such as that of a single chunk.
+            The default is 0.
+        owner : object, optional
+            The iterator the buffers are for, so that its own registration is not counted twice.
+
+        Returns
+        -------
+        buffer_gb : float
+            Never greater than the requested size.
+        """
+        with self._condition:
+            registered_buffers = sum(self._registrations.values())
+            if owner is None or owner not in self._registrations:
+                registered_buffers += buffers_held
+            share_bytes = min(self.available_bytes / buffers_held, self.total_bytes / registered_buffers)
+        return min(buffer_gb, max(share_bytes / 1e9, minimum_gb))
+
+    def reserve(self, owner: object, nbytes: int, wait: bool = False, should_stop: Optional[Callable] = None) -> bool:
+        """
+        Reserve bytes of the budget on behalf of an owner, such as an iterator.
+
+        Parameters
+        ----------
+        owner : object
+            What the bytes are reserved for; `release` frees them by the same owner.
+        nbytes : int
+            The number of bytes to reserve.
+        wait : bool, optional
+            Whether to wait until the reservation fits within the budget. Otherwise, it is granted immediately even if
+            that exceeds the budget. The default is False.
+        should_stop : callable, optional
+            While waiting, called regularly to check whether to give up on the reservation.
+
+        Returns
+        -------
+        reserved : bool
+            False only if waiting was given up on through `should_stop`.
+        """
+        nbytes = int(nbytes)
+        with self._condition:
+            if wait and not self._wait_for_room(nbytes=nbytes, should_stop=should_stop):
+                return False
+            self._reservations[id(owner)] = self._reservations.get(id(owner), 0) + nbytes
+            self.reserved_bytes += nbytes
+            self.peak_reserved_bytes = max(self.peak_reserved_bytes, self.reserved_bytes)
+        return True
+
+    def wait_for_room(self, nbytes: int, should_stop: Optional[Callable] = None) -> bool:
+        """
+        Wait until a reservation would fit within the budget, without reserving it or referencing its owner.
+
+        Parameters
+        ----------
+        nbytes : int
+            The number of bytes to make room for.
+        should_stop : callable, optional
+            While waiting, called regularly to check whether to give up.
+
+        Returns
+        -------
+        room : bool
+            False only if waiting was given up on through `should_stop`.
+        """
+        with self._condition:
+            return self._wait_for_room(nbytes=int(nbytes), should_stop=should_stop)
+
+    def _wait_for_room(self, nbytes: int, should_stop: Optional[Callable]) -> bool:
+        """Wait with the condition held; any reservation fits when nothing else is reserved."""
+        while self.reserved_bytes > 0 and self.reserved_bytes + nbytes > self.total_bytes:
+            if should_stop is not None and should_stop():
+                return False
+            self._condition.wait(timeout=0.1)
+        return True
+
+    def release(self, owner: object, nbytes: Optional[int] = None):
+        """Release bytes reserved by an owner; by default, all of them."""
+        with self._condition:
+            owner_bytes = self._reservations.pop(id(owner), 0)
+            nbytes = owner_bytes if nbytes is None else min(int(nbytes), owner_bytes)
+            if owner_bytes > nbytes:
+                self._reservations[id(owner)] = owner_bytes - nbytes
+            self.reserved_bytes -= nbytes
+            self._condition.notify_all()
+
+    def get_usage(self) -> dict:
+        """
+        Report the current usage of the budget.
+
+        Returns
+        -------
+        usage : dict
+            The 'total_bytes' of the budget, the 'reserved_bytes' currently held and the 'peak_reserved_bytes' so far,
+            the 'available_bytes' left, and the 'number_of_owners' currently holding reservations.
+        """
+        with self._condition:
+            return dict(
+                total_bytes=self.total_bytes,
+                reserved_bytes=self.reserved_bytes,
+                peak_reserved_bytes=self.peak_reserved_bytes,
+                available_bytes=self.available_bytes,
+                number_of_owners=len(self._reservations),
+            )
+
+
+_memory_budget = None
+
+
+def get_memory_budget() -> MemoryBudget:
+    """Return the memory budget shared by every iterator of this process, creating the default one if needed."""
+    global _memory_budget
+    if _memory_budget is None:
+        _memory_budget = MemoryBudget()
+    return _memory_budget
+
+
+def set_memory_budget(total_gb: Optional[float] = None) -> MemoryBudget:
+    """
+    Replace the memory budget shared by every iterator of this process.
+
+    Iterators created before keep reserving from the previous budget.
+
+    Parameters
+    ----------
+    total_gb : float, optional
+        The total size in gigabytes (GB) of the buffers that may be held at once.
+        The default is the memory available to the system at the time of the call.
+
+    Returns
+    -------
+    memory_budget : MemoryBudget
+    """
+    global _memory_budget
+    _memory_budget = MemoryBudget(total_gb=total_gb)
+    return _memory_budget
@@ -6,11 +6,16 @@ from contextlib import contextmanager
 from typing import Optional
 from pathlib import Path
 
+from hdmf.data_utils import DataIO
 from pynwb import NWBFile, NWBHDF5IO
 from pynwb.file import Subject
 
+from .hdmf import GenericDataChunkIterator, ResumableNWBHDF5IO, get_checkpoint_file_path, load_checkpoint
+from .instrumentation import ConversionInstrumentation, _measure
 from ..utils import dict_deep_update, FilePathType
 
+BACKENDS = ["hdf5", "zarr"]
+
 
 def get_module(nwbfile: NWBFile, name: str, description: str = None):
     """Check if processing module exists. If not, create it. Then return module."""
@@ -115,6 +120,23 @@ def add_device_from_metadata(nwbfile: NWBFile, modality: str = "Ecephys", metada
             nwbfile.create_device(**dict(defaults, **dev))
 
 
+def _iter_data_chunk_iterators(nwbfile: NWBFile):
+    """Iterate over the neuroconv GenericDataChunkIterators writing the data of the NWBFile."""
+    for neurodata_object in nwbfile.objects.values():
+        data = getattr(neurodata_object, "data", None)
+        data = data.data if isinstance(data, DataIO) else data
+        if isinstance(data, GenericDataChunkIterator):
+            yield data
+
+
+def _writes_round_robin(nwbfile: NWBFile) -> bool:
+    """Whether any data of the NWBFile is written by an iterator that must advance along with the other iterators."""
+    return any(
+        data_chunk_iterator.shares_reads or data_chunk_iterator.writes_round_robin
+        for data_chunk_iterator in _iter_data_chunk_iterators(nwbfile=nwbfile)
+    )
+
+
 @contextmanager
 def make_or_load_nwbfile(
     nwbfile_path: Optional[FilePathType] = None,
@@ -122,6 +144,10 @@ def make_or_load_nwbfile(
     metadata: Optional[dict] = None,
     overwrite: bool = False,
     verbose: bool = True,
+    backend: str = "hdf5",
+    number_of_jobs: int = 1,
+    resume: bool = False,
+    instrumentation: Optional[ConversionInstrumentation] = None,
 ):
     """
     Context for automatically handling decision of write vs. append for writing an NWBFile.
@@ -141,6 +167,22 @@ def make_or_load_nwbfile(
     verbose: bool, optional
         If 'nwbfile_path' is specified, informs user after a successful write operation.
         The default is True.
+    backend: str, optional
+        The storage backend of the NWBFile; either "hdf5" (the default) for a single HDF5 file, or "zarr" for an
+        NWB-Zarr directory store.
+    number_of_jobs: int, optional
+        Only applies to backend="zarr". The number of workers writing the chunks of large datasets concurrently.
+        The default of 1 writes them serially. Set to -1 to use all available cores.
+    resume: bool, optional
+        Only applies to backend="hdf5" when writing a new NWBFile. If True, the progress of the write is recorded in a
+        checkpoint file next to the NWBFile ('<nwbfile name>.checkpoint.json'), down to each buffer of every
+        DataChunkIterator. If that checkpoint exists from an interrupted write, the existing file is reopened instead;
+        the context yields an NWBFile constructed from the metadata (or the in-memory 'nwbfile') to be filled exactly as
+        it was before, and only the buffers which had not been committed are read and written. A file interrupted
+        before all of its groups and attributes were written is started over. The checkpoint is removed once the
+        NWBFile is complete. The default is False.
+    instrumentation: ConversionInstrumentation, optional
+        If specified, records the time and memory spent writing the NWBFile, and the throughput of each of its datasets.
     """
     nwbfile_path_in = Path(nwbfile_path) if nwbfile_path else None
     assert not (nwbfile_path is None and nwbfile is None and metadata is None), (
@@ -151,17 +193,39 @@ def make_or_load_nwbfile(
         "'nwbfile_path' exists at location, 'overwrite' is False (append mode), but an in-memory 'nwbfile' object was "
         "passed! Cannot reconcile which nwbfile object to write."
     )
+    assert backend in BACKENDS, f"backend ({backend}) must be one of {BACKENDS}!"
+    assert not (resume and backend != "hdf5"), "Resuming a write is only supported by the 'hdf5' backend!"
 
     load_kwargs = dict()
+    checkpoint_file_path = None
+    resuming = False
     if nwbfile_path:
-        load_kwargs.update(path=nwbfile_path)
-        if nwbfile_path_in.is_file() and not overwrite:
+        load_kwargs.update(path=str(nwbfile_path))
+        if resume:
+            checkpoint_file_path = get_checkpoint_file_path(nwbfile_path=nwbfile_path_in)
+            checkpoint = load_checkpoint(checkpoint_file_path=checkpoint_file_path)
+            resuming = checkpoint is not None and checkpoint["structure_written"] and nwbfile_path_in.is_file()
+            if checkpoint is not None and not resuming:  # interrupted before the file was usable; start over
+                overwrite = True
+        # NWB-Zarr files are directory stores
+        nwbfile_exists = nwbfile_path_in.is_file() if backend == "hdf5" else nwbfile_path_in.is_dir()
+        if resuming:
+            load_kwargs.update(mode="r+")
+        elif nwbfile_exists and not overwrite:
             load_kwargs.update(mode="r+", load_namespaces=True)
         else:
             load_kwargs.update(mode="w")
-        io = NWBHDF5IO(**load_kwargs)
+        if backend == "zarr":
+            from .hdmf import ParallelNWBZarrIO
+
+            io = ParallelNWBZarrIO(number_of_jobs=number_of_jobs, **load_kwargs)
+        elif (resume and load_kwargs["mode"] == "w") or resuming:
+            io = ResumableNWBHDF5IO(checkpoint_file_path=checkpoint_file_path, **load_kwargs)
+        else:
+            checkpoint_file_path = None  # appending to an existing file is not checkpointed
+            io = NWBHDF5IO(**load_kwargs)
     try:
-        if load_kwargs.get("mode", "") == "r+":
+        if load_kwargs.get("mode", "") == "r+" and not resuming:
             nwbfile = io.read()
         elif nwbfile is None:
             nwbfile = make_nwbfile_from_metadata(metadata=metadata)
@@ -169,9 +233,26 @@ def make_or_load_nwbfile(
     finally:
         if nwbfile_path:
             try:
-                io.write(nwbfile)
+                with _measure(instrumentation=instrumentation, stage="write", name=str(nwbfile_path)):
+                    if resuming:
+                        io.resume(nwbfile=nwbfile)
+                    else:
+                        # Resumable writes checkpoint the queued iterators, and iterators that share their reads or
+                        # read ahead while the others are written must advance together; otherwise each iterator is
+                        # exhausted in turn, as usual
+                        exhaust_dci = checkpoint_file_path is None and not _writes_round_robin(nwbfile=nwbfile)
+                        io.write(nwbfile, exhaust_dci=exhaust_dci)
+                if instrumentation is not None:
+                    instrumentation.record_datasets(
+                        root_builder=io.manager.get_builder(nwbfile), root=io.file if backend == "zarr" else io._file
+                    )
 
                 if verbose:
                     print(f"NWB file saved at {nwbfile_path}!")
             finally:
+                if nwbfile is not None:  # stop the read-ahead of any iteration the write abandoned
+                    for data_chunk_iterator in _iter_data_chunk_iterators(nwbfile=nwbfile):
+                        data_chunk_iterator.close()
                 io.close()
+            if checkpoint_file_path is not None:
+                checkpoint_file_path.unlink()
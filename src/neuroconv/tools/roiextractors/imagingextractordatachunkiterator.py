@@ -2,9 +2,10 @@
 from typing import Tuple, Optional
 
 import numpy as np
-from hdmf.data_utils import GenericDataChunkIterator
 from roiextractors import ImagingExtractor
 
+from ..hdmf import GenericDataChunkIterator
+
 
 class ImagingExtractorDataChunkIterator(GenericDataChunkIterator):
     """DataChunkIterator for ImagingExtractor objects primarily used when writing imaging data to an NWB file."""
@@ -18,6 +19,8 @@ class ImagingExtractorDataChunkIterator(GenericDataChunkIterator):
         chunk_shape: Optional[tuple] = None,
         display_progress: bool = False,
         progress_bar_options: Optional[dict] = None,
+        prefetch_buffers: int = 0,
+        prefetch_gb: Optional[float] = None,
     ):
         """
         Initialize an Iterable object which returns DataChunks with data and their selections on each iteration.
@@ -28,7 +31,7 @@ class ImagingExtractorDataChunkIterator(GenericDataChunkIterator):
             The ImagingExtractor object which handles the data access.
         buffer_gb : float, optional
             The upper bound on size in gigabytes (GB) of each selection from the iteration.
-            The buffer_shape will be set implicitly by this argument.
+            The buffer_shape will be set implicitly by this argument, shrunk if needed to fit the memory budget.
             Cannot be set if `buffer_shape` is also specified.
             The default is 1GB.
         buffer_shape : tuple, optional
@@ -51,8 +54,15 @@ class ImagingExtractorDataChunkIterator(GenericDataChunkIterator):
         progress_bar_options : dict, optional
             Dictionary of keyword arguments to be passed directly to tqdm.
             See https://github.com/tqdm/tqdm#parameters for options.
+        prefetch_buffers : int, optional
+            The number of buffers to read ahead on a background thread while the previous ones are written.
+            The default of 0 disables prefetching.
+        prefetch_gb : float, optional
+            The upper bound on the total size in gigabytes (GB) of the buffers held by the read-ahead queue.
+            The default is no bound beyond the number of `prefetch_buffers`.
         """
         self.imaging_extractor = imaging_extractor
+        self._cached_frame_block = None  # (start_frame, end_frame, transposed video of the full field of view)
 
         assert not (buffer_gb and buffer_shape), "Only one of 'buffer_gb' or 'buffer_shape' can be specified!"
         assert not (chunk_mb and chunk_shape), "Only one of 'chunk_mb' or 'chunk_shape' can be specified!"
@@ -71,16 +81,19 @@ class ImagingExtractorDataChunkIterator(GenericDataChunkIterator):
         if buffer_gb is None and buffer_shape is None:
             buffer_gb = 1.0
 
-        if buffer_shape is None:
-            buffer_shape = self._get_scaled_buffer_shape(buffer_gb=buffer_gb, chunk_shape=chunk_shape)
-
         super().__init__(
+            buffer_gb=buffer_gb,
             buffer_shape=buffer_shape,
             chunk_shape=chunk_shape,
             display_progress=display_progress,
             progress_bar_options=progress_bar_options,
+            prefetch_buffers=prefetch_buffers,
+            prefetch_gb=prefetch_gb,
         )
 
+    def _get_default_buffer_shape(self, buffer_gb: float) -> tuple:
+        return self._get_scaled_buffer_shape(buffer_gb=buffer_gb, chunk_shape=self.chunk_shape)
+
     def _get_scaled_buffer_shape(self, buffer_gb: float, chunk_shape: tuple) -> tuple:
         """Select the buffer_shape less than the threshold of buffer_gb that is also a multiple of the chunk_shape."""
         assert buffer_gb > 0, f"buffer_gb ({buffer_gb}) must be greater than zero!"
@@ -111,10 +124,40 @@ class ImagingExtractorDataChunkIterator(GenericDataChunkIterator):
             video_shape += (depth,)
         return video_shape
 
-    def _get_data(self, selection: Tuple[slice]) -> np.ndarray:
-        data = self.imaging_extractor.get_video(
-            start_frame=selection[0].start,
-            end_frame=selection[0].stop,
-        )
+    def _read_frames(self, start_frame: int, end_frame: int) -> np.ndarray:
+        data = self.imaging_extractor.get_video(start_frame=start_frame, end_frame=end_frame)
         tranpose_axes = (0, 2, 1) if len(data.shape) == 3 else (0, 2, 1, 3)
-        return data.transpose(tranpose_axes)[(slice(0, self.buffer_shape[0]),) + selection[1:]]
+        return data.transpose(tranpose_axes)
+
+    def _get_data(self, selection: Tuple[slice]) -> np.ndarray:
+        start_frame, end_frame = selection[0].start, selection[0].stop
+        if tuple(self.buffer_shape[1:]) == tuple(self.maxshape[1:]):
+            return self._read_frames(start_frame=start_frame, end_frame=end_frame)[(slice(None),) + selection[1:]]
+
+        # Buffers tiling the field of view, which are only given by their shape since the default buffers span it, are
+        # iterated over every spatial tile of a range of frames before moving on, so the frames are decoded once and
+        # each tile is sliced from them. The block of frames is reserved from the memory budget, and only cached if
+        # it fits what is left of it
+        if self._cached_frame_block is None or self._cached_frame_block[:2] != (start_frame, end_frame):
+            self._drop_frame_block()
+            frame_block_bytes = (end_frame - start_frame) * np.prod(self.maxshape[1:]) * self.dtype.itemsize
+            if frame_block_bytes > self.memory_budget.available_bytes:
+                return self._read_frames(start_frame=start_frame, end_frame=end_frame)[(slice(None),) + selection[1:]]
+            frames = self._read_frames(start_frame=start_frame, end_frame=end_frame)
+            self.memory_budget.reserve(owner=self, nbytes=frames.nbytes)
+            self._cached_frame_block = (start_frame, end_frame, frames)
+        tile = self._cached_frame_block[2][(slice(None),) + selection[1:]].copy()  # so the block is freed once dropped
+        if all(
+            axis_selection.stop >= axis_length for axis_selection, axis_length in zip(selection[1:], self.maxshape[1:])
+        ):
+            self._drop_frame_block()  # the last tile of this range of frames
+        return tile
+
+    def _drop_frame_block(self):
+        if self._cached_frame_block is not None:
+            self.memory_budget.release(owner=self, nbytes=self._cached_frame_block[2].nbytes)
+            self._cached_frame_block = None
+
+    def close(self):
+        self._drop_frame_block()
+        super().close()
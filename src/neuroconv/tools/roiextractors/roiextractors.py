@@ -1,7 +1,7 @@
 """Authors: Heberto Mayorquin, Saksham Sharda, Alessio Buccino and Szonja Weigl."""
 from collections import defaultdict
 from warnings import warn
-from typing import Optional
+from typing import Optional, Union
 from copy import deepcopy
 
 import psutil
@@ -27,6 +27,9 @@ from hdmf.data_utils import DataChunkIterator
 from hdmf.backends.hdf5.h5_utils import H5DataIO
 
 from .imagingextractordatachunkiterator import ImagingExtractorDataChunkIterator
+from ..codec_selection import select_codec
+from ..hdmf import DirectChunkWriteH5DataIO
+from ..memory_budget import get_memory_budget
 from ..nwb_helpers import get_default_nwbfile_metadata, make_or_load_nwbfile, get_module
 from ...utils import OptionalFilePathType, dict_deep_update, calculate_regular_series_rate
 
@@ -271,6 +274,9 @@ def add_two_photon_series(
     two_photon_series_index: int = 0,
     iterator_type: Optional[str] = "v2",
     iterator_options: Optional[dict] = None,
+    number_of_jobs: int = 1,
+    compression: Union[str, bool, None] = True,
+    compression_opts: Union[int, dict, None] = None,
     use_times=False,  # TODO: to be removed
     buffer_size: Optional[int] = None,  # TODO: to be removed
 ):
@@ -278,6 +284,14 @@ def add_two_photon_series(
     Auxiliary static method for nwbextractor.
 
     Adds two photon series from imaging object as TwoPhotonSeries to nwbfile object.
+
+    Setting number_of_jobs to any value other than 1 compresses the frames with GZIP across that many workers
+    (-1 for all available cores) and commits them with direct chunk writes; this requires iterator_type='v2'.
+
+    The frames are compressed with GZIP by default. Set compression="auto" to benchmark the available filters on a
+    few buffers of the frames and select the best one, with the options of
+    neuroconv.tools.codec_selection.select_codec (such as the 'policy') passed as a dictionary in compression_opts;
+    this also requires iterator_type='v2'.
     """
     if use_times:
         warn("Keyword argument 'use_times' is deprecated and will be removed on or after August 1st, 2022.")
@@ -313,7 +327,23 @@ def add_two_photon_series(
         iterator_type=iterator_type,
         iterator_options=iterator_options,
     )
-    data = H5DataIO(data=frames_to_iterator, compression=True)
+    codec_selection = None
+    if compression == "auto":
+        assert iterator_type == "v2", "Automatic codec selection (compression='auto') requires iterator_type='v2'!"
+        codec_selection = select_codec(
+            data=frames_to_iterator, direct_chunk_write=number_of_jobs != 1, **(compression_opts or dict())
+        )
+        compression_kwargs = codec_selection["data_io_kwargs"]
+    else:
+        compression_kwargs = dict(compression=compression, compression_opts=compression_opts)
+    if number_of_jobs == 1:
+        data = H5DataIO(data=frames_to_iterator, **compression_kwargs)
+    else:
+        assert iterator_type == "v2", "Parallel compression (number_of_jobs != 1) requires iterator_type='v2'!"
+        if compression_kwargs["compression"] is True:
+            compression_kwargs.update(compression="gzip")
+        data = DirectChunkWriteH5DataIO(data=frames_to_iterator, number_of_jobs=number_of_jobs, **compression_kwargs)
+    data.codec_selection = codec_selection  # reported by ConversionInstrumentation
     two_p_series_kwargs.update(data=data)
 
     # Add dimension
@@ -339,6 +369,8 @@ def check_if_imaging_fits_into_memory(imaging: ImagingExtractor) -> None:
     """
     Raise an error if the full traces of an imaging extractor are larger than available memory.
 
+    The available memory is the lesser of psutil.virtual_memory().available and what is left of the memory budget.
+
     Parameters
     ----------
     imaging : ImagingExtractor
@@ -353,7 +385,7 @@ def check_if_imaging_fits_into_memory(imaging: ImagingExtractor) -> None:
     num_frames = imaging.get_num_frames()
 
     traces_size_in_bytes = num_frames * np.prod(image_size) * element_size_in_bytes
-    available_memory_in_bytes = psutil.virtual_memory().available
+    available_memory_in_bytes = min(psutil.virtual_memory().available, get_memory_budget().available_bytes)
 
     if traces_size_in_bytes > available_memory_in_bytes:
         message = (
@@ -449,6 +481,10 @@ def write_imaging(
     verbose: bool = True,
     iterator_type: Optional[str] = "v2",
     iterator_options: Optional[dict] = None,
+    number_of_jobs: int = 1,
+    backend: str = "hdf5",
+    compression: Union[str, bool, None] = True,
+    compression_opts: Union[int, dict, None] = None,
     use_times=False,  # TODO: to be removed
     buffer_size: Optional[int] = None,  # TODO: to be removed
     save_path: OptionalFilePathType = None,  # TODO: to be removed
@@ -491,6 +527,17 @@ def write_imaging(
         For 'v2', see
         https://hdmf.readthedocs.io/en/stable/hdmf.data_utils.html#hdmf.data_utils.GenericDataChunkIterator
         for the full list of options.
+    number_of_jobs : int, optional
+        The number of workers compressing the frames in parallel with direct chunk writes.
+        The default of 1 leaves compression to HDF5. Set to -1 to use all available cores.
+        With backend="zarr", this is instead the number of workers writing the chunks to the store concurrently.
+    backend : str, optional
+        The storage backend of the NWBFile at 'nwbfile_path'; either "hdf5" (the default) or "zarr".
+    compression : str or bool, optional
+        The compression of the frames; see add_two_photon_series. The default of True uses GZIP, and "auto"
+        selects the best filter for the frames.
+    compression_opts : int or dict, optional
+        Passed to add_two_photon_series.
     """
     assert save_path is None or nwbfile is None, "Either pass a save_path location, or nwbfile object, but not both!"
     if nwbfile is not None:
@@ -534,7 +581,13 @@ def write_imaging(
         metadata = dict_deep_update(imaging.nwb_metadata, metadata, append_list=False)
 
     with make_or_load_nwbfile(
-        nwbfile_path=nwbfile_path, nwbfile=nwbfile, metadata=metadata, overwrite=overwrite, verbose=verbose
+        nwbfile_path=nwbfile_path,
+        nwbfile=nwbfile,
+        metadata=metadata,
+        overwrite=overwrite,
+        verbose=verbose,
+        backend=backend,
+        number_of_jobs=number_of_jobs,
     ) as nwbfile_out:
         add_devices(nwbfile=nwbfile_out, metadata=metadata)
         add_two_photon_series(
@@ -543,6 +596,9 @@ def write_imaging(
             metadata=metadata,
             iterator_type=iterator_type,
             iterator_options=iterator_options,
+            number_of_jobs=number_of_jobs,
+            compression=compression,
+            compression_opts=compression_opts,
         )
         add_epochs(imaging=imaging, nwbfile=nwbfile_out)
     return nwbfile_out
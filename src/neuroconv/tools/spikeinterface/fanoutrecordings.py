@@ -0,0 +1,226 @@
+"""Recording wrappers that let several outputs be written from a single read of each time block of the traces."""
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+
+import numpy as np
+from scipy import signal
+from spikeinterface import BaseRecording
+from spikeinterface.core import BaseRecordingSegment
+
+
+class TimeBlockCachedRecording(BaseRecording):
+    """
+    Recording that reads its parent in full-channel time blocks and keeps the most recent blocks in memory.
+
+    Any number of consumers iterating over the same span of frames in lockstep (such as the raw and LFP outputs of
+    `add_multiple_electrical_series` being written round-robin) then read each block of the parent only once.
+    """
+
+    shares_reads = True  # so that the iterators over this recording are written round-robin
+
+    def __init__(self, recording: BaseRecording, block_frames: int, max_cached_blocks: int = 3):
+        """
+        Wrap a recording with a cache of time blocks.
+
+        Parameters
+        ----------
+        recording : BaseRecording
+            The recording to read from.
+        block_frames : int
+            The number of frames in each block read from the parent recording.
+        max_cached_blocks : int, optional
+            The number of blocks held in memory per segment; the least recently used block is evicted first.
+            The default is 3, which covers the block being written plus the margins of a filter on either side.
+        """
+        assert block_frames > 0, f"block_frames ({block_frames}) must be greater than zero!"
+        assert max_cached_blocks > 0, f"max_cached_blocks ({max_cached_blocks}) must be greater than zero!"
+        BaseRecording.__init__(
+            self,
+            sampling_frequency=recording.get_sampling_frequency(),
+            channel_ids=recording.get_channel_ids(),
+            dtype=recording.get_dtype(),
+        )
+        recording.copy_metadata(self, only_main=False, ids=None)
+        for parent_segment in recording._recording_segments:
+            self.add_recording_segment(
+                TimeBlockCachedRecordingSegment(
+                    parent_segment=parent_segment, block_frames=block_frames, max_cached_blocks=max_cached_blocks
+                )
+            )
+        self._kwargs = dict(recording=recording, block_frames=block_frames, max_cached_blocks=max_cached_blocks)
+
+
+class TimeBlockCachedRecordingSegment(BaseRecordingSegment):
+    def __init__(self, parent_segment: BaseRecordingSegment, block_frames: int, max_cached_blocks: int):
+        BaseRecordingSegment.__init__(self, **parent_segment.get_times_kwargs())
+        self.parent_segment = parent_segment
+        self.block_frames = block_frames
+        self.max_cached_blocks = max_cached_blocks
+        self.number_of_block_reads = 0
+        self._cached_blocks = OrderedDict()
+        self._lock = Lock()  # buffers may be requested from the read-ahead threads of several iterators
+
+    def get_num_samples(self) -> int:
+        return self.parent_segment.get_num_samples()
+
+    def _get_block(self, block_index: int) -> np.ndarray:
+        with self._lock:
+            if block_index in self._cached_blocks:
+                self._cached_blocks.move_to_end(block_index)
+                return self._cached_blocks[block_index]
+
+            start_frame = block_index * self.block_frames
+            end_frame = min(start_frame + self.block_frames, self.get_num_samples())
+            block = self.parent_segment.get_traces(start_frame=start_frame, end_frame=end_frame, channel_indices=None)
+            self.number_of_block_reads += 1
+            self._cached_blocks[block_index] = block
+            if len(self._cached_blocks) > self.max_cached_blocks:
+                self._cached_blocks.popitem(last=False)
+            return block
+
+    def get_traces(
+        self, start_frame: Optional[int] = None, end_frame: Optional[int] = None, channel_indices=None
+    ) -> np.ndarray:
+        start_frame = 0 if start_frame is None else start_frame
+        end_frame = self.get_num_samples() if end_frame is None else min(end_frame, self.get_num_samples())
+        if end_frame <= start_frame:
+            traces = self.parent_segment.get_traces(
+                start_frame=start_frame, end_frame=start_frame, channel_indices=None
+            )
+        else:
+            first_block_index = start_frame // self.block_frames
+            last_block_index = (end_frame - 1) // self.block_frames
+            blocks = [self._get_block(block_index=i) for i in range(first_block_index, last_block_index + 1)]
+            traces = blocks[0] if len(blocks) == 1 else np.concatenate(blocks, axis=0)
+            block_offset = first_block_index * self.block_frames
+            traces = traces[start_frame - block_offset : end_frame - block_offset]
+        if channel_indices is not None:
+            traces = traces[:, channel_indices]
+        return traces
+
+
+class DecimatedRecording(BaseRecording):
+    """
+    Recording low-pass filtered with a zero-phase FIR filter and decimated by an integer factor.
+
+    Each output frame only depends on a fixed window of parent frames around it, so the traces are identical however
+    the frames are requested; the recording edges are padded by repeating the first and last frames.
+    """
+
+    def __init__(
+        self,
+        recording: BaseRecording,
+        decimation_factor: int,
+        cutoff_frequency: Optional[float] = None,
+        half_width: int = 10,
+    ):
+        """
+        Wrap a recording with an anti-aliasing low-pass filter and decimation.
+
+        Parameters
+        ----------
+        recording : BaseRecording
+            The recording to decimate.
+        decimation_factor : int
+            The ratio between the sampling frequency of the parent recording and that of the decimated one.
+        cutoff_frequency : float, optional
+            The cutoff frequency in Hz of the low-pass filter.
+            The default is 80% of the Nyquist frequency of the decimated recording.
+        half_width : int, optional
+            The number of decimated frames spanned by each half of the filter; the filter has
+            2 * half_width * decimation_factor + 1 taps. The default is 10.
+        """
+        assert (
+            isinstance(decimation_factor, (int, np.integer)) and decimation_factor > 0
+        ), f"decimation_factor ({decimation_factor}) must be a positive integer!"
+        parent_sampling_frequency = recording.get_sampling_frequency()
+        sampling_frequency = parent_sampling_frequency / decimation_factor
+        cutoff_frequency = 0.4 * sampling_frequency if cutoff_frequency is None else cutoff_frequency
+        assert (
+            0 < cutoff_frequency < sampling_frequency / 2
+        ), f"cutoff_frequency ({cutoff_frequency}) must be between zero and the decimated Nyquist frequency!"
+
+        BaseRecording.__init__(
+            self,
+            sampling_frequency=sampling_frequency,
+            channel_ids=recording.get_channel_ids(),
+            dtype=recording.get_dtype(),
+        )
+        recording.copy_metadata(self, only_main=False, ids=None)
+        self.shares_reads = getattr(recording, "shares_reads", False)
+        coefficients = signal.firwin(
+            numtaps=2 * half_width * decimation_factor + 1, cutoff=cutoff_frequency, fs=parent_sampling_frequency
+        )
+        for parent_segment in recording._recording_segments:
+            self.add_recording_segment(
+                DecimatedRecordingSegment(
+                    parent_segment=parent_segment,
+                    sampling_frequency=sampling_frequency,
+                    decimation_factor=decimation_factor,
+                    half_width=half_width,
+                    coefficients=coefficients,
+                    dtype=self.get_dtype(),
+                )
+            )
+        self._kwargs = dict(
+            recording=recording,
+            decimation_factor=decimation_factor,
+            cutoff_frequency=cutoff_frequency,
+            half_width=half_width,
+        )
+
+
+class DecimatedRecordingSegment(BaseRecordingSegment):
+    def __init__(
+        self,
+        parent_segment: BaseRecordingSegment,
+        sampling_frequency: float,
+        decimation_factor: int,
+        half_width: int,
+        coefficients: np.ndarray,
+        dtype: np.dtype,
+    ):
+        time_vector = parent_segment.time_vector
+        if time_vector is None:
+            BaseRecordingSegment.__init__(self, sampling_frequency=sampling_frequency, t_start=parent_segment.t_start)
+        else:
+            BaseRecordingSegment.__init__(self, time_vector=np.asarray(time_vector)[::decimation_factor])
+        self.parent_segment = parent_segment
+        self.decimation_factor = decimation_factor
+        self.half_width = half_width
+        self.coefficients = coefficients
+        self.dtype = np.dtype(dtype)
+
+    def get_num_samples(self) -> int:
+        return -(-self.parent_segment.get_num_samples() // self.decimation_factor)
+
+    def get_traces(
+        self, start_frame: Optional[int] = None, end_frame: Optional[int] = None, channel_indices=None
+    ) -> np.ndarray:
+        start_frame = 0 if start_frame is None else start_frame
+        end_frame = self.get_num_samples() if end_frame is None else min(end_frame, self.get_num_samples())
+        if end_frame <= start_frame:
+            traces = self.parent_segment.get_traces(start_frame=0, end_frame=0, channel_indices=channel_indices)
+            return traces.astype(self.dtype)
+
+        # Frame n of the output is centered on frame n * decimation_factor of the parent
+        filter_delay = self.half_width * self.decimation_factor
+        parent_start_frame = start_frame * self.decimation_factor - filter_delay
+        parent_end_frame = (end_frame - 1) * self.decimation_factor + filter_delay + 1
+        parent_number_of_samples = self.parent_segment.get_num_samples()
+        parent_traces = self.parent_segment.get_traces(
+            start_frame=max(parent_start_frame, 0),
+            end_frame=min(parent_end_frame, parent_number_of_samples),
+            channel_indices=channel_indices,
+        )
+        edge_padding = (max(-parent_start_frame, 0), max(parent_end_frame - parent_number_of_samples, 0))
+        parent_traces = np.pad(parent_traces.astype("float32"), pad_width=(edge_padding, (0, 0)), mode="edge")
+
+        # With 2 * filter_delay + 1 taps, the first complete output of upfirdn lands at index 2 * half_width
+        filtered_traces = signal.upfirdn(self.coefficients, parent_traces, up=1, down=self.decimation_factor, axis=0)
+        traces = filtered_traces[2 * self.half_width : 2 * self.half_width + end_frame - start_frame]
+        if np.issubdtype(self.dtype, np.integer):
+            dtype_info = np.iinfo(self.dtype)
+            traces = np.clip(np.round(traces), dtype_info.min, dtype_info.max)
+        return traces.astype(self.dtype)
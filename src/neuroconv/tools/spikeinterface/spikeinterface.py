@@ -1,6 +1,7 @@
 """Author: Heberto Mayorquin, Cody Baker."""
 import uuid
 import warnings
+import weakref
 import numpy as np
 import distutils.version
 from pathlib import Path
@@ -15,9 +16,14 @@ from spikeextractors import RecordingExtractor, SortingExtractor
 from numbers import Real
 from hdmf.data_utils import DataChunkIterator, AbstractDataChunkIterator
 from hdmf.backends.hdf5.h5_utils import H5DataIO
+from hdmf.common import VectorData, VectorIndex
 import psutil
 
 from .spikeinterfacerecordingdatachunkiterator import SpikeInterfaceRecordingDataChunkIterator
+from .fanoutrecordings import TimeBlockCachedRecording, DecimatedRecording
+from ..codec_selection import select_codec
+from ..hdmf import DirectChunkWriteH5DataIO
+from ..memory_budget import get_memory_budget
 from ..nwb_helpers import get_module, make_or_load_nwbfile
 from ...utils import dict_deep_update, OptionalFilePathType, calculate_regular_series_rate
 
@@ -224,6 +230,109 @@ def add_electrode_groups(recording: SpikeInterfaceRecording, nwbfile: pynwb.NWBF
             nwbfile.create_electrode_group(**electrode_group_kwargs)
 
 
+def _extend_table_column(column: Union[VectorData, VectorIndex], values: list):
+    """Append the values of several new rows to a (possibly ragged) column of a DynamicTable."""
+    if isinstance(column, VectorIndex) and isinstance(column.target.data, np.ndarray):
+        last_offset = column.data[-1] if len(column.data) > 0 else 0
+        offsets = last_offset + np.cumsum([len(value) for value in values])
+        column.target.transform(lambda data: np.concatenate([data, *values]))
+        if isinstance(column.data, np.ndarray):
+            column.transform(lambda data: np.concatenate([data, offsets]))
+        else:
+            column.data.extend(offsets.tolist())
+    elif isinstance(column, VectorIndex):
+        for value in values:
+            column.add_vector(value)
+    elif isinstance(column.data, np.ndarray):  # extend_data would stack the arrays instead of concatenating them
+        column.transform(lambda data: np.concatenate([data, np.asarray(values)]))
+    else:
+        column.extend(values)
+
+
+def _add_electrodes_in_bulk(nwbfile: pynwb.NWBFile, electrode_columns: dict):
+    """
+    Append rows to the electrodes table one column at a time.
+
+    Equivalent to calling nwbfile.add_electrode once per row, but without the per-row overhead of validating and
+    appending each value. The first row still goes through add_electrode so that pynwb creates the table and any of
+    its optional columns.
+    """
+    nwbfile.add_electrode(**{property: values[0] for property, values in electrode_columns.items()})
+
+    electrodes = nwbfile.electrodes
+    ids = list(electrode_columns["id"][1:])
+    if ids and ids[0] is None:
+        ids = list(range(len(electrodes), len(electrodes) + len(ids)))
+    _extend_table_column(column=electrodes.id, values=ids)
+    for property, values in electrode_columns.items():
+        if property != "id":
+            _extend_table_column(column=electrodes[property], values=values[1:])
+
+
+def _add_units_in_bulk(units_table: pynwb.misc.Units, unit_columns: dict, spike_times: List[np.ndarray]):
+    """
+    Append rows to a units table one column at a time.
+
+    Equivalent to calling units_table.add_unit(..., enforce_unique_id=True) once per unit. The spike times of a new
+    table are added as a single column, indexed by the cumulative number of spikes per unit.
+    """
+    ids = list(unit_columns["id"])
+    if ids[0] is None:
+        ids = list(range(len(units_table), len(units_table) + len(ids)))
+    used_ids = set(units_table.id[:])
+    for unit_id in ids:
+        if unit_id in used_ids:
+            raise ValueError("id %i already in the table" % unit_id)
+        used_ids.add(unit_id)
+
+    if len(units_table.colnames) == 0:
+        spike_times_column = next(column for column in units_table.__columns__ if column["name"] == "spike_times")
+        units_table.add_column(name="spike_times", description=spike_times_column["description"], index=True)
+        # Lists, so that later calls to add_unit can extend them
+        spike_times_index = units_table["spike_times"]
+        spike_times_index.target.data.extend(np.concatenate(spike_times).tolist())
+        spike_times_index.data.extend(np.cumsum([len(unit_spike_times) for unit_spike_times in spike_times]).tolist())
+        units_table.id.extend(ids)
+        return
+
+    _extend_table_column(column=units_table.id, values=ids)
+    _extend_table_column(column=units_table["spike_times"], values=spike_times)
+    for property, values in unit_columns.items():
+        if property != "id":
+            _extend_table_column(column=units_table[property], values=values)
+
+
+# The id of each electrodes table: a weak reference to it, the ids it has mapped, and the map of those to their rows;
+# hdmf tables cannot key a WeakKeyDictionary since they are unhashable
+_electrode_id_to_row_cache = dict()
+
+
+def _get_electrode_id_to_row(nwbfile: pynwb.NWBFile) -> dict:
+    """
+    Map each id of the electrodes table to its (first) row.
+
+    The map is cached per table and only extended with the rows appended since the previous call, so building the
+    electrode regions of every stream written to the same file stays linear in the number of electrodes. It is built
+    again if any id it has mapped changed since, such as when the table was modified in place.
+    """
+    electrodes = nwbfile.electrodes
+    electrode_ids = list(electrodes.id[:])
+    table_reference, indexed_ids, id_to_row = _electrode_id_to_row_cache.get(id(electrodes), (None, [], dict()))
+    if (
+        table_reference is None
+        or table_reference() is not electrodes
+        or electrode_ids[: len(indexed_ids)] != indexed_ids
+    ):
+        table_reference = weakref.ref(
+            electrodes, lambda _, table_id=id(electrodes): _electrode_id_to_row_cache.pop(table_id, None)
+        )
+        indexed_ids, id_to_row = [], dict()
+    for row, electrode_id in enumerate(electrode_ids[len(indexed_ids) :], start=len(indexed_ids)):
+        id_to_row.setdefault(electrode_id, row)
+    _electrode_id_to_row_cache[id(electrodes)] = (table_reference, electrode_ids, id_to_row)
+    return id_to_row
+
+
 def add_electrodes(
     recording: SpikeInterfaceRecording, nwbfile: pynwb.NWBFile, metadata: dict = None, exclude: tuple = ()
 ):
@@ -397,23 +506,31 @@ def add_electrodes(
         property_to_default_values.update({property: default_value})
 
     # Add data by rows excluding the rows containing channel_names that were previously added
-    channel_names_used_previously = []
+    channel_names_used_previously = set()
     if "channel_name" in electrode_table_previous_properties:
-        channel_names_used_previously = nwbfile.electrodes["channel_name"].data
+        channel_names_used_previously = set(nwbfile.electrodes["channel_name"].data[:])
 
     properties_with_data = [property for property in properties_to_add_by_rows if "data" in data_to_add[property]]
-    rows_in_data = [index for index in range(checked_recording.get_num_channels())]
-    rows_to_add = [index for index in rows_in_data if channel_name_array[index] not in channel_names_used_previously]
+    rows_to_add = [
+        index
+        for index in range(checked_recording.get_num_channels())
+        if channel_name_array[index] not in channel_names_used_previously
+    ]
 
-    for row in rows_to_add:
-        electrode_kwargs = dict(property_to_default_values)
+    if rows_to_add:
+        electrode_columns = {
+            property: [default_value] * len(rows_to_add)
+            for property, default_value in property_to_default_values.items()
+        }
         for property in properties_with_data:
-            electrode_kwargs[property] = data_to_add[property]["data"][row]
-
-        nwbfile.add_electrode(**electrode_kwargs)
+            data = data_to_add[property]["data"]
+            electrode_columns[property] = (
+                data[rows_to_add] if isinstance(data, np.ndarray) else [data[row] for row in rows_to_add]
+            )
+        _add_electrodes_in_bulk(nwbfile=nwbfile, electrode_columns=electrode_columns)
 
     # Add channel_name as a column and fill previously existing rows with channel_name equal to str(ids)
-    previous_table_size = len(nwbfile.electrodes.id[:]) - len(channel_name_array)
+    previous_table_size = len(nwbfile.electrodes) - len(channel_name_array)
 
     if "channel_name" in properties_to_add_by_columns:
         cols_args = data_to_add["channel_name"]
@@ -426,15 +543,13 @@ def add_electrodes(
         cols_args["data"] = extended_data
         nwbfile.add_electrode_column("channel_name", **cols_args)
 
-    # Build  a channel name to electrode table index map
-    electrodes_df = nwbfile.electrodes.to_dataframe().reset_index()
-    channel_name_to_electrode_index = {
-        channel_name: electrodes_df.query(f"channel_name=='{channel_name}'").index[0]
-        for channel_name in channel_name_array
-    }
+    # Build a channel name to electrode table index map, keeping the first row of any repeated channel name
+    channel_name_to_electrode_index = dict()
+    for electrode_index, channel_name in enumerate(nwbfile.electrodes["channel_name"].data[:]):
+        channel_name_to_electrode_index.setdefault(channel_name, electrode_index)
 
     indexes_for_new_data = [channel_name_to_electrode_index[channel_name] for channel_name in channel_name_array]
-    indexes_for_default_values = electrodes_df.index.difference(indexes_for_new_data).values
+    indexes_for_default_values = np.setdiff1d(np.arange(len(nwbfile.electrodes)), indexes_for_new_data)
 
     # Add properties as columns
     for property in properties_to_add_by_columns - {"channel_name"}:
@@ -448,7 +563,7 @@ def add_electrodes(
         matching_type = next(type for type in type_to_default_value if isinstance(sample_data, type))
         default_value = type_to_default_value[matching_type]
 
-        extended_data = np.empty(shape=len(nwbfile.electrodes.id[:]), dtype=data.dtype)
+        extended_data = np.empty(shape=len(nwbfile.electrodes), dtype=data.dtype)
         extended_data[indexes_for_new_data] = data
 
         extended_data[indexes_for_default_values] = default_value
@@ -460,7 +575,9 @@ def add_electrodes(
 
 
 def check_if_recording_traces_fit_into_memory(recording: SpikeInterfaceRecording, segment_index: int = 0) -> None:
-    """Raises an error if the full traces of a recording extractor are larger than psutil.virtual_memory().available
+    """Raises an error if the full traces of a recording extractor are larger than the available memory.
+
+    The available memory is the lesser of psutil.virtual_memory().available and what is left of the memory budget.
 
     Parameters
     ----------
@@ -478,7 +595,7 @@ def check_if_recording_traces_fit_into_memory(recording: SpikeInterfaceRecording
     num_frames = recording.get_num_frames(segment_index=segment_index)
 
     traces_size_in_bytes = element_size_in_bytes * num_channels * num_frames
-    available_memory_in_bytes = psutil.virtual_memory().available
+    available_memory_in_bytes = min(psutil.virtual_memory().available, get_memory_budget().available_bytes)
 
     if traces_size_in_bytes > available_memory_in_bytes:
         message = (
@@ -561,9 +678,10 @@ def add_electrical_series(
     es_key: str = None,
     write_scaled: bool = False,
     compression: Optional[str] = "gzip",
-    compression_opts: Optional[int] = None,
+    compression_opts: Union[int, dict, None] = None,
     iterator_type: Optional[str] = "v2",
     iterator_opts: Optional[dict] = None,
+    number_of_jobs: int = 1,
 ):
     """
     Adds traces from recording object as ElectricalSeries to an nwbfile object.
@@ -596,10 +714,15 @@ def add_electrical_series(
         If True, writes the traces in uV with the right conversion.
         If False , the data is stored as it is and the right conversions factors are added to the nwbfile.
     compression: str (optional, defaults to "gzip")
-        Type of compression to use. Valid types are "gzip" and "lzf".
-        Set to None to disable all compression.
-    compression_opts: int (optional, defaults to 4)
-        Only applies to compression="gzip". Controls the level of the GZIP.
+        Type of compression to use. Valid types are "gzip" and "lzf", as well as "blosc" when number_of_jobs != 1.
+        Set to "auto" to benchmark the available filters on a few buffers of the traces and select the best one;
+        this requires iterator_type='v2'. Set to None to disable all compression.
+    compression_opts: int or dict (optional, defaults to 4)
+        For compression="gzip", the level of the GZIP.
+        For compression="blosc", a dictionary with any of the keys 'cname', 'clevel', and 'shuffle'
+        (see DirectChunkWriteH5DataIO).
+        For compression="auto", a dictionary of options for neuroconv.tools.codec_selection.select_codec, such as the
+        'policy' ("balanced", "ratio", or "speed") and 'min_rate_mb'.
     iterator_type: str (optional, defaults to 'v2')
         The type of DataChunkIterator to use.
         'v1' is the original DataChunkIterator of the hdmf data_utils.
@@ -608,6 +731,10 @@ def add_electrical_series(
         Dictionary of options for the iterator.
         See https://hdmf.readthedocs.io/en/stable/hdmf.data_utils.html#hdmf.data_utils.GenericDataChunkIterator
         for the full list of options.
+    number_of_jobs: int (optional, defaults to 1)
+        The number of workers compressing the chunks of the traces in parallel.
+        Any value other than 1 compresses outside of HDF5 and commits the chunks with direct chunk writes, which
+        requires iterator_type='v2' and compression to be "gzip" or "blosc". Set to -1 to use all available cores.
 
     Missing keys in an element of metadata['Ecephys']['ElectrodeGroup'] will be auto-populated with defaults
     whenever possible.
@@ -658,7 +785,8 @@ def add_electrical_series(
 
     add_electrodes(recording=recording, nwbfile=nwbfile, metadata=metadata)
 
-    table_ids = [list(nwbfile.electrodes.id[:]).index(id) for id in channel_indices]
+    electrode_id_to_row = _get_electrode_id_to_row(nwbfile=nwbfile)
+    table_ids = [electrode_id_to_row[id] for id in channel_indices]
 
     electrode_table_region = nwbfile.create_electrode_table_region(
         region=table_ids, description="electrode_table_region"
@@ -686,12 +814,26 @@ def add_electrical_series(
     ephys_data_iterator = _recording_traces_to_hdmf_iterator(
         recording=checked_recording,
         segment_index=segment_index,
+        return_scaled=write_scaled,
         iterator_type=iterator_type,
         iterator_opts=iterator_opts,
     )
-    eseries_kwargs.update(
-        data=H5DataIO(data=ephys_data_iterator, compression=compression, compression_opts=compression_opts)
-    )
+    codec_selection = None
+    if compression == "auto":
+        assert iterator_type == "v2", "Automatic codec selection (compression='auto') requires iterator_type='v2'!"
+        codec_selection = select_codec(
+            data=ephys_data_iterator, direct_chunk_write=number_of_jobs != 1, **(compression_opts or dict())
+        )
+        compression_kwargs = codec_selection["data_io_kwargs"]
+    else:
+        compression_kwargs = dict(compression=compression, compression_opts=compression_opts)
+    if number_of_jobs == 1:
+        data = H5DataIO(data=ephys_data_iterator, **compression_kwargs)
+    else:
+        assert iterator_type == "v2", "Parallel compression (number_of_jobs != 1) requires iterator_type='v2'!"
+        data = DirectChunkWriteH5DataIO(data=ephys_data_iterator, number_of_jobs=number_of_jobs, **compression_kwargs)
+    data.codec_selection = codec_selection  # reported by ConversionInstrumentation
+    eseries_kwargs.update(data=data)
 
     # Timestamps vs rate
     timestamps = checked_recording.get_times(segment_index=segment_index)
@@ -703,9 +845,12 @@ def add_electrical_series(
         eseries_kwargs.update(starting_time=starting_time, rate=checked_recording.get_sampling_frequency())
     else:
         shifted_time_stamps = starting_time + timestamps
-        wrapped_timestamps = H5DataIO(
-            data=shifted_time_stamps, compression=compression, compression_opts=compression_opts
-        )
+        if compression == "auto":
+            wrapped_timestamps = H5DataIO(data=shifted_time_stamps, compression="gzip")
+        else:
+            wrapped_timestamps = H5DataIO(
+                data=shifted_time_stamps, compression=compression, compression_opts=compression_opts
+            )
         eseries_kwargs.update(timestamps=wrapped_timestamps)
 
     # Create ElectricalSeries object and add it to nwbfile
@@ -718,6 +863,113 @@ def add_electrical_series(
         ecephys_mod.data_interfaces["LFP"].add_electrical_series(es)
 
 
+def add_multiple_electrical_series(
+    recording: SpikeInterfaceRecording,
+    nwbfile: pynwb.NWBFile,
+    outputs: List[dict],
+    metadata: dict = None,
+    segment_index: int = 0,
+    starting_time: Optional[float] = None,
+    block_gb: float = 0.1,
+):
+    """
+    Adds several ElectricalSeries derived from the traces of a single recording, reading each time block only once.
+
+    Every output is written through its own SpikeInterfaceRecordingDataChunkIterator over a shared cache of
+    full-channel time blocks. The buffers of all outputs span the same frames of the recording, so when the iterators
+    are written round-robin (as `make_or_load_nwbfile` does for iterators that share their reads) each block is read from the source once
+    and fanned out to every destination dataset.
+
+    Parameters
+    ----------
+    recording: SpikeInterfaceRecording
+        A recording extractor from spikeinterface
+    nwbfile: NWBFile
+        nwb file to which the recording information is to be added
+    outputs: list of dict
+        One dictionary per ElectricalSeries. Each may contain any keyword argument of `add_electrical_series` except
+        'iterator_type', plus
+            decimation_factor: int (optional, defaults to 1)
+                Write the traces low-pass filtered and decimated by this factor, as typically done for LFP.
+            cutoff_frequency: float (optional)
+                The cutoff of the low-pass filter applied before decimation.
+                Defaults to 80% of the Nyquist frequency of the decimated traces.
+        For example, [dict(write_as="raw"), dict(write_as="lfp", decimation_factor=30)].
+        The 'chunk_shape' of the 'iterator_opts' of an output sets its chunking; the buffer shape is always set here.
+    metadata: dict
+        metadata info for constructing the nwb file (optional).
+    segment_index : int
+        The recording segment to add to the NWBFile.
+    starting_time: float (optional)
+        Sets the starting time of every ElectricalSeries to a manually set value.
+    block_gb: float (optional, defaults to 0.1)
+        The approximate size in gigabytes (GB) of each time block read from the recording.
+        Up to three blocks are cached at once.
+    """
+    if isinstance(recording, RecordingExtractor):
+        checked_recording = OldToNewRecording(oldapi_recording_extractor=recording)
+    else:
+        checked_recording = recording
+    assert all(
+        "iterator_type" not in output for output in outputs
+    ), "The outputs are always written with iterator_type='v2'!"
+
+    number_of_channels = checked_recording.get_num_channels()
+    number_of_samples = checked_recording.get_num_samples(segment_index=segment_index)
+
+    # Buffers of every output must cover the same frames of the recording, so the blocks are a common multiple of
+    # the span of one chunk of each output; default chunks are the power of two frames closest to 1MB
+    output_specifications = list()
+    for output in outputs:
+        output = dict(output)
+        decimation_factor = output.pop("decimation_factor", 1)
+        cutoff_frequency = output.pop("cutoff_frequency", None)
+        iterator_opts = dict(output.pop("iterator_opts", None) or dict())
+        output_number_of_samples = -(-number_of_samples // decimation_factor)
+        if "chunk_shape" in iterator_opts:
+            chunk_frames = iterator_opts.pop("chunk_shape")[0]
+        else:
+            itemsize = 4 if output.get("write_scaled", False) else checked_recording.get_dtype().itemsize
+            chunk_frames = 2 ** int(np.round(np.log2(max(1e6 / (itemsize * number_of_channels), 1))))
+        chunk_frames = min(chunk_frames, output_number_of_samples)
+        output_specifications.append(
+            (output, decimation_factor, cutoff_frequency, iterator_opts, output_number_of_samples, chunk_frames)
+        )
+    minimum_block_frames = int(np.lcm.reduce([spec[1] * spec[5] for spec in output_specifications]))
+    target_block_frames = block_gb * 1e9 / (checked_recording.get_dtype().itemsize * number_of_channels)
+    block_frames = minimum_block_frames * max(int(target_block_frames // minimum_block_frames), 1)
+
+    cached_recording = TimeBlockCachedRecording(recording=checked_recording, block_frames=block_frames)
+    for (
+        output,
+        decimation_factor,
+        cutoff_frequency,
+        iterator_opts,
+        output_number_of_samples,
+        chunk_frames,
+    ) in output_specifications:
+        if decimation_factor == 1:
+            output_recording = cached_recording
+        else:
+            output_recording = DecimatedRecording(
+                recording=cached_recording, decimation_factor=decimation_factor, cutoff_frequency=cutoff_frequency
+            )
+        buffer_frames = min(block_frames // decimation_factor, output_number_of_samples)
+        iterator_opts.update(
+            buffer_shape=(buffer_frames, number_of_channels), chunk_shape=(chunk_frames, number_of_channels)
+        )
+        add_electrical_series(
+            recording=output_recording,
+            nwbfile=nwbfile,
+            metadata=metadata,
+            segment_index=segment_index,
+            starting_time=starting_time,
+            iterator_type="v2",
+            iterator_opts=iterator_opts,
+            **output,
+        )
+
+
 def add_epochs(recording: RecordingExtractor, nwbfile: pynwb.NWBFile):
     """
     Auxiliary static method for nwbextractor.
@@ -895,9 +1147,11 @@ def write_recording(
     write_electrical_series: bool = True,
     write_scaled: bool = False,
     compression: Optional[str] = None,
-    compression_opts: Optional[int] = None,
+    compression_opts: Union[int, dict, None] = None,
     iterator_type: Optional[str] = "v2",
     iterator_opts: Optional[dict] = None,
+    number_of_jobs: int = 1,
+    backend: str = "hdf5",
     save_path: OptionalFilePathType = None,  # TODO: to be removed
 ):
     """
@@ -976,9 +1230,11 @@ def write_recording(
         If True, writes the scaled traces (return_scaled=True)
     compression: str (optional, defaults to "gzip")
         Type of compression to use. Valid types are "gzip" and "lzf".
+        Set to "auto" to select the best filter for the traces; see add_electrical_series.
         Set to None to disable all compression.
-    compression_opts: int (optional, defaults to 4)
-        Only applies to compression="gzip". Controls the level of the GZIP.
+    compression_opts: int or dict (optional, defaults to 4)
+        For compression="gzip", the level of the GZIP. For compression="blosc" or "auto", a dictionary of options;
+        see add_electrical_series.
     iterator_type: str (optional, defaults to 'v2')
         The type of DataChunkIterator to use.
         'v1' is the original DataChunkIterator of the hdmf data_utils.
@@ -991,6 +1247,11 @@ def write_recording(
             chunk_mb : float (optional, defaults to 1 MB)
                 Should be below 1 MB. Automatically calculates suitable chunk shape.
         If manual specification of buffer_shape and chunk_shape are desired, these may be specified as well.
+    number_of_jobs: int (optional, defaults to 1)
+        The number of workers compressing the chunks of the traces in parallel; see 'add_electrical_series'.
+        With backend="zarr", this is also the number of workers writing the chunks to the store concurrently.
+    backend: str (optional, defaults to "hdf5")
+        The storage backend of the NWBFile at 'nwbfile_path'; either "hdf5" or "zarr".
     """
     if nwbfile is not None:
         assert isinstance(nwbfile, pynwb.NWBFile), "'nwbfile' should be of type pynwb.NWBFile"
@@ -1029,7 +1290,13 @@ def write_recording(
         metadata = get_nwb_metadata(recording=recording)
 
     with make_or_load_nwbfile(
-        nwbfile_path=nwbfile_path, nwbfile=nwbfile, metadata=metadata, overwrite=overwrite, verbose=verbose
+        nwbfile_path=nwbfile_path,
+        nwbfile=nwbfile,
+        metadata=metadata,
+        overwrite=overwrite,
+        verbose=verbose,
+        backend=backend,
+        number_of_jobs=number_of_jobs,
     ) as nwbfile_out:
 
         # Convenience function to add device, electrode groups and electrodes info
@@ -1051,6 +1318,7 @@ def write_recording(
                     compression_opts=compression_opts,
                     iterator_type=iterator_type,
                     iterator_opts=iterator_opts,
+                    number_of_jobs=number_of_jobs,
                 )
 
         # For objects of the legacy spikeextractors we support adding epochs
@@ -1199,30 +1467,43 @@ def add_units_table(
         property_to_default_values.update({property: default_value})
 
     # Add data by rows excluding the rows with previously added unit names
-    unit_names_used_previously = []
+    unit_names_used_previously = set()
     if "unit_name" in units_table_previous_properties:
-        unit_names_used_previously = units_table["unit_name"].data
+        unit_names_used_previously = set(units_table["unit_name"].data[:])
 
     properties_with_data = {property for property in properties_to_add_by_rows if "data" in data_to_add[property]}
-    rows_in_data = [index for index in range(checked_sorting.get_num_units())]
-    rows_to_add = [index for index in rows_in_data if unit_name_array[index] not in unit_names_used_previously]
-    for row in rows_to_add:
-        unit_kwargs = dict(property_to_default_values)
+    rows_to_add = [
+        index
+        for index in range(checked_sorting.get_num_units())
+        if unit_name_array[index] not in unit_names_used_previously
+    ]
+    if rows_to_add:
+        unit_columns = {
+            property: [default_value] * len(rows_to_add)
+            for property, default_value in property_to_default_values.items()
+        }
         for property in properties_with_data:
-            unit_kwargs[property] = data_to_add[property]["data"][row]
-        spike_times = []
+            data = data_to_add[property]["data"]
+            unit_columns[property] = (
+                data[rows_to_add] if isinstance(data, np.ndarray) else [data[row] for row in rows_to_add]
+            )
 
-        # Extract and cocatenate the spike times from multiple segments
-        for segment_index in range(checked_sorting.get_num_segments()):
-            segment_spike_times = checked_sorting.get_unit_spike_train(
-                unit_id=units_ids[row], segment_index=segment_index, return_times=True
+        # Extract and concatenate the spike times from multiple segments
+        spike_times = [
+            np.concatenate(
+                [
+                    checked_sorting.get_unit_spike_train(
+                        unit_id=units_ids[row], segment_index=segment_index, return_times=True
+                    )
+                    for segment_index in range(checked_sorting.get_num_segments())
+                ]
             )
-            spike_times.append(segment_spike_times)
-        spike_times = np.concatenate(spike_times)
-        units_table.add_unit(spike_times=spike_times, **unit_kwargs, enforce_unique_id=True)
+            for row in rows_to_add
+        ]
+        _add_units_in_bulk(units_table=units_table, unit_columns=unit_columns, spike_times=spike_times)
 
     # Add unit_name as a column and fill previously existing rows with unit_name equal to str(ids)
-    previous_table_size = len(units_table.id[:]) - len(unit_name_array)
+    previous_table_size = len(units_table) - len(unit_name_array)
     if "unit_name" in properties_to_add_by_columns:
         cols_args = data_to_add["unit_name"]
         data = cols_args["data"]
@@ -1234,14 +1515,13 @@ def add_units_table(
         cols_args["data"] = extended_data
         units_table.add_column("unit_name", **cols_args)
 
-    # Build  a channel name to electrode table index map
-    table_df = units_table.to_dataframe().reset_index()
-    unit_name_to_electrode_index = {
-        unit_name: table_df.query(f"unit_name=='{unit_name}'").index[0] for unit_name in unit_name_array
-    }
+    # Build a unit name to table index map, keeping the first row of any repeated unit name
+    unit_name_to_electrode_index = dict()
+    for unit_index, unit_name in enumerate(units_table["unit_name"].data[:]):
+        unit_name_to_electrode_index.setdefault(unit_name, unit_index)
 
     indexes_for_new_data = [unit_name_to_electrode_index[unit_name] for unit_name in unit_name_array]
-    indexes_for_default_values = table_df.index.difference(indexes_for_new_data).values
+    indexes_for_default_values = np.setdiff1d(np.arange(len(units_table)), indexes_for_new_data)
 
     # Add properties as columns
     for property in properties_to_add_by_columns - set({"unit_name"}):
@@ -1255,7 +1535,7 @@ def add_units_table(
         matching_type = next(type for type in type_to_default_value if isinstance(sample_data, type))
         default_value = type_to_default_value[matching_type]
 
-        extended_data = np.empty(shape=len(units_table.id[:]), dtype=data.dtype)
+        extended_data = np.empty(shape=len(units_table), dtype=data.dtype)
         extended_data[indexes_for_new_data] = data
 
         extended_data[indexes_for_default_values] = default_value
@@ -1369,6 +1649,7 @@ def write_sorting(
     write_as: str = "units",
     units_name: str = "units",
     units_description: str = "Autogenerated by nwb_conversion_tools.",
+    backend: str = "hdf5",
     save_path: OptionalFilePathType = None,  # TODO: to be removed
 ):
     """
@@ -1410,6 +1691,8 @@ def write_sorting(
     units_name : str (optional, defaults to 'units')
         The name of the units table. If write_as=='units', then units_name must also be 'units'.
     units_description : str (optional)
+    backend: str (optional, defaults to "hdf5")
+        The storage backend of the NWBFile at 'nwbfile_path'; either "hdf5" or "zarr".
     """
     assert save_path is None or nwbfile is None, "Either pass a save_path location, or nwbfile object, but not both!"
     if nwbfile is not None:
@@ -1447,7 +1730,12 @@ def write_sorting(
             nwbfile_path = save_path
 
     with make_or_load_nwbfile(
-        nwbfile_path=nwbfile_path, nwbfile=nwbfile, metadata=metadata, overwrite=overwrite, verbose=verbose
+        nwbfile_path=nwbfile_path,
+        nwbfile=nwbfile,
+        metadata=metadata,
+        overwrite=overwrite,
+        verbose=verbose,
+        backend=backend,
     ) as nwbfile_out:
         add_units_table(
             sorting=sorting,
@@ -1,11 +1,15 @@
 """Authors: Cody Baker and Saksham Sharda."""
 from typing import Tuple, Iterable, Optional, Union
 
+import numpy as np
+
 from spikeinterface.core.old_api_utils import OldToNewRecording
 from spikeextractors import RecordingExtractor
-from hdmf.data_utils import GenericDataChunkIterator
+from hdmf.data_utils import GenericDataChunkIterator as HDMFGenericDataChunkIterator
 from spikeinterface import BaseRecording
 
+from ..hdmf import GenericDataChunkIterator
+
 SpikeInterfaceRecording = Union[BaseRecording, RecordingExtractor]
 
 
@@ -23,6 +27,8 @@ class SpikeInterfaceRecordingDataChunkIterator(GenericDataChunkIterator):
         chunk_shape: Optional[tuple] = None,
         display_progress: bool = False,
         progress_bar_options: Optional[dict] = None,
+        prefetch_buffers: int = 0,
+        prefetch_gb: Optional[float] = None,
     ):
         """
         Initialize an Iterable object which returns DataChunks with data and their selections on each iteration.
@@ -39,7 +45,8 @@ class SpikeInterfaceRecordingDataChunkIterator(GenericDataChunkIterator):
             Defaults to False.
         buffer_gb : float, optional
             The upper bound on size in gigabytes (GB) of each selection from the iteration.
-            The buffer_shape will be set implicitly by this argument.
+            The buffer_shape will be set implicitly by this argument, spanning all channels whenever possible,
+            and shrunk if needed to fit the memory budget (see neuroconv.tools.memory_budget).
             Cannot be set if `buffer_shape` is also specified.
             The default is 1GB.
         buffer_shape : tuple, optional
@@ -62,6 +69,12 @@ class SpikeInterfaceRecordingDataChunkIterator(GenericDataChunkIterator):
         progress_bar_options : dict, optional
             Dictionary of keyword arguments to be passed directly to tqdm.
             See https://github.com/tqdm/tqdm#parameters for options.
+        prefetch_buffers : int, optional
+            The number of buffers to read ahead on a background thread while the previous ones are written.
+            The default of 0 disables prefetching.
+        prefetch_gb : float, optional
+            The upper bound on the total size in gigabytes (GB) of the buffers held by the read-ahead queue.
+            The default is no bound beyond the number of `prefetch_buffers`.
         """
         if isinstance(recording, RecordingExtractor):
             self.recording = OldToNewRecording(oldapi_recording_extractor=recording)
@@ -69,7 +82,10 @@ class SpikeInterfaceRecordingDataChunkIterator(GenericDataChunkIterator):
             self.recording = recording
         self.segment_index = segment_index
         self.return_scaled = return_scaled
+        self.shares_reads = getattr(self.recording, "shares_reads", False)
         self.channel_ids = recording.get_channel_ids()
+        self._cached_time_block = None  # (start_frame, end_frame, traces of all channels)
+        self._time_block_limit_bytes = None  # the planned size of the buffers, unless given by their shape
         super().__init__(
             buffer_gb=buffer_gb,
             buffer_shape=buffer_shape,
@@ -77,19 +93,78 @@ class SpikeInterfaceRecordingDataChunkIterator(GenericDataChunkIterator):
             chunk_shape=chunk_shape,
             display_progress=display_progress,
             progress_bar_options=progress_bar_options,
+            prefetch_buffers=prefetch_buffers,
+            prefetch_gb=prefetch_gb,
         )
 
+    def _get_default_buffer_shape(self, buffer_gb: float = 1.0) -> Tuple[int]:
+        """
+        Plan time-major buffers that span every channel, so each range of frames is read from the recording once.
+
+        Falls back to the HDMF default only when a single row of chunks across all channels exceeds `buffer_gb`.
+        """
+        self._time_block_limit_bytes = buffer_gb * 1e9
+        number_of_frames, number_of_channels = self.maxshape
+        frames_per_chunk = self.chunk_shape[0]
+        chunk_row_bytes = frames_per_chunk * number_of_channels * self.dtype.itemsize
+        if chunk_row_bytes > buffer_gb * 1e9:
+            return HDMFGenericDataChunkIterator._get_default_buffer_shape(self, buffer_gb=buffer_gb)
+        chunk_rows_per_buffer = int(buffer_gb * 1e9 // chunk_row_bytes)
+        return (min(chunk_rows_per_buffer * frames_per_chunk, number_of_frames), number_of_channels)
+
     def _get_data(self, selection: Tuple[slice]) -> Iterable:
-        return self.recording.get_traces(
-            segment_index=self.segment_index,
-            channel_ids=self.channel_ids[selection[1]],
-            start_frame=selection[0].start,
-            end_frame=selection[0].stop,
-            return_scaled=self.return_scaled,
-        )
+        if self.buffer_shape[1] == self.maxshape[1]:
+            return self.recording.get_traces(
+                segment_index=self.segment_index,
+                channel_ids=self.channel_ids[selection[1]],
+                start_frame=selection[0].start,
+                end_frame=selection[0].stop,
+                return_scaled=self.return_scaled,
+            )
+
+        # Buffers that split the channels are iterated over every channel slice of a frame range before moving on;
+        # formats that interleave channels per sample would otherwise re-read the whole time block for each slice.
+        # The time block is reserved from the memory budget, and only cached if it fits the planned size of the buffers
+        # (any size when they are given by their shape) and what is left of the budget
+        start_frame, end_frame = selection[0].start, selection[0].stop
+        if self._cached_time_block is None or self._cached_time_block[:2] != (start_frame, end_frame):
+            self._drop_time_block()
+            time_block_bytes = (end_frame - start_frame) * self.maxshape[1] * self.dtype.itemsize
+            if time_block_bytes > self.memory_budget.available_bytes or (
+                self._time_block_limit_bytes is not None and time_block_bytes > self._time_block_limit_bytes
+            ):
+                return self.recording.get_traces(
+                    segment_index=self.segment_index,
+                    channel_ids=self.channel_ids[selection[1]],
+                    start_frame=start_frame,
+                    end_frame=end_frame,
+                    return_scaled=self.return_scaled,
+                )
+            traces = self.recording.get_traces(
+                segment_index=self.segment_index,
+                start_frame=start_frame,
+                end_frame=end_frame,
+                return_scaled=self.return_scaled,
+            )
+            self.memory_budget.reserve(owner=self, nbytes=traces.nbytes)
+            self._cached_time_block = (start_frame, end_frame, traces)
+        channel_slice = self._cached_time_block[2][:, selection[1]].copy()  # so the block is freed once dropped
+        if selection[1].stop >= self.maxshape[1]:  # the last channel slice of this frame range
+            self._drop_time_block()
+        return channel_slice
+
+    def _drop_time_block(self):
+        if self._cached_time_block is not None:
+            self.memory_budget.release(owner=self, nbytes=self._cached_time_block[2].nbytes)
+            self._cached_time_block = None
+
+    def close(self):
+        self._drop_time_block()
+        super().close()
 
     def _get_dtype(self):
-        return self.recording.get_dtype()
+        # Scaled traces are returned in microvolts as float32 by spikeinterface
+        return np.dtype("float32") if self.return_scaled else self.recording.get_dtype()
 
     def _get_maxshape(self):
         return (self.recording.get_num_samples(segment_index=self.segment_index), self.recording.get_num_channels())
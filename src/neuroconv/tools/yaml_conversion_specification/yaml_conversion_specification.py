@@ -1,18 +1,28 @@
 """Authors: Cody Baker, Alessio Buccino."""
+import os
 import sys
+import json
+import hashlib
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout, redirect_stderr
+from functools import lru_cache
 from pathlib import Path
 from importlib import import_module
+from importlib.metadata import version
 from itertools import chain
 from jsonschema import validate, RefResolver
-from typing import Optional
+from typing import Optional, List, Tuple
 from warnings import warn
 
 import click
-from dandi.organize import create_unique_filenames_from_metadata
-from dandi.metadata import _get_pynwb_metadata
+from pynwb import NWBFile
 
 from ...nwbconverter import NWBConverter
 from ...utils import dict_deep_update, load_dict_from_file, FilePathType, OptionalFolderPathType
+from ...utils.json_schema import NWBMetaDataEncoder
+
+MANIFEST_FILE_NAME = "neuroconv_manifest.json"
 
 
 @click.command()
@@ -29,11 +39,26 @@ from ...utils import dict_deep_update, load_dict_from_file, FilePathType, Option
     type=click.Path(writable=True),
 )
 @click.option("--overwrite", help="Overwrite an existing NWBFile at the location.", is_flag=True)
+@click.option(
+    "--jobs",
+    default=1,
+    help="Number of sessions to convert in parallel processes (-1 for all available cores).",
+    type=int,
+)
+@click.option("--force", help="Convert every session, even those unchanged since the last conversion.", is_flag=True)
+@click.option(
+    "--hash-source-files",
+    help="Also compare the contents of the source files, not only their sizes and modification times.",
+    is_flag=True,
+)
 def run_conversion_from_yaml_cli(
     specification_file_path: str,
     data_folder_path: Optional[str] = None,
     output_folder_path: Optional[str] = None,
     overwrite: bool = False,
+    jobs: int = 1,
+    force: bool = False,
+    hash_source_files: bool = False,
 ):
     """
     Run the tool function 'run_conversion_from_yaml' via the command line.
@@ -46,7 +71,142 @@ def run_conversion_from_yaml_cli(
         data_folder_path=data_folder_path,
         output_folder_path=output_folder_path,
         overwrite=overwrite,
+        number_of_jobs=jobs,
+        force=force,
+        hash_source_files=hash_source_files,
+    )
+
+
+def _get_neuroconv_version() -> str:
+    return version("neuroconv")
+
+
+def _hash_file(file_path: Path) -> str:
+    file_hash = hashlib.sha256()
+    with open(file=file_path, mode="rb") as file:
+        for block in iter(lambda: file.read(2**20), b""):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def _get_session_fingerprint(session_conversion: dict, hash_source_files: bool = False) -> dict:
+    """
+    Summarize everything a session conversion depends on as a JSON-compatible dictionary.
+
+    Each source path is described by the size and modification time of every file it contains (and optionally their
+    SHA-256), alongside the data interfaces, the metadata of the specification merged across levels, the conversion
+    options, and the version of neuroconv.
+    """
+    source_files = dict()
+    for interface_source_data in session_conversion["source_data"].values():
+        for value in interface_source_data.values():
+            for source_path in map(Path, value if isinstance(value, list) else [value]):
+                file_paths = sorted(source_path.rglob("*")) if source_path.is_dir() else [source_path]
+                for file_path in file_paths:
+                    if file_path.is_dir():
+                        continue
+                    if not file_path.exists():
+                        source_files[str(file_path)] = None
+                        continue
+                    file_stat = file_path.stat()
+                    source_files[str(file_path)] = dict(size=file_stat.st_size, mtime_ns=file_stat.st_mtime_ns)
+                    if hash_source_files:
+                        source_files[str(file_path)].update(sha256=_hash_file(file_path=file_path))
+
+    metadata = dict()
+    for metadata_source in session_conversion["metadata_updates"]:
+        metadata = dict_deep_update(metadata, metadata_source)
+    fingerprint = dict(
+        data_interfaces=session_conversion["data_interface_names"],
+        source_files=source_files,
+        metadata=metadata,
+        conversion_options=session_conversion["conversion_options"],
+        neuroconv_version=_get_neuroconv_version(),
+    )
+    return json.loads(json.dumps(fingerprint, cls=NWBMetaDataEncoder))
+
+
+def _write_manifest(manifest_file_path: Path, manifest: dict):
+    with open(file=manifest_file_path, mode="w") as file:
+        json.dump(manifest, file, indent=4)
+
+
+def _get_dandi_naming_metadata(nwbfile: NWBFile) -> dict:
+    """
+    Collect the fields used by 'dandi organize' to name an NWBFile from the in-memory object.
+
+    This mirrors the relevant part of 'dandi.metadata._get_pynwb_metadata', which would otherwise read each file back.
+    The result is JSON-compatible so that it can be stored in the manifest of the output folder.
+    """
+    dandi_metadata = dict(session_id=nwbfile.session_id, session_start_time=nwbfile.session_start_time)
+    for subject_field in ["age", "date_of_birth", "genotype", "sex", "species", "subject_id"]:
+        dandi_metadata[subject_field] = getattr(nwbfile.subject, subject_field, None)
+    dandi_icephys = nwbfile.lab_meta_data.get("DandiIcephysMetadata", None)
+    if dandi_icephys is not None:
+        dandi_metadata.update(dandi_icephys.fields)
+    probe_ids = [device.probe_id for device in nwbfile.devices.values() if hasattr(device, "probe_id")]
+    if probe_ids:
+        dandi_metadata.update(probe_ids=probe_ids)
+    return json.loads(json.dumps(dandi_metadata, cls=NWBMetaDataEncoder))
+
+
+@lru_cache(maxsize=None)
+def _get_converter_class(data_interface_names: Tuple[str, ...]) -> type:
+    """
+    Create the converter class for a combination of data interfaces once per process.
+
+    Sessions with the same data interfaces then share its cached schemas and compiled validators.
+    """
+    nwb_conversion_tools = import_module(
+        name=".",
+        package="neuroconv",  # relative import, but named and referenced as if it were absolute
     )
+    data_interface_classes = {
+        data_interface_name: getattr(nwb_conversion_tools, data_interface_name)
+        for data_interface_name in data_interface_names
+    }
+    return type("CustomNWBConverter", (NWBConverter,), dict(data_interface_classes=data_interface_classes))
+
+
+def _run_session_conversion(
+    data_interface_names: List[str],
+    source_data: dict,
+    metadata_updates: List[dict],
+    conversion_options: dict,
+    nwbfile_path: Path,
+    overwrite: bool,
+) -> dict:
+    """Convert a single session of a specification into its NWBFile, returning the metadata DANDI names it from."""
+    CustomNWBConverter = _get_converter_class(data_interface_names=tuple(data_interface_names))
+    converter = CustomNWBConverter(source_data=source_data)
+    metadata = converter.get_metadata()
+    for metadata_source in metadata_updates:
+        metadata = dict_deep_update(metadata, metadata_source)
+    nwbfile = converter.run_conversion(
+        nwbfile_path=nwbfile_path, metadata=metadata, overwrite=overwrite, conversion_options=conversion_options
+    )
+    return _get_dandi_naming_metadata(nwbfile=nwbfile)
+
+
+def _run_isolated_session_conversion(log_file_path: Path, **session_conversion) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    Convert a single session in a worker process, capturing all of its output in a log file.
+
+    Returns the DANDI naming metadata of the NWBFile and None on success, or None and the formatted traceback of the
+    failure. An NWBFile left partially written by a failed session is removed, unless the session was appending to a
+    file that already existed.
+    """
+    nwbfile_path = Path(session_conversion["nwbfile_path"])
+    created_nwbfile = session_conversion["overwrite"] or not nwbfile_path.exists()
+    with open(file=log_file_path, mode="w") as log_file, redirect_stdout(log_file), redirect_stderr(log_file):
+        try:
+            return _run_session_conversion(**session_conversion), None
+        except Exception:
+            error = traceback.format_exc()
+            print(error, file=log_file)
+            if created_nwbfile and nwbfile_path.exists():
+                nwbfile_path.unlink()
+            return None, error
 
 
 def run_conversion_from_yaml(
@@ -56,6 +216,9 @@ def run_conversion_from_yaml(
     overwrite: bool = False,
     data_folder: OptionalFolderPathType = None,
     output_folder: OptionalFolderPathType = None,
+    number_of_jobs: int = 1,
+    force: bool = False,
+    hash_source_files: bool = False,
 ):
     """
     Run conversion to NWB given a yaml specification file.
@@ -74,7 +237,20 @@ def run_conversion_from_yaml(
         If True, replaces any existing NWBFile at the nwbfile_path location, if save_to_file is True.
         If False, appends the existing NWBFile at the nwbfile_path location, if save_to_file is True.
         The default is False.
+    number_of_jobs : int, optional
+        The number of sessions to convert in parallel, each in its own process. Set to -1 to use all available cores.
+        With more than one job, the output of each session is written to 'logs/<nwbfile name>.log' in the output
+        folder, a failed session does not stop the others, and a summary is printed once all have finished.
+        The default of 1 converts the sessions one after another in the current process.
+    force : bool, optional
+        Every conversion is recorded in '{MANIFEST_FILE_NAME}' in the output folder along with a fingerprint of the
+        source files, metadata, conversion options, and neuroconv version of the session. Sessions whose fingerprint
+        is unchanged and whose NWBFile still exists are skipped, unless force is True. The default is False.
+    hash_source_files : bool, optional
+        Whether to include a SHA-256 of the content of every source file in the fingerprints, in addition to their
+        sizes and modification times. The default is False.
     """
+    assert number_of_jobs == -1 or number_of_jobs >= 1, f"number_of_jobs ({number_of_jobs}) must be positive or -1!"
     deprecation_warning_string = (
         "'data_folder' and 'output_folder' keyword arguments are deprecated and will be removed on or before "
         "August 2022! Please use 'data_folder_path' and 'output_folder_path' instead."
@@ -110,10 +286,7 @@ def run_conversion_from_yaml(
 
     global_metadata = specification.get("metadata", dict())
     global_data_interfaces = specification.get("data_interfaces")
-    nwb_conversion_tools = import_module(
-        name=".",
-        package="neuroconv",  # relative import, but named and referenced as if it were absolute
-    )
+    session_conversions = list()
     file_counter = 0
     for experiment in specification["experiments"].values():
         experiment_metadata = experiment.get("metadata", dict())
@@ -121,7 +294,6 @@ def run_conversion_from_yaml(
         for session in experiment["sessions"]:
             file_counter += 1
             session_data_interfaces = session.get("data_interfaces")
-            data_interface_classes = dict()
             data_interfaces_names_chain = chain(
                 *[
                     data_interfaces
@@ -129,11 +301,6 @@ def run_conversion_from_yaml(
                     if data_interfaces is not None
                 ]
             )
-            for data_interface_name in data_interfaces_names_chain:
-                data_interface_classes.update({data_interface_name: getattr(nwb_conversion_tools, data_interface_name)})
-            CustomNWBConverter = type(
-                "CustomNWBConverter", (NWBConverter,), dict(data_interface_classes=data_interface_classes)
-            )
 
             source_data = session["source_data"]
             for interface_name, interface_source_data in session["source_data"].items():
@@ -142,31 +309,116 @@ def run_conversion_from_yaml(
                         source_data[interface_name].update({key: [str(Path(data_folder_path) / x) for x in value]})
                     else:
                         source_data[interface_name].update({key: str(Path(data_folder_path) / value)})
-            converter = CustomNWBConverter(source_data=source_data)
-            metadata = converter.get_metadata()
-            for metadata_source in [global_metadata, experiment_metadata, session.get("metadata", dict())]:
-                metadata = dict_deep_update(metadata, metadata_source)
             nwbfile_name = session.get("nwbfile_name", f"temp_nwbfile_name_{file_counter}").strip(".nwb")
-            converter.run_conversion(
-                nwbfile_path=output_folder_path / f"{nwbfile_name}.nwb",
-                metadata=metadata,
-                overwrite=overwrite,
-                conversion_options=session.get("conversion_options", dict()),
+            session_conversions.append(
+                dict(
+                    data_interface_names=list(dict.fromkeys(data_interfaces_names_chain)),
+                    source_data=source_data,
+                    metadata_updates=[global_metadata, experiment_metadata, session.get("metadata", dict())],
+                    conversion_options=session.get("conversion_options", dict()),
+                    nwbfile_path=output_folder_path / f"{nwbfile_name}.nwb",
+                    overwrite=overwrite,
+                )
             )
-    # To properly mimic a true dandi organization, the full directory must be populated with NWBFiles.
-    all_nwbfile_paths = [nwbfile_path for nwbfile_path in output_folder_path.iterdir() if nwbfile_path.suffix == ".nwb"]
-    if any(["temp_nwbfile_name_" in nwbfile_path.stem for nwbfile_path in all_nwbfile_paths]):
+
+    manifest_file_path = output_folder_path / MANIFEST_FILE_NAME
+    manifest = load_dict_from_file(file_path=manifest_file_path) if manifest_file_path.is_file() else dict()
+    session_fingerprints = dict()
+    pending_session_conversions = list()
+    for session_conversion in session_conversions:
+        session_name = session_conversion["nwbfile_path"].stem
+        fingerprint = _get_session_fingerprint(
+            session_conversion=session_conversion, hash_source_files=hash_source_files
+        )
+        session_fingerprints[session_name] = fingerprint
+        manifest_entry = manifest.get(session_name, dict())
+        if (
+            not force
+            and manifest_entry.get("fingerprint") == fingerprint
+            and Path(manifest_entry["nwbfile_path"]).exists()
+        ):
+            print(f"Skipping session '{session_name}': unchanged since its last conversion.")
+            continue
+        pending_session_conversions.append(session_conversion)
+
+    def record_conversion(nwbfile_path: Path, dandi_metadata: dict):
+        manifest[nwbfile_path.stem] = dict(
+            nwbfile_path=str(nwbfile_path),
+            fingerprint=session_fingerprints[nwbfile_path.stem],
+            dandi_metadata=dandi_metadata,
+        )
+        _write_manifest(manifest_file_path=manifest_file_path, manifest=manifest)
+
+    failed_nwbfile_paths = list()
+    if number_of_jobs == 1:
+        for session_conversion in pending_session_conversions:
+            dandi_metadata = _run_session_conversion(**session_conversion)
+            record_conversion(nwbfile_path=session_conversion["nwbfile_path"], dandi_metadata=dandi_metadata)
+    elif pending_session_conversions:
+        log_folder_path = output_folder_path / "logs"
+        log_folder_path.mkdir(exist_ok=True)
+        max_workers = os.cpu_count() if number_of_jobs == -1 else number_of_jobs
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    _run_isolated_session_conversion,
+                    log_file_path=log_folder_path / f"{session_conversion['nwbfile_path'].stem}.log",
+                    **session_conversion,
+                ): session_conversion["nwbfile_path"]
+                for session_conversion in pending_session_conversions
+            }
+            for future in as_completed(futures):
+                try:
+                    dandi_metadata, error = future.result()
+                except Exception as exception:  # such as a worker process dying abruptly
+                    error = repr(exception)
+                if error is None:
+                    record_conversion(nwbfile_path=futures[future], dandi_metadata=dandi_metadata)
+                else:
+                    failed_nwbfile_paths.append(futures[future])
+        number_of_conversions = len(pending_session_conversions)
+        print(
+            f"Converted {number_of_conversions - len(failed_nwbfile_paths)} of {number_of_conversions} sessions "
+            f"successfully! Logs are in {log_folder_path}."
+        )
+        for failed_nwbfile_path in failed_nwbfile_paths:
+            print(f"Failed: {failed_nwbfile_path.name} (see {log_folder_path / failed_nwbfile_path.stem}.log)")
+
+    # To properly mimic a true dandi organization, the names must be unique among all NWBFiles of the output folder.
+    # Their metadata is taken from the manifest entries recorded by each conversion instead of being read back.
+    converted_nwbfile_paths = {
+        str(session_conversion["nwbfile_path"])
+        for session_conversion in pending_session_conversions
+        if session_conversion["nwbfile_path"] not in failed_nwbfile_paths
+    }
+    if any(["temp_nwbfile_name_" in Path(nwbfile_path).stem for nwbfile_path in converted_nwbfile_paths]):
+        # dandi is slow to import, so it is only loaded when files need to be named from their metadata
+        from dandi.organize import create_unique_filenames_from_metadata
+
         dandi_metadata_list = []
-        for nwbfile_path in all_nwbfile_paths:
-            dandi_metadata = _get_pynwb_metadata(path=nwbfile_path)
-            dandi_metadata.update(path=nwbfile_path)
-            dandi_metadata_list.append(dandi_metadata)
+        for manifest_entry in manifest.values():
+            if "dandi_metadata" in manifest_entry and Path(manifest_entry["nwbfile_path"]).exists():
+                dandi_metadata_list.append(
+                    dict(manifest_entry["dandi_metadata"], path=Path(manifest_entry["nwbfile_path"]))
+                )
         named_dandi_metadata_list = create_unique_filenames_from_metadata(metadata=dandi_metadata_list)
 
         for named_dandi_metadata in named_dandi_metadata_list:
-            if "temp_nwbfile_name_" in named_dandi_metadata["path"].stem:
+            if (
+                str(named_dandi_metadata["path"]) in converted_nwbfile_paths
+                and "temp_nwbfile_name_" in named_dandi_metadata["path"].stem
+            ):
                 dandi_filename = named_dandi_metadata["dandi_filename"].replace(" ", "_")
                 assert (
                     dandi_filename != ".nwb"
                 ), f"Not enough metadata available to assign name to {str(named_dandi_metadata['path'])}!"
                 named_dandi_metadata["path"].rename(str(output_folder_path / dandi_filename))
+                for manifest_entry in manifest.values():
+                    if manifest_entry["nwbfile_path"] == str(named_dandi_metadata["path"]):
+                        manifest_entry["nwbfile_path"] = str(output_folder_path / dandi_filename)
+        _write_manifest(manifest_file_path=manifest_file_path, manifest=manifest)
+    if failed_nwbfile_paths:
+        raise RuntimeError(
+            f"{len(failed_nwbfile_paths)} of {len(pending_session_conversions)} sessions failed to convert: "
+            f"{', '.join(failed_nwbfile_path.name for failed_nwbfile_path in failed_nwbfile_paths)}!"
+        )
@@ -0,0 +1,68 @@
+"""Memoize the metadata and schemas of data interfaces and converters, which can be costly to build from the source."""
+from copy import deepcopy
+from functools import wraps
+
+_CACHE_ATTRIBUTE = "_neuroconv_cache"
+CACHED_METHOD_NAMES = ["get_source_schema", "get_conversion_options_schema", "get_metadata_schema", "get_metadata"]
+
+
+def _get_cache(owner) -> dict:
+    """Return the cache of an instance or class, creating it if needed; subclasses never share that of a parent."""
+    if _CACHE_ATTRIBUTE not in vars(owner):
+        setattr(owner, _CACHE_ATTRIBUTE, dict())
+    return vars(owner)[_CACHE_ATTRIBUTE]
+
+
+def cache_method(method=None, *, copy: bool = True):
+    """
+    Cache the return value of a method without arguments on the object it is called from.
+
+    Parameters
+    ----------
+    method : callable
+        The method to cache. As a classmethod, the value is cached on the class it is called from.
+    copy : bool, optional
+        Whether to return a deep copy of the cached value, so that callers may freely modify what they receive.
+        The default is True.
+    """
+    if method is None:
+        return lambda method: cache_method(method, copy=copy)
+    if isinstance(method, classmethod):
+        return classmethod(cache_method(method.__func__, copy=copy))
+    if getattr(method, "_is_cached", False):
+        return method
+
+    @wraps(method)
+    def cached_method(owner):
+        cache = _get_cache(owner=owner)
+        key = method.__qualname__  # each override in a hierarchy caches its own value for calls through super()
+        if key not in cache:
+            cache[key] = method(owner)
+        return deepcopy(cache[key]) if copy else cache[key]
+
+    cached_method._is_cached = True
+    return cached_method
+
+
+def clear_cache(owner):
+    """Forget every value cached by `cache_method` on an instance or class."""
+    vars(owner).get(_CACHE_ATTRIBUTE, dict()).clear()
+
+
+class CachedMetadataMixin:
+    """
+    Caches the schemas and metadata of a class, including every override of these methods in its child classes.
+
+    The methods named in CACHED_METHOD_NAMES must be wrapped with `cache_method` where they are first defined;
+    overrides in child classes are wrapped automatically.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for method_name in CACHED_METHOD_NAMES:
+            if method_name in vars(cls):
+                setattr(cls, method_name, cache_method(vars(cls)[method_name]))
+
+    def clear_cache(self):
+        """Forget the cached metadata and metadata schema of this object."""
+        clear_cache(owner=self)
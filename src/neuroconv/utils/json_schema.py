@@ -4,6 +4,7 @@ import json
 import inspect
 from datetime import datetime
 import numpy as np
+from jsonschema.validators import extend, validator_for
 
 import pynwb
 from pynwb.device import Device
@@ -27,6 +28,41 @@ class NWBMetaDataEncoder(json.JSONEncoder):
         return super().default(o)
 
 
+def get_schema_validator(schema: dict):
+    """
+    Check a JSON schema and compile it into a validator that can be reused for any number of instances.
+
+    The validator also accepts the Python objects that NWBMetaDataEncoder serializes, as their JSON counterparts:
+    datetimes as strings of format 'date-time', numpy scalars as numbers or booleans, and tuples as arrays. Instances
+    can therefore be validated as they are, without encoding them to JSON and decoding them back first.
+    """
+    validator_class = validator_for(schema)
+    validator_class.check_schema(schema)
+    validate_type = validator_class.VALIDATORS["type"]
+
+    def validate_type_or_datetime(validator, types, instance, schema):
+        # A datetime only stands for a string whose format is 'date-time'; it is not a string to the type checker, so
+        # that keywords such as 'pattern' or 'maxLength' are not applied to it
+        allows_strings = "string" in (types if isinstance(types, list) else [types])
+        if isinstance(instance, datetime) and allows_strings and schema.get("format") == "date-time":
+            return
+        yield from validate_type(validator, types, instance, schema)
+
+    json_type_checker = validator_class.TYPE_CHECKER
+    type_checker = json_type_checker.redefine_many(
+        definitions=dict(
+            integer=lambda checker, instance: isinstance(instance, np.integer)
+            or json_type_checker.is_type(instance, "integer"),
+            number=lambda checker, instance: isinstance(instance, (np.integer, np.floating))
+            or json_type_checker.is_type(instance, "number"),
+            boolean=lambda checker, instance: isinstance(instance, np.bool_)
+            or json_type_checker.is_type(instance, "boolean"),
+            array=lambda checker, instance: isinstance(instance, tuple) or json_type_checker.is_type(instance, "array"),
+        )
+    )
+    return extend(validator_class, validators=dict(type=validate_type_or_datetime), type_checker=type_checker)(schema)
+
+
 def get_base_schema(tag=None, root=False, id_=None, **kwargs) -> dict:
     """Return the base schema used for all other schemas."""
     base_schema = dict(required=[], properties={}, type="object", additionalProperties=False)
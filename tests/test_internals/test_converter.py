@@ -1,12 +1,21 @@
+import json
 from tempfile import mkdtemp
 from shutil import rmtree
 from pathlib import Path
 from datetime import datetime
+from unittest.mock import patch
 
-from pynwb import NWBFile
+import numpy as np
+from hdmf.backends.hdf5.h5_utils import H5DataIO
+from hdmf.testing import TestCase
+from jsonschema import ValidationError
+from pynwb import NWBFile, TimeSeries
 
 from neuroconv import NWBConverter
 from neuroconv.basedatainterface import BaseDataInterface
+from neuroconv.tools.codec_selection import select_codec
+from neuroconv.tools.hdmf import SliceableDataChunkIterator
+from neuroconv.tools.instrumentation import ConversionInstrumentation
 
 try:
     from ndx_events import LabeledEvents
@@ -42,3 +51,266 @@ def test_converter():
         converter.run_conversion(nwbfile_path=nwbfile_path, overwrite=True, metadata=metadata)
 
         rmtree(test_dir)
+
+
+class TestPlanConversion(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        class CountingDataChunkIterator(SliceableDataChunkIterator):
+            number_of_frames_read = 0
+
+            def _get_data(self, selection):
+                CountingDataChunkIterator.number_of_frames_read += selection[0].stop - selection[0].start
+                return super()._get_data(selection=selection)
+
+        class IteratedInterface(BaseDataInterface):
+            def run_conversion(self, nwbfile: NWBFile, metadata: dict):
+                iterator = CountingDataChunkIterator(
+                    data=np.zeros(shape=(10000, 8), dtype="int16"),
+                    buffer_shape=(1000, 8),
+                    chunk_shape=(100, 8),
+                    prefetch_buffers=2,
+                )
+                nwbfile.add_acquisition(
+                    TimeSeries(name="Iterated", data=H5DataIO(iterator, compression="gzip"), unit="", rate=1.0)
+                )
+
+        class InMemoryInterface(BaseDataInterface):
+            def run_conversion(self, nwbfile: NWBFile, metadata: dict):
+                nwbfile.add_acquisition(TimeSeries(name="InMemory", data=np.ones(500), unit="", rate=1.0))
+
+        class PlanTestNWBConverter(NWBConverter):
+            data_interface_classes = dict(Iterated=IteratedInterface, InMemory=InMemoryInterface)
+
+        cls.iterator_class = CountingDataChunkIterator
+        cls.converter = PlanTestNWBConverter(source_data=dict(Iterated=dict(), InMemory=dict()))
+        cls.metadata = cls.converter.get_metadata()
+        cls.metadata["NWBFile"]["session_start_time"] = datetime.now().astimezone()
+
+    def test_plan_conversion(self):
+        plan = self.converter.plan_conversion(metadata=self.metadata)
+        dataset_plans = {dataset_plan["path"]: dataset_plan for dataset_plan in plan["datasets"]}
+
+        iterated_plan = dataset_plans["/acquisition/Iterated/data"]
+        self.assertEqual(iterated_plan["source"], "Iterated")
+        self.assertEqual(iterated_plan["shape"], (10000, 8))
+        self.assertEqual(iterated_plan["dtype"], "int16")
+        self.assertEqual(iterated_plan["chunk_shape"], (100, 8))
+        self.assertEqual(iterated_plan["buffer_shape"], (1000, 8))
+        self.assertEqual(iterated_plan["compression"], "gzip")
+        self.assertEqual(iterated_plan["uncompressed_bytes"], 160000)
+        self.assertLess(iterated_plan["estimated_compressed_bytes"], 160000 / 10)  # all zeros compress very well
+        self.assertEqual(iterated_plan["estimated_memory_bytes"], 3 * 16000)  # the buffer written and 2 read ahead
+        self.assertGreater(iterated_plan["estimated_runtime"], 0)
+        self.assertEqual(self.iterator_class.number_of_frames_read, 100)  # only the first chunk was sampled
+
+        in_memory_plan = dataset_plans["/acquisition/InMemory/data"]
+        self.assertEqual(in_memory_plan["source"], "InMemory")
+        self.assertEqual(in_memory_plan["uncompressed_bytes"], 4000)
+        self.assertEqual(in_memory_plan["estimated_compressed_bytes"], 4000)
+        self.assertIsNone(dataset_plans["/session_start_time"]["source"])
+
+        self.assertEqual(plan["interfaces"]["InMemory"]["uncompressed_bytes"], 4008)  # with its starting_time
+        self.assertEqual(
+            plan["total_uncompressed_bytes"],
+            sum(dataset_plan["uncompressed_bytes"] for dataset_plan in plan["datasets"]),
+        )
+        self.assertGreaterEqual(plan["estimated_peak_memory_bytes"], 3 * 16000 + 4000)
+
+
+class TestConversionInstrumentation(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.test_dir = Path(mkdtemp())
+
+        class IteratedInterface(BaseDataInterface):
+            def run_conversion(self, nwbfile: NWBFile, metadata: dict):
+                iterator = SliceableDataChunkIterator(
+                    data=np.arange(80000, dtype="int16").reshape(10000, 8), buffer_shape=(1000, 8), chunk_shape=(100, 8)
+                )
+                nwbfile.add_acquisition(
+                    TimeSeries(name="Iterated", data=H5DataIO(iterator, compression="gzip"), unit="", rate=1.0)
+                )
+
+        class InstrumentationTestNWBConverter(NWBConverter):
+            data_interface_classes = dict(Iterated=IteratedInterface)
+
+        cls.converter = InstrumentationTestNWBConverter(source_data=dict(Iterated=dict()))
+        cls.metadata = cls.converter.get_metadata()
+        cls.metadata["NWBFile"]["session_start_time"] = datetime.now().astimezone()
+
+    @classmethod
+    def tearDownClass(cls):
+        rmtree(cls.test_dir)
+
+    def test_run_conversion_events(self):
+        events = []
+        instrumentation = ConversionInstrumentation(callback=events.append)
+        self.converter.run_conversion(
+            nwbfile_path=self.test_dir / "test_run_conversion_events.nwb",
+            metadata=self.metadata,
+            overwrite=True,
+            instrumentation=instrumentation,
+        )
+
+        self.assertEqual(
+            [(event["stage"], event["name"]) for event in events],
+            [
+                ("validate_metadata", None),
+                ("validate_conversion_options", None),
+                ("interface", "Iterated"),
+                ("write", str(self.test_dir / "test_run_conversion_events.nwb")),
+                ("dataset", "/acquisition/Iterated/data"),
+            ],
+        )
+        dataset_event = events[-1]
+        self.assertEqual(dataset_event["source"], "Iterated")
+        self.assertEqual(dataset_event["bytes_read"], 160000)
+        self.assertGreater(dataset_event["bytes_written"], 0)
+        self.assertLess(dataset_event["bytes_written"], 160000)
+        self.assertGreater(dataset_event["read_rate_mb"], 0)
+        for event in events[:-1]:
+            self.assertGreaterEqual(event["wall_time"], 0)
+            self.assertGreater(event["peak_rss_bytes"], 0)
+
+    def test_no_instrumentation_by_default(self):
+        with patch.object(
+            ConversionInstrumentation, "__init__", side_effect=AssertionError("Instrumentation created!")
+        ):
+            self.converter.run_conversion(
+                nwbfile_path=self.test_dir / "test_no_instrumentation_by_default.nwb",
+                metadata=self.metadata,
+                overwrite=True,
+            )
+
+    def test_write_report(self):
+        instrumentation = ConversionInstrumentation()
+        self.converter.run_conversion(
+            nwbfile_path=self.test_dir / "test_write_report.nwb",
+            metadata=self.metadata,
+            overwrite=True,
+            instrumentation=instrumentation,
+        )
+        report_file_path = self.test_dir / "report.json"
+        instrumentation.write_report(file_path=report_file_path)
+
+        with open(file=report_file_path, mode="r") as file:
+            report = json.load(file)
+        self.assertEqual(len(report["events"]), 5)
+        self.assertEqual(report["interfaces"]["Iterated"]["bytes_read"], 160000)
+        self.assertGreater(report["interfaces"]["Iterated"]["wall_time"], 0)
+        self.assertGreaterEqual(
+            report["peak_rss_bytes"], max(event["peak_rss_bytes"] for event in report["events"][:4])
+        )
+
+    def test_codec_events(self):
+        class AutoCompressedInterface(BaseDataInterface):
+            def run_conversion(self, nwbfile: NWBFile, metadata: dict):
+                iterator = SliceableDataChunkIterator(
+                    data=np.arange(80000, dtype="int16").reshape(10000, 8), buffer_shape=(1000, 8), chunk_shape=(100, 8)
+                )
+                codec_selection = select_codec(data=iterator)
+                data = H5DataIO(iterator, **codec_selection["data_io_kwargs"])
+                data.codec_selection = codec_selection
+                nwbfile.add_acquisition(TimeSeries(name="AutoCompressed", data=data, unit="", rate=1.0))
+
+        class CodecTestNWBConverter(NWBConverter):
+            data_interface_classes = dict(AutoCompressed=AutoCompressedInterface)
+
+        converter = CodecTestNWBConverter(source_data=dict(AutoCompressed=dict()))
+        instrumentation = ConversionInstrumentation()
+        converter.run_conversion(
+            nwbfile_path=self.test_dir / "test_codec_events.nwb",
+            metadata=self.metadata,
+            overwrite=True,
+            instrumentation=instrumentation,
+        )
+
+        codec_events = [event for event in instrumentation.events if event["stage"] == "codec"]
+        self.assertEqual(len(codec_events), 1)
+        self.assertEqual(codec_events[0]["name"], "/acquisition/AutoCompressed/data")
+        self.assertEqual(codec_events[0]["source"], "AutoCompressed")
+        self.assertEqual(codec_events[0]["policy"], "balanced")
+        self.assertIn(codec_events[0]["selected"], [candidate["name"] for candidate in codec_events[0]["candidates"]])
+        report = instrumentation.get_report()
+        self.assertEqual(report["interfaces"]["AutoCompressed"]["bytes_read"], 160000)
+
+
+class TestMetadataCaching(TestCase):
+    def setUp(self):
+        class HeaderInterface(BaseDataInterface):
+            number_of_header_reads = 0
+
+            def get_metadata(self):
+                HeaderInterface.number_of_header_reads += 1
+                metadata = super().get_metadata()
+                metadata["NWBFile"].update(session_description="From the header.")
+                return metadata
+
+            def run_conversion(self, nwbfile: NWBFile, metadata: dict):
+                pass
+
+        class CachingTestNWBConverter(NWBConverter):
+            data_interface_classes = dict(Header=HeaderInterface)
+
+        self.interface_class = HeaderInterface
+        self.converter = CachingTestNWBConverter(source_data=dict(Header=dict()))
+
+    def test_source_is_read_once_per_conversion(self):
+        metadata = self.converter.get_metadata()
+        metadata["NWBFile"]["session_start_time"] = datetime.now().astimezone()
+        self.converter.validate_metadata(metadata=metadata)
+        self.converter.run_conversion(nwbfile=NWBFile(**metadata["NWBFile"]), metadata=metadata)
+        self.converter.run_conversion(nwbfile=NWBFile(**metadata["NWBFile"]), metadata=metadata)
+        self.assertEqual(self.interface_class.number_of_header_reads, 1)
+
+    def test_cached_values_are_copies(self):
+        metadata = self.converter.get_metadata()
+        metadata["NWBFile"]["session_description"] = "Modified."
+        metadata_schema = self.converter.get_metadata_schema()
+        metadata_schema["properties"].clear()
+        source_schema = self.converter.get_source_schema()
+        source_schema["properties"].clear()
+
+        self.assertEqual(self.converter.get_metadata()["NWBFile"]["session_description"], "From the header.")
+        self.assertIn("NWBFile", self.converter.get_metadata_schema()["properties"])
+        self.assertIn("Header", self.converter.get_source_schema()["properties"])
+
+    def test_clear_cache(self):
+        self.converter.get_metadata()
+        self.converter.clear_cache()
+        self.converter.get_metadata()
+        self.assertEqual(self.interface_class.number_of_header_reads, 2)
+
+
+class TestSchemaValidators(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        class OptionsInterface(BaseDataInterface):
+            def __init__(self, number_of_channels: int):
+                super().__init__(number_of_channels=number_of_channels)
+
+            def run_conversion(self, nwbfile: NWBFile, metadata: dict, buffer_shape: tuple = (1000, 8)):
+                pass
+
+        class ValidatorTestNWBConverter(NWBConverter):
+            data_interface_classes = dict(Options=OptionsInterface)
+
+        cls.converter_class = ValidatorTestNWBConverter
+
+    def test_validators_are_shared_by_instances(self):
+        converter_1 = self.converter_class(source_data=dict(Options=dict(number_of_channels=8)), verbose=False)
+        converter_2 = self.converter_class(source_data=dict(Options=dict(number_of_channels=4)), verbose=False)
+        self.assertIs(converter_1._get_source_validator(), converter_2._get_source_validator())
+        self.assertIs(converter_1._get_conversion_options_validator(), converter_2._get_conversion_options_validator())
+
+    def test_validate_without_json_round_trip(self):
+        converter = self.converter_class(source_data=dict(Options=dict(number_of_channels=8)), verbose=False)
+        metadata = converter.get_metadata()
+        metadata["NWBFile"]["session_start_time"] = datetime.now().astimezone()
+        converter.validate_metadata(metadata=metadata)
+        converter.validate_conversion_options(conversion_options=dict(Options=dict(buffer_shape=(np.int64(500), 8))))
+
+    def test_invalid_source_data(self):
+        with self.assertRaises(ValidationError):
+            self.converter_class(source_data=dict(Options=dict(number_of_channels="eight")), verbose=False)
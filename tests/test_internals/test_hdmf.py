@@ -1,7 +1,30 @@
+import gc
+from datetime import datetime
+from pathlib import Path
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import skipIf
+
+import h5py
 import numpy as np
+from hdmf.backends.hdf5.h5_utils import H5DataIO
 from hdmf.testing import TestCase
+from pynwb import NWBHDF5IO, NWBFile, TimeSeries
 
-from neuroconv.tools.hdmf import SliceableDataChunkIterator
+from neuroconv.tools.hdmf import (
+    HAVE_BLOSC,
+    HAVE_HDMF_ZARR,
+    CheckpointedHDF5IODataChunkIteratorQueue,
+    DirectChunkWriteH5DataIO,
+    SliceableDataChunkIterator,
+    get_checkpoint_file_path,
+    load_checkpoint,
+    _get_zarr_data_io,
+    _replace_dci_queue,
+)
+from neuroconv.tools.codec_selection import get_codec_candidates, sample_chunks, select_codec
+from neuroconv.tools.memory_budget import MemoryBudget, get_memory_budget, set_memory_budget
+from neuroconv.tools.nwb_helpers import make_or_load_nwbfile
 
 
 class TestIteratorAssertions(TestCase):
@@ -34,3 +57,489 @@ def test_min_axis_too_large():
     """uses ~8 MB array with each contiguous axis at around ~8 KB with 5 KB buffer_size and 1 KB chunk size."""
     iterator = SliceableDataChunkIterator(data=np.empty(shape=(1000, 1000)), chunk_mb=1e-3, buffer_gb=5e-6)
     assert iterator.buffer_shape == (22, 22)
+
+
+def test_read_selection_does_not_advance_iteration():
+    data = np.arange(2000).reshape(200, 10)
+    iterator = SliceableDataChunkIterator(data=data, buffer_shape=(20, 10), chunk_shape=(10, 10))
+    np.testing.assert_array_equal(iterator.read_selection(selection=(slice(150, 160), slice(2, 4))), data[150:160, 2:4])
+    np.testing.assert_array_equal(next(iterator).data, data[:20])
+
+
+class TestPrefetching(TestCase):
+    def setUp(self):
+        self.data = np.arange(2000).reshape(200, 10)
+
+    def test_prefetch_matches_synchronous_iteration(self):
+        iterator = SliceableDataChunkIterator(data=self.data, buffer_shape=(20, 5), chunk_shape=(10, 5))
+        prefetch_iterator = SliceableDataChunkIterator(
+            data=self.data, buffer_shape=(20, 5), chunk_shape=(10, 5), prefetch_buffers=3
+        )
+        data_chunks = list(iterator)
+        prefetched_data_chunks = list(prefetch_iterator)
+
+        self.assertEqual(len(prefetched_data_chunks), 20)
+        self.assertEqual(
+            [data_chunk.selection for data_chunk in prefetched_data_chunks],
+            [data_chunk.selection for data_chunk in data_chunks],
+        )
+        for data_chunk, prefetched_data_chunk in zip(data_chunks, prefetched_data_chunks):
+            np.testing.assert_array_equal(prefetched_data_chunk.data, data_chunk.data)
+
+    def test_prefetch_memory_bound(self):
+        """Each buffer is 800 bytes, so the 1 KB bound allows only one buffer in flight at a time."""
+        iterator = SliceableDataChunkIterator(
+            data=self.data, buffer_shape=(10, 10), chunk_shape=(10, 10), prefetch_buffers=4, prefetch_gb=1e-6
+        )
+        next(iterator)
+        self.assertLessEqual(iterator._read_ahead.queued_bytes, 1000)
+        self.assertEqual(sum(1 for _ in iterator), 19)
+
+    def test_prefetch_stall_times(self):
+        iterator = SliceableDataChunkIterator(data=self.data, prefetch_buffers=2)
+        list(iterator)
+        stall_times = iterator.get_stall_times()
+        self.assertEqual(set(stall_times), {"read_stall_time", "write_stall_time"})
+        self.assertGreaterEqual(stall_times["read_stall_time"], 0.0)
+
+    def test_prefetch_read_errors_are_raised(self):
+        class FailingDataChunkIterator(SliceableDataChunkIterator):
+            def _get_data(self, selection):
+                raise OSError("Source volume unavailable!")
+
+        iterator = FailingDataChunkIterator(data=self.data, prefetch_buffers=2)
+        with self.assertRaisesWith(OSError, exc_msg="Source volume unavailable!"):
+            next(iterator)
+
+    def test_abandoned_prefetch_is_collected(self):
+        iterator = SliceableDataChunkIterator(
+            data=self.data, buffer_shape=(10, 10), chunk_shape=(10, 10), prefetch_buffers=2
+        )
+        next(iterator)
+        prefetch_thread = iterator._prefetch_thread
+        del iterator
+        gc.collect()
+
+        prefetch_thread.join(timeout=5)
+        self.assertFalse(prefetch_thread.is_alive())
+        self.assertEqual(get_memory_budget().get_usage()["reserved_bytes"], 0)
+
+    def test_close_stops_prefetch(self):
+        iterator = SliceableDataChunkIterator(
+            data=self.data, buffer_shape=(10, 10), chunk_shape=(10, 10), prefetch_buffers=2
+        )
+        next(iterator)
+        iterator.close()
+
+        self.assertFalse(iterator._prefetch_thread.is_alive())
+        self.assertEqual(get_memory_budget().get_usage()["reserved_bytes"], 0)
+        self.assertEqual(list(iterator), [])
+
+    def test_failed_write_closes_iterators(self):
+        class FailingDataChunkIterator(SliceableDataChunkIterator):
+            def _get_data(self, selection):
+                if selection[0].start >= 50:
+                    raise OSError("Source volume unavailable!")
+                return super()._get_data(selection=selection)
+
+        test_folder_path = Path(mkdtemp())
+        iterator = FailingDataChunkIterator(
+            data=self.data, buffer_shape=(10, 10), chunk_shape=(10, 10), prefetch_buffers=2
+        )
+        nwbfile = NWBFile(session_description="", identifier="", session_start_time=datetime.now().astimezone())
+        nwbfile.add_acquisition(TimeSeries(name="TestTimeSeries", data=iterator, unit="a.u.", rate=1.0))
+        try:
+            with self.assertRaisesWith(OSError, exc_msg="Source volume unavailable!"):
+                with make_or_load_nwbfile(
+                    nwbfile_path=test_folder_path / "test.nwb", nwbfile=nwbfile, overwrite=True, verbose=False
+                ):
+                    pass
+        finally:
+            rmtree(test_folder_path)
+
+        self.assertFalse(iterator._prefetch_thread.is_alive())
+        self.assertEqual(get_memory_budget().get_usage()["reserved_bytes"], 0)
+
+    def test_io_statistics(self):
+        for prefetch_buffers in [0, 2]:
+            iterator = SliceableDataChunkIterator(
+                data=self.data, buffer_shape=(20, 10), chunk_shape=(10, 10), prefetch_buffers=prefetch_buffers
+            )
+            list(iterator)
+            io_statistics = iterator.get_io_statistics()
+            self.assertEqual(io_statistics["bytes_read"], self.data.nbytes)
+            self.assertGreater(io_statistics["read_time"], 0.0)
+            self.assertGreaterEqual(io_statistics["write_time"], 0.0)
+
+    def test_negative_prefetch_buffers_assertion(self):
+        with self.assertRaisesWith(
+            AssertionError, exc_msg="prefetch_buffers (-1) must be greater than or equal to zero!"
+        ):
+            SliceableDataChunkIterator(data=self.data, prefetch_buffers=-1)
+
+
+class TestMemoryBudget(TestCase):
+    def setUp(self):
+        self.data = np.arange(20000).reshape(2000, 10)  # 160 KB
+        self.memory_budget = set_memory_budget(total_gb=40e-6)
+
+    def tearDown(self):
+        set_memory_budget()
+
+    def test_buffers_shrink_to_fit(self):
+        iterator = SliceableDataChunkIterator(data=self.data, chunk_shape=(10, 5), prefetch_buffers=1)
+        buffer_bytes = np.prod(iterator.buffer_shape) * self.data.itemsize
+        # The buffer being written, the one queued, and the one waiting for the queue
+        self.assertLessEqual(3 * buffer_bytes, 40000)
+        self.assertGreater(4 * buffer_bytes, 40000)
+
+        data_chunks = list(iterator)
+        np.testing.assert_array_equal(np.concatenate([data_chunk.data for data_chunk in data_chunks]), self.data)
+        usage = get_memory_budget().get_usage()
+        self.assertEqual(usage["reserved_bytes"], 0)
+        self.assertLessEqual(usage["peak_reserved_bytes"], 40000)
+        self.assertGreater(usage["peak_reserved_bytes"], 0)
+
+    def test_explicit_buffer_shape_is_kept(self):
+        iterator = SliceableDataChunkIterator(data=self.data, buffer_shape=(1000, 10), chunk_shape=(10, 10))
+        self.assertEqual(iterator.buffer_shape, (1000, 10))
+
+    def test_buffers_do_not_shrink_below_a_chunk(self):
+        iterator = SliceableDataChunkIterator(data=self.data, chunk_shape=(1000, 10))
+        self.assertEqual(iterator.buffer_shape, (1000, 10))
+
+    def test_buffers_fit_what_is_left_of_the_budget(self):
+        memory_budget = MemoryBudget(total_gb=1e-6)
+        self.assertEqual(memory_budget.fit_buffer_gb(buffer_gb=1.0, buffers_held=2), 5e-7)
+        memory_budget.reserve(owner=object(), nbytes=600)
+        self.assertEqual(memory_budget.fit_buffer_gb(buffer_gb=1.0, buffers_held=2), 2e-7)
+        self.assertEqual(memory_budget.fit_buffer_gb(buffer_gb=1.0, buffers_held=2, minimum_gb=3e-7), 3e-7)
+
+    def test_buffers_share_the_budget_with_registered_iterators(self):
+        memory_budget = MemoryBudget(total_gb=1e-6)
+        owner_1, owner_2 = SliceableDataChunkIterator(data=self.data), SliceableDataChunkIterator(data=self.data)
+        memory_budget.register(owner=owner_1, buffers_held=1)
+        self.assertEqual(memory_budget.fit_buffer_gb(buffer_gb=1.0, owner=owner_1), 1e-6)
+        memory_budget.register(owner=owner_2, buffers_held=3)
+        self.assertEqual(memory_budget.fit_buffer_gb(buffer_gb=1.0, owner=owner_1), 2.5e-7)
+        self.assertEqual(memory_budget.fit_buffer_gb(buffer_gb=1.0, buffers_held=2), 1.6666666666666665e-07)
+        memory_budget.unregister(owner=owner_2)
+        self.assertEqual(memory_budget.fit_buffer_gb(buffer_gb=1.0, owner=owner_1), 1e-6)
+
+    def test_iterators_created_together_share_the_budget(self):
+        iterators = [SliceableDataChunkIterator(data=self.data, chunk_shape=(10, 5)) for _ in range(2)]
+        data_chunks = [next(iterator) for iterator in iterators]
+        for iterator in iterators:
+            self.assertLessEqual(np.prod(iterator.buffer_shape) * self.data.itemsize, 20000)
+
+        for iterator, first_data_chunk in zip(iterators, data_chunks):
+            extracted_data = np.zeros_like(self.data)
+            for data_chunk in [first_data_chunk, *iterator]:
+                extracted_data[data_chunk.selection] = data_chunk.data
+            np.testing.assert_array_equal(extracted_data, self.data)
+        self.assertLessEqual(get_memory_budget().get_usage()["peak_reserved_bytes"], 40000)
+
+    def test_reservations(self):
+        memory_budget = MemoryBudget(total_gb=1e-6)
+        owner_1, owner_2 = object(), object()
+        self.assertTrue(memory_budget.reserve(owner=owner_1, nbytes=800))
+        self.assertFalse(memory_budget.reserve(owner=owner_2, nbytes=800, wait=True, should_stop=lambda: True))
+        self.assertTrue(memory_budget.reserve(owner=owner_2, nbytes=800))  # granted beyond the budget without waiting
+        self.assertEqual(memory_budget.get_usage()["number_of_owners"], 2)
+
+        memory_budget.release(owner=owner_1, nbytes=300)
+        self.assertEqual(memory_budget.reserved_bytes, 1300)
+        memory_budget.release(owner=owner_1)
+        memory_budget.release(owner=owner_2)
+        self.assertEqual(
+            memory_budget.get_usage(),
+            dict(
+                total_bytes=1000, reserved_bytes=0, peak_reserved_bytes=1600, available_bytes=1000, number_of_owners=0
+            ),
+        )
+
+
+class TestCodecSelection(TestCase):
+    def setUp(self):
+        self.data = np.tile(np.arange(1000, dtype="int16"), reps=(8, 1)).T.copy()  # smooth and highly compressible
+
+    def test_sample_chunks_pads_edges(self):
+        iterator = SliceableDataChunkIterator(data=self.data[:950], buffer_shape=(400, 8), chunk_shape=(200, 8))
+        samples = sample_chunks(data=iterator, number_of_samples=3)
+        self.assertEqual(len(samples), 3)
+        for sample in samples:
+            self.assertEqual(sample.shape, (200, 8))
+        np.testing.assert_array_equal(samples[0], self.data[:200])
+        np.testing.assert_array_equal(samples[-1][:150], self.data[800:950])
+        np.testing.assert_array_equal(samples[-1][150:], 0)
+
+        # Sampling does not consume the iterator
+        data_chunks = list(iterator)
+        np.testing.assert_array_equal(np.concatenate([data_chunk.data for data_chunk in data_chunks]), self.data[:950])
+
+    def test_sample_chunks_of_array(self):
+        samples = sample_chunks(data=self.data, chunk_shape=(100, 8), number_of_samples=20)
+        self.assertEqual(len(samples), 10)
+
+    def test_select_codec_policies(self):
+        iterator = SliceableDataChunkIterator(data=self.data, buffer_shape=(500, 8), chunk_shape=(100, 8))
+        for policy, key in [("ratio", "ratio"), ("speed", "rate_mb")]:
+            codec_selection = select_codec(data=iterator, policy=policy)
+            candidates = codec_selection["candidates"]
+            self.assertEqual(codec_selection["policy"], policy)
+            self.assertEqual(len(candidates), len(get_codec_candidates()))
+            best_candidate = max(candidates, key=lambda candidate: candidate[key])
+            self.assertEqual(codec_selection["name"], best_candidate["name"])
+            self.assertEqual(codec_selection["data_io_kwargs"], best_candidate["data_io_kwargs"])
+
+    def test_select_codec_min_rate(self):
+        codec_selection = select_codec(data=self.data, chunk_shape=(100, 8), policy="ratio", min_rate_mb=float("inf"))
+        fastest_candidate = max(codec_selection["candidates"], key=lambda candidate: candidate["rate_mb"])
+        self.assertEqual(codec_selection["name"], fastest_candidate["name"])
+
+    def test_invalid_policy_assertion(self):
+        with self.assertRaisesWith(
+            AssertionError, exc_msg="policy (smallest) must be one of ['balanced', 'ratio', 'speed']!"
+        ):
+            select_codec(data=self.data, chunk_shape=(100, 8), policy="smallest")
+
+    def test_write_selected_codec(self):
+        iterator = SliceableDataChunkIterator(data=self.data, buffer_shape=(500, 8), chunk_shape=(100, 8))
+        codec_selection = select_codec(data=iterator)
+        nwbfile = NWBFile(session_description="", identifier="", session_start_time=datetime.now().astimezone())
+        time_series = TimeSeries(
+            name="raw", data=H5DataIO(iterator, **codec_selection["data_io_kwargs"]), unit="", rate=1.0
+        )
+        nwbfile.add_acquisition(time_series)
+        nwbfile_path = Path(mkdtemp()) / "test_codec_selection.nwb"
+        try:
+            with NWBHDF5IO(path=str(nwbfile_path), mode="w") as io:
+                io.write(nwbfile)
+            with NWBHDF5IO(path=str(nwbfile_path), mode="r") as io:
+                np.testing.assert_array_equal(io.read().acquisition["raw"].data[:], self.data)
+        finally:
+            rmtree(nwbfile_path.parent)
+
+    def test_direct_chunk_write_candidates(self):
+        for candidate in get_codec_candidates(direct_chunk_write=True):
+            self.assertIn(candidate["data_io_kwargs"]["compression"], ["gzip", "blosc"])
+
+    @skipIf(not HAVE_BLOSC, reason="hdf5plugin and blosc are required for Blosc compression.")
+    def test_write_selected_codec_directly(self):
+        iterator = SliceableDataChunkIterator(data=self.data, buffer_shape=(500, 8), chunk_shape=(100, 8))
+        codec_selection = select_codec(data=iterator, policy="speed", direct_chunk_write=True)
+        nwbfile = NWBFile(session_description="", identifier="", session_start_time=datetime.now().astimezone())
+        data = DirectChunkWriteH5DataIO(data=iterator, **codec_selection["data_io_kwargs"])
+        nwbfile.add_acquisition(TimeSeries(name="raw", data=data, unit="", rate=1.0))
+        nwbfile_path = Path(mkdtemp()) / "test_codec_selection.nwb"
+        try:
+            with NWBHDF5IO(path=str(nwbfile_path), mode="w") as io:
+                io.write(nwbfile)
+            with NWBHDF5IO(path=str(nwbfile_path), mode="r") as io:
+                np.testing.assert_array_equal(io.read().acquisition["raw"].data[:], self.data)
+        finally:
+            rmtree(nwbfile_path.parent)
+
+
+class TestDirectChunkWrite(TestCase):
+    def setUp(self):
+        self.test_dir = Path(mkdtemp())
+        # Edge buffers and chunks along both axes exercise the zero-padding of partial chunks
+        self.data = np.random.default_rng(seed=0).integers(low=-1000, high=1000, size=(1003, 7), dtype="int16")
+
+    def tearDown(self):
+        rmtree(self.test_dir)
+
+    def _write_time_series(self, data, file_name: str) -> Path:
+        nwbfile_path = self.test_dir / file_name
+        nwbfile = NWBFile(session_description="", identifier="", session_start_time=datetime.now().astimezone())
+        nwbfile.add_acquisition(TimeSeries(name="TestTimeSeries", data=data, unit="", rate=1.0))
+        with NWBHDF5IO(path=str(nwbfile_path), mode="w") as io:
+            io.write(nwbfile)
+        return nwbfile_path
+
+    def _make_iterator(self):
+        return SliceableDataChunkIterator(data=self.data, buffer_shape=(200, 7), chunk_shape=(50, 4))
+
+    def _assert_chunks_match_filter_pipeline(self, direct_data_io, reference_data_io):
+        direct_path = self._write_time_series(data=direct_data_io, file_name="direct.nwb")
+        reference_path = self._write_time_series(data=reference_data_io, file_name="reference.nwb")
+        with h5py.File(direct_path, mode="r") as direct_file, h5py.File(reference_path, mode="r") as reference_file:
+            direct_dataset = direct_file["acquisition/TestTimeSeries/data"]
+            reference_dataset = reference_file["acquisition/TestTimeSeries/data"]
+            np.testing.assert_array_equal(direct_dataset[:], self.data)
+            self.assertEqual(direct_dataset.chunks, (50, 4))
+            self.assertEqual(direct_dataset.compression, reference_dataset.compression)
+            self.assertEqual(direct_dataset.shuffle, reference_dataset.shuffle)
+            for chunk_offset in [(0, 0), (500, 4), (1000, 4)]:
+                self.assertEqual(
+                    direct_dataset.id.read_direct_chunk(chunk_offset),
+                    reference_dataset.id.read_direct_chunk(chunk_offset),
+                )
+
+    def test_gzip(self):
+        self._assert_chunks_match_filter_pipeline(
+            direct_data_io=DirectChunkWriteH5DataIO(data=self._make_iterator(), number_of_jobs=2),
+            reference_data_io=H5DataIO(data=self._make_iterator(), compression="gzip"),
+        )
+
+    def test_gzip_with_shuffle_and_processes(self):
+        self._assert_chunks_match_filter_pipeline(
+            direct_data_io=DirectChunkWriteH5DataIO(
+                data=self._make_iterator(), compression_opts=6, shuffle=True, number_of_jobs=2, use_processes=True
+            ),
+            reference_data_io=H5DataIO(
+                data=self._make_iterator(), compression="gzip", compression_opts=6, shuffle=True
+            ),
+        )
+
+    @skipIf(not HAVE_BLOSC, reason="Blosc compression requires hdf5plugin and blosc!")
+    def test_blosc(self):
+        nwbfile_path = self._write_time_series(
+            data=DirectChunkWriteH5DataIO(data=self._make_iterator(), compression="blosc"), file_name="blosc.nwb"
+        )
+        with NWBHDF5IO(path=str(nwbfile_path), mode="r") as io:
+            nwbfile = io.read()
+            np.testing.assert_array_equal(nwbfile.acquisition["TestTimeSeries"].data[:], self.data)
+
+    @skipIf(not HAVE_BLOSC, reason="Blosc compression requires hdf5plugin and blosc!")
+    def test_blosc_with_compression_opts(self):
+        import hdf5plugin
+
+        compression_opts = dict(cname="zstd", clevel=3, shuffle=hdf5plugin.Blosc.BITSHUFFLE)
+        nwbfile_path = self._write_time_series(
+            data=DirectChunkWriteH5DataIO(
+                data=self._make_iterator(), compression="blosc", compression_opts=compression_opts, number_of_jobs=2
+            ),
+            file_name="blosc_zstd.nwb",
+        )
+        with h5py.File(nwbfile_path, mode="r") as file:
+            dataset = file["acquisition/TestTimeSeries/data"]
+            np.testing.assert_array_equal(dataset[:], self.data)
+            expected_filter = hdf5plugin.Blosc(**compression_opts)
+            self.assertEqual(dataset.id.get_create_plist().get_filter(0)[2][-3:], expected_filter.filter_options[-3:])
+
+    def test_unsupported_compression_assertion(self):
+        with self.assertRaisesWith(AssertionError, exc_msg="compression (lzf) must be either 'gzip' or 'blosc'!"):
+            DirectChunkWriteH5DataIO(data=self._make_iterator(), compression="lzf")
+
+
+class TestResumableWrite(TestCase):
+    class CountingDataChunkIterator(SliceableDataChunkIterator):
+        def __init__(self, fail_on_buffer: int = None, **kwargs):
+            self.fail_on_buffer = fail_on_buffer
+            self.number_of_buffer_reads = 0
+            super().__init__(**kwargs)
+
+        def _get_data(self, selection):
+            if self.number_of_buffer_reads == self.fail_on_buffer:
+                raise OSError("Source volume unavailable!")
+            self.number_of_buffer_reads += 1
+            return super()._get_data(selection=selection)
+
+    def setUp(self):
+        self.test_dir = Path(mkdtemp())
+        self.nwbfile_path = self.test_dir / "test_resumable_write.nwb"
+        self.metadata = dict(NWBFile=dict(session_start_time=datetime.now().astimezone()))
+        self.data = np.arange(2000, dtype="int32").reshape(200, 10)
+
+    def tearDown(self):
+        rmtree(self.test_dir)
+
+    def _write(self, fail_on_buffer: int = None) -> tuple:
+        """Write two series with buffers of 20 frames, which are committed alternately."""
+        iterators = (
+            self.CountingDataChunkIterator(data=self.data, buffer_shape=(20, 10), chunk_shape=(10, 10)),
+            self.CountingDataChunkIterator(
+                data=-self.data, buffer_shape=(20, 10), chunk_shape=(10, 10), fail_on_buffer=fail_on_buffer
+            ),
+        )
+        with make_or_load_nwbfile(
+            nwbfile_path=self.nwbfile_path, metadata=self.metadata, overwrite=True, verbose=False, resume=True
+        ) as nwbfile:
+            for name, iterator in zip(["raw", "inverted"], iterators):
+                nwbfile.add_acquisition(TimeSeries(name=name, data=H5DataIO(iterator), unit="", rate=1.0))
+        return iterators
+
+    def test_resume_interrupted_write(self):
+        with self.assertRaisesWith(OSError, exc_msg="Source volume unavailable!"):
+            self._write(fail_on_buffer=4)
+        checkpoint = load_checkpoint(checkpoint_file_path=get_checkpoint_file_path(nwbfile_path=self.nwbfile_path))
+        self.assertTrue(checkpoint["structure_written"])
+        self.assertEqual(checkpoint["datasets"]["/acquisition/raw/data"]["committed_buffers"], 5)
+        self.assertEqual(checkpoint["datasets"]["/acquisition/inverted/data"]["committed_buffers"], 4)
+
+        raw_iterator, inverted_iterator = self._write()
+        self.assertEqual(raw_iterator.number_of_buffer_reads, 5)
+        self.assertEqual(inverted_iterator.number_of_buffer_reads, 6)
+        self.assertFalse(get_checkpoint_file_path(nwbfile_path=self.nwbfile_path).exists())
+        with NWBHDF5IO(path=str(self.nwbfile_path), mode="r") as io:
+            nwbfile = io.read()
+            np.testing.assert_array_equal(nwbfile.acquisition["raw"].data[:], self.data)
+            np.testing.assert_array_equal(nwbfile.acquisition["inverted"].data[:], -self.data)
+
+    def test_completed_write_removes_checkpoint(self):
+        raw_iterator, inverted_iterator = self._write()
+        self.assertEqual(raw_iterator.number_of_buffer_reads, 10)
+        self.assertFalse(get_checkpoint_file_path(nwbfile_path=self.nwbfile_path).exists())
+
+        # Without a checkpoint, writing again starts from scratch
+        raw_iterator, inverted_iterator = self._write()
+        self.assertEqual(inverted_iterator.number_of_buffer_reads, 10)
+
+    def test_changed_buffers_assertion(self):
+        with self.assertRaisesWith(OSError, exc_msg="Source volume unavailable!"):
+            self._write(fail_on_buffer=4)
+        self.data = self.data[:100]
+        with self.assertRaisesWith(
+            AssertionError,
+            exc_msg="The buffers of '/acquisition/raw/data' no longer match those of the checkpoint; cannot resume!",
+        ):
+            self._write()
+
+    def test_unsupported_hdmf_version_assertion(self):
+        from hdmf.backends.hdf5 import HDF5IO
+
+        with self.assertRaisesWith(
+            AssertionError,
+            exc_msg=(
+                "HDF5IO no longer stores its queue of DataChunkIterators in '_HDF5IO__dci_queue'; "
+                "this version of hdmf is not supported by the customized IO!"
+            ),
+        ):
+            _replace_dci_queue(
+                io=object(),
+                io_class=HDF5IO,
+                dci_queue=CheckpointedHDF5IODataChunkIteratorQueue(
+                    checkpoint_file_path=get_checkpoint_file_path(nwbfile_path=self.nwbfile_path)
+                ),
+            )
+
+
+@skipIf(not (HAVE_BLOSC and HAVE_HDMF_ZARR), reason="Translating plugin filters requires hdf5plugin and hdmf-zarr!")
+class TestZarrDataIO(TestCase):
+    def test_plugin_filters_are_translated(self):
+        import hdf5plugin
+        import numcodecs
+
+        data = np.arange(2000, dtype="int16").reshape(200, 10)
+        for h5_filter, shuffle, expected_compressor in [
+            (
+                hdf5plugin.Blosc(cname="zstd", clevel=5, shuffle=hdf5plugin.Blosc.SHUFFLE),
+                False,
+                numcodecs.Blosc(cname="zstd", clevel=5, shuffle=numcodecs.Blosc.SHUFFLE),
+            ),
+            (hdf5plugin.Zstd(clevel=7), True, numcodecs.Zstd(level=7)),
+        ]:
+            data_io = H5DataIO(
+                data=data,
+                compression=h5_filter.filter_id,
+                compression_opts=h5_filter.filter_options,
+                shuffle=shuffle,
+                allow_plugin_filters=True,
+            )
+            zarr_data_io = _get_zarr_data_io(data_io=data_io)
+            self.assertEqual(zarr_data_io.io_settings["compressor"], expected_compressor)
+            self.assertEqual(
+                zarr_data_io.io_settings.get("filters"), [numcodecs.Shuffle(elementsize=2)] if shuffle else None
+            )
@@ -6,6 +6,7 @@ from parameterized import parameterized, param
 from nwbinspector.utils import get_package_version
 from roiextractors.testing import generate_dummy_imaging_extractor
 
+from neuroconv.tools.memory_budget import get_memory_budget, set_memory_budget
 from neuroconv.tools.roiextractors.imagingextractordatachunkiterator import ImagingExtractorDataChunkIterator
 
 
@@ -185,3 +186,52 @@ class TestImagingExtractorDataChunkIterator(TestCase):
 
         self.assertEqual(dci.display_progress, True)
         self.assertEqual(dci.progress_bar.desc, "Test Progress Bar")
+
+    def test_spatial_tiles_read_each_frame_once(self):
+        """Test that buffers tiling the field of view decode each range of frames only once."""
+        imaging_extractor = generate_dummy_imaging_extractor(num_frames=20, num_rows=10, num_columns=12)
+        read_frame_ranges = []
+        get_video = imaging_extractor.get_video
+
+        def counted_get_video(start_frame=None, end_frame=None, **kwargs):
+            read_frame_ranges.append((start_frame, end_frame))
+            return get_video(start_frame=start_frame, end_frame=end_frame, **kwargs)
+
+        imaging_extractor.get_video = counted_get_video
+        dci = ImagingExtractorDataChunkIterator(
+            imaging_extractor=imaging_extractor, buffer_shape=(10, 6, 5), chunk_shape=(5, 3, 5)
+        )
+
+        data_chunks = np.zeros(dci.maxshape)
+        for data_chunk in dci:
+            data_chunks[data_chunk.selection] = data_chunk.data
+
+        self.assertEqual(read_frame_ranges, [(0, 10), (10, 20)])
+        assert_array_equal(data_chunks, get_video().transpose((0, 2, 1)))
+
+    def test_cached_frame_blocks_are_reserved_from_the_memory_budget(self):
+        imaging_extractor = generate_dummy_imaging_extractor(num_frames=20, num_rows=10, num_columns=12)
+        dci = ImagingExtractorDataChunkIterator(
+            imaging_extractor=imaging_extractor, buffer_shape=(10, 6, 5), chunk_shape=(5, 3, 5)
+        )
+        next(dci)
+        frame_block_bytes = 10 * 12 * 10 * dci.dtype.itemsize
+        self.assertEqual(dci._cached_frame_block[2].nbytes, frame_block_bytes)
+        self.assertEqual(
+            get_memory_budget().get_usage()["reserved_bytes"], frame_block_bytes + 10 * 6 * 5 * dci.dtype.itemsize
+        )
+        dci.close()
+        self.assertEqual(get_memory_budget().get_usage()["reserved_bytes"], 0)
+
+        set_memory_budget(total_gb=frame_block_bytes / 2e9)  # room for the buffers, but not for a block of frames
+        try:
+            dci = ImagingExtractorDataChunkIterator(
+                imaging_extractor=imaging_extractor, buffer_shape=(10, 6, 5), chunk_shape=(5, 3, 5)
+            )
+            data_chunks = np.zeros(dci.maxshape)
+            for data_chunk in dci:
+                self.assertIsNone(dci._cached_frame_block)
+                data_chunks[data_chunk.selection] = data_chunk.data
+            assert_array_equal(data_chunks, imaging_extractor.get_video().transpose((0, 2, 1)))
+        finally:
+            set_memory_budget()
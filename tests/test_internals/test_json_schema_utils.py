@@ -3,6 +3,11 @@ import json
 from pathlib import Path
 from typing import Union
 from copy import deepcopy
+from datetime import datetime
+
+import numpy as np
+import pytest
+from jsonschema import ValidationError
 
 from neuroconv.utils import (
     get_schema_from_method_signature,
@@ -10,6 +15,7 @@ from neuroconv.utils import (
     fill_defaults,
     load_dict_from_file,
 )
+from neuroconv.utils.json_schema import get_schema_validator
 
 
 def compare_dicts(a: dict, b: dict):
@@ -214,3 +220,43 @@ def test_load_metadata_from_file():
 
     m2 = load_dict_from_file(file_path=json_file_path)
     compare_dicts_2(m0, m2)
+
+
+def test_get_schema_validator():
+    schema = dict(
+        type="object",
+        properties=dict(
+            session_start_time=dict(type="string", format="date-time"),
+            rate=dict(type="number"),
+            count=dict(type="integer"),
+            flag=dict(type="boolean"),
+            shape=dict(type="array", items=dict(type="integer")),
+        ),
+    )
+    validator = get_schema_validator(schema=schema)
+
+    instance = dict(
+        session_start_time=datetime.now().astimezone(),
+        rate=np.float32(30.0),
+        count=np.int64(3),
+        flag=np.bool_(True),
+        shape=(np.uint16(100), 8),
+    )
+    assert list(validator.iter_errors(instance=instance)) == []
+    with pytest.raises(ValidationError):
+        validator.validate(instance=dict(count="three"))
+
+
+def test_get_schema_validator_datetime_only_for_date_time_strings():
+    schema = dict(
+        type="object",
+        properties=dict(
+            session_start_time=dict(type="string", format="date-time", maxLength=4),
+            name=dict(type="string", pattern="^[a-z]+$", maxLength=4),
+        ),
+    )
+    validator = get_schema_validator(schema=schema)
+
+    assert list(validator.iter_errors(instance=dict(session_start_time=datetime.now()))) == []
+    errors = list(validator.iter_errors(instance=dict(name=datetime.now())))
+    assert [error.validator for error in errors] == ["type"]
@@ -0,0 +1,38 @@
+import sys
+import subprocess
+import unittest
+
+
+class TestLazyImports(unittest.TestCase):
+    def run_in_fresh_interpreter(self, code: str) -> str:
+        return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+
+    def test_heavy_dependencies_not_imported_with_package(self):
+        heavy_modules = [
+            "spikeinterface",
+            "spikeextractors",
+            "roiextractors",
+            "neo",
+            "dandi",
+            "hdf5plugin",
+            "blosc",
+            "hdmf_zarr",
+        ]
+        code = f"import sys; import neuroconv; print(','.join(sorted(set(sys.modules) & {set(heavy_modules)})))"
+        imported_heavy_modules = self.run_in_fresh_interpreter(code=code).strip()
+        assert imported_heavy_modules == "", f"'import neuroconv' imported {imported_heavy_modules}!"
+
+    def test_only_accessed_interfaces_are_imported(self):
+        code = (
+            "import sys; from neuroconv import SIPickleRecordingExtractorInterface, spikeinterface; "
+            "print(spikeinterface.__name__); print('roiextractors' in sys.modules)"
+        )
+        submodule_name, roiextractors_imported = self.run_in_fresh_interpreter(code=code).splitlines()
+        assert submodule_name == "neuroconv.tools.spikeinterface.spikeinterface"
+        assert roiextractors_imported == "False"
+
+    def test_interface_list(self):
+        from neuroconv import interface_list
+
+        assert len(interface_list) == 39
+        assert all(isinstance(data_interface, type) for data_interface in interface_list)
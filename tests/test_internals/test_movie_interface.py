@@ -6,9 +6,11 @@ from datetime import datetime
 from pathlib import Path
 
 import numpy as np
-from pynwb import NWBHDF5IO
+from pynwb import NWBHDF5IO, NWBFile
 
 from neuroconv import NWBConverter, MovieInterface
+from neuroconv.tools.memory_budget import get_memory_budget
+from neuroconv.tools.nwb_helpers import make_or_load_nwbfile
 
 try:
     import cv2
@@ -270,3 +272,82 @@ class TestMovieInterface(TestCase):
                 movie_interface_name = movie_metadata["name"]
                 assert acquisition_module[movie_interface_name].rate == rate
                 assert acquisition_module[movie_interface_name].timestamps is None
+
+
+@unittest.skipIf(skip_test, "cv2 not installed")
+class TestMovieInterfaceRunConversion(TestCase):
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+        self.movie_files = []
+        fourcc = cv2.VideoWriter_fourcc(*("M", "J", "P", "G"))
+        for movie_index, fps in enumerate([25, 30]):
+            movie_file = str(self.test_dir / f"test{movie_index}.avi")
+            writer = cv2.VideoWriter(filename=movie_file, fourcc=fourcc, fps=fps, frameSize=(48, 64))
+            for frame in range(10):
+                writer.write(np.random.randint(0, 255, (64, 48, 3)).astype("uint8"))
+            writer.release()
+            self.movie_files.append(movie_file)
+        self.movie_interface = MovieInterface(file_paths=self.movie_files)
+        self.nwbfile = NWBFile(session_description="", identifier="", session_start_time=datetime.now().astimezone())
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_movie_external_mode_timestamps_per_movie(self):
+        starting_times = [0.0, 50.0]
+        metadata = self.movie_interface.get_metadata()
+        self.movie_interface.run_conversion(
+            nwbfile=self.nwbfile, metadata=metadata, starting_times=starting_times, external_mode=True
+        )
+
+        for starting_time, rate, movie_metadata in zip(starting_times, [25.0, 30.0], metadata["Behavior"]["Movies"]):
+            image_series = self.nwbfile.acquisition[movie_metadata["name"]]
+            self.assertEqual(image_series.starting_time, starting_time)
+            self.assertAlmostEqual(image_series.rate, rate, places=3)
+
+    def test_movie_chunk_data_progress_bar(self):
+        metadata = self.movie_interface.get_metadata()
+        self.movie_interface.run_conversion(
+            nwbfile=self.nwbfile, metadata=metadata, starting_times=[0.0, 50.0], external_mode=False
+        )
+
+        for movie_file, movie_metadata in zip(self.movie_files, metadata["Behavior"]["Movies"]):
+            movie_iterator = self.nwbfile.acquisition[movie_metadata["name"]].data.data
+            self.assertEqual(movie_iterator.progress_bar.desc, f"Writing movie data for {Path(movie_file).name}")
+            self.assertEqual(movie_iterator.buffer_shape, (10, 64, 48, 3))
+
+    def test_movie_concurrent_decoding(self):
+        metadata = self.movie_interface.get_metadata()
+        nwbfile_path = str(self.test_dir / "movie_test.nwb")
+        with make_or_load_nwbfile(nwbfile_path=nwbfile_path, nwbfile=self.nwbfile, overwrite=True, verbose=False):
+            self.movie_interface.run_conversion(
+                nwbfile=self.nwbfile,
+                metadata=metadata,
+                starting_times=[0.0, 50.0],
+                external_mode=False,
+                number_of_jobs=2,
+            )
+            for movie_metadata in metadata["Behavior"]["Movies"]:
+                movie_iterator = self.nwbfile.acquisition[movie_metadata["name"]].data.data
+                self.assertEqual(movie_iterator.prefetch_buffers, 1)
+                self.assertTrue(movie_iterator.writes_round_robin)
+
+        self.assertEqual(get_memory_budget().get_usage()["reserved_bytes"], 0)
+        with NWBHDF5IO(path=nwbfile_path, mode="r") as io:
+            acquisition = io.read().acquisition
+            for movie_metadata in metadata["Behavior"]["Movies"]:
+                self.assertEqual(acquisition[movie_metadata["name"]].data.shape, (10, 64, 48, 3))
+
+    def test_movie_compression_without_chunk_data(self):
+        metadata = self.movie_interface.get_metadata()
+        self.movie_interface.run_conversion(
+            nwbfile=self.nwbfile,
+            metadata=metadata,
+            starting_times=[0.0, 50.0],
+            external_mode=False,
+            chunk_data=False,
+            compression="lzf",
+        )
+
+        for movie_metadata in metadata["Behavior"]["Movies"]:
+            self.assertEqual(self.nwbfile.acquisition[movie_metadata["name"]].data.io_settings["compression"], "lzf")
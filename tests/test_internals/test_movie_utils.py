@@ -1,16 +1,26 @@
+import json
 import os
+import shutil
 import tempfile
 import unittest
+from unittest.mock import patch
 
 import numpy as np
 from numpy.testing import assert_array_equal
 from pynwb.image import ImageSeries
 from pynwb import NWBHDF5IO
 from datetime import datetime
+from time import perf_counter
 from hdmf.backends.hdf5.h5_utils import H5DataIO
 
-from neuroconv.datainterfaces.behavior.movie.movie_utils import VideoCaptureContext, MovieDataChunkIterator
-from neuroconv.tools.nwb_helpers import make_nwbfile_from_metadata
+from neuroconv.datainterfaces.behavior.movie import movie_utils
+from neuroconv.datainterfaces.behavior.movie.movie_utils import (
+    HAVE_PYAV,
+    VideoCaptureContext,
+    MovieDataChunkIterator,
+    get_timestamps_cache_file_path,
+)
+from neuroconv.tools.nwb_helpers import make_nwbfile_from_metadata, make_or_load_nwbfile
 
 try:
     import cv2
@@ -57,6 +67,84 @@ class TestVideoContext(unittest.TestCase):
             ts = vcc.get_movie_timestamps()
         self.assertEqual(len(ts), self.number_of_frames)
 
+    def test_timestamps_cache(self):
+        cache_file_path = get_timestamps_cache_file_path(self.movie_loc)
+        with VideoCaptureContext(self.movie_loc) as vcc:
+            ts = vcc.get_movie_timestamps()
+        self.assertTrue(cache_file_path.is_file())
+        np.testing.assert_allclose(ts, np.arange(self.number_of_frames) / self.fps)
+
+        # The cache is reused as long as the movie is unchanged
+        with open(cache_file_path, "r") as file:
+            cache = json.load(file)
+        cache["timestamps"] = list(range(self.number_of_frames))
+        with open(cache_file_path, "w") as file:
+            json.dump(cache, file)
+        with VideoCaptureContext(self.movie_loc) as vcc:
+            assert_array_equal(vcc.get_movie_timestamps(), np.arange(self.number_of_frames))
+            vcc.frame_count = 3
+            assert_array_equal(vcc.get_movie_timestamps(), np.arange(3))
+
+        os.utime(self.movie_loc, ns=(0, 0))
+        with VideoCaptureContext(self.movie_loc) as vcc:
+            assert_array_equal(vcc.get_movie_timestamps(), ts)
+
+    def test_timestamps_without_cache(self):
+        with VideoCaptureContext(self.movie_loc) as vcc:
+            ts = vcc.get_movie_timestamps(use_cache=False)
+        self.assertEqual(len(ts), self.number_of_frames)
+        self.assertFalse(get_timestamps_cache_file_path(self.movie_loc).exists())
+
+    def test_decoded_timestamps_keep_the_frame_position(self):
+        frames = np.empty(shape=(self.number_of_frames, *self.frame_shape), dtype="uint8")
+        with patch.object(movie_utils, "_get_container_index", side_effect=OSError("Invalid data")):
+            with VideoCaptureContext(self.movie_loc) as vcc:
+                vcc.read_frames(frames=frames[:10])
+                ts = vcc.get_movie_timestamps(use_cache=False)
+                self.assertEqual(vcc.current_frame, 10)
+                vcc.read_frames(frames=frames[10:])
+        np.testing.assert_allclose(ts, np.arange(self.number_of_frames) / self.fps)
+        assert_array_equal(frames, np.flip(self.movie_frames, 3))
+
+    @unittest.skipIf(not HAVE_PYAV, "av not installed")
+    def test_container_timestamps_match_decoded_timestamps(self):
+        with VideoCaptureContext(self.movie_loc) as vcc:
+            container_ts = vcc.get_movie_timestamps(use_cache=False)
+        with VideoCaptureContext(self.movie_loc) as vcc:
+            decoded_ts = vcc._get_decoded_timestamps(frame_count=self.number_of_frames)
+        np.testing.assert_allclose(container_ts, decoded_ts)
+
+    def test_movie_properties_are_probed_once(self):
+        with VideoCaptureContext(self.movie_loc) as vcc:
+            movie_properties = vcc.get_movie_properties()
+        self.assertEqual(
+            movie_properties,
+            dict(
+                frame_shape=self.frame_shape,
+                dtype=np.dtype("uint8"),
+                fps=self.fps,
+                frame_count=self.number_of_frames,
+                codec="HFYU",
+            ),
+        )
+        with VideoCaptureContext(self.movie_loc) as vcc:
+            self.assertIs(vcc.get_movie_properties(), movie_properties)
+            self.assertEqual(vcc.get_movie_codec(), "HFYU")
+            self.assertEqual(vcc.current_frame, 0)
+
+        os.utime(self.movie_loc, ns=(0, 0))
+        with VideoCaptureContext(self.movie_loc) as vcc:
+            self.assertIsNot(vcc.get_movie_properties(), movie_properties)
+
+    def test_context_does_not_reopen(self):
+        vcc = VideoCaptureContext(self.movie_loc)
+        video_capture = vcc.vc
+        with vcc:
+            self.assertIs(vcc.vc, video_capture)
+        with vcc:
+            self.assertIsNot(vcc.vc, video_capture)
+            self.assertTrue(vcc.isOpened())
+
     def test_fps(self):
         with VideoCaptureContext(self.movie_loc) as vcc:
             fps = vcc.get_movie_fps()
@@ -84,6 +172,67 @@ class TestVideoContext(unittest.TestCase):
         self.assertFalse(vcc.vc.isOpened())
         vcc.release()
 
+    def test_read_frames(self):
+        frames = np.empty(shape=(self.number_of_frames + 5, *self.frame_shape), dtype="uint8")
+        with VideoCaptureContext(self.movie_loc) as vcc:
+            number_of_frames_read = vcc.read_frames(frames=frames[:10])
+            number_of_frames_read += vcc.read_frames(frames=frames[10:])
+        self.assertEqual(number_of_frames_read, self.number_of_frames)
+        assert_array_equal(frames[: self.number_of_frames], np.flip(self.movie_frames, 3))
+
+    def test_iterator_data(self):
+        iterator = MovieDataChunkIterator(self.movie_loc, buffer_gb=2e-4, chunk_shape=(1, *self.frame_shape))
+        data_chunks = list(iterator)
+        self.assertEqual(iterator.buffer_shape, (3, *self.frame_shape))
+        for data_chunk in data_chunks:
+            self.assertEqual(data_chunk.data.dtype, np.dtype("uint8"))
+        assert_array_equal(
+            np.concatenate([data_chunk.data for data_chunk in data_chunks]), np.flip(self.movie_frames, 3)
+        )
+
+    def test_seek_frame(self):
+        keyframe_indices = np.array([0, 10, 20])
+        with VideoCaptureContext(self.movie_loc) as vcc:
+            for frame_number in [15, 16, 5, 25]:
+                vcc.seek_frame(frame_number=frame_number, keyframe_indices=keyframe_indices)
+                self.assertEqual(vcc.current_frame, frame_number)
+                assert_array_equal(next(vcc), np.flip(self.movie_frames[frame_number], 2))
+
+    @unittest.skipIf(not HAVE_PYAV, "av not installed")
+    def test_keyframe_indices(self):
+        with VideoCaptureContext(self.movie_loc) as vcc:
+            keyframe_indices = vcc.get_keyframe_indices(use_cache=False)
+        assert_array_equal(keyframe_indices, np.arange(self.number_of_frames))  # HFYU is intra-frame only
+
+    def test_parallel_iterator_data(self):
+        for use_processes in [False, True]:
+            iterator = MovieDataChunkIterator(
+                self.movie_loc,
+                buffer_gb=2e-4,
+                chunk_shape=(1, *self.frame_shape),
+                number_of_jobs=3,
+                use_processes=use_processes,
+            )
+            data_chunks = list(iterator)
+            self.assertEqual(len(data_chunks), 10)
+            assert_array_equal(
+                np.concatenate([data_chunk.data for data_chunk in data_chunks]), np.flip(self.movie_frames, 3)
+            )
+            self.assertIsNone(iterator._decoding_executor)
+
+    def test_parallel_iterator_random_access(self):
+        iterator = MovieDataChunkIterator(
+            self.movie_loc, buffer_gb=2e-4, chunk_shape=(1, *self.frame_shape), number_of_jobs=2
+        )
+        assert_array_equal(
+            iterator._get_data(selection=(slice(12, 15), slice(0, 10), slice(None), slice(None))),
+            np.flip(self.movie_frames[12:15, :10], 3),
+        )
+        data_chunks = list(iterator)
+        assert_array_equal(
+            np.concatenate([data_chunk.data for data_chunk in data_chunks]), np.flip(self.movie_frames, 3)
+        )
+
     def test_stub_iterable(self):
         with VideoCaptureContext(self.movie_loc) as vcc:
             vcc.frame_count = 3
@@ -206,6 +355,45 @@ class TestMovieInterface(unittest.TestCase):
                 [nwbfile.acquisition["imageseries"].data.chunks[i] == j for i, j in enumerate(custom_frame_shape)]
             )
 
+    def test_round_robin_iterators_decode_concurrently(self):
+        frame_shape = (64, 48, 3)
+        movie_files = [self.create_movie(self.fps, frame_shape, 20)]
+        movie_files.append(os.path.join(self.test_dir, "test_copy.avi"))
+        shutil.copy(movie_files[0], movie_files[1])
+
+        decode_times = {movie_file: [] for movie_file in movie_files}
+        get_data = MovieDataChunkIterator._get_data
+
+        def timed_get_data(iterator, selection):
+            start_time = perf_counter()
+            frames = get_data(iterator, selection)
+            decode_times[iterator.video_capture_ob.file_path].append((start_time, perf_counter()))
+            return frames
+
+        with patch.object(MovieDataChunkIterator, "_get_data", timed_get_data):
+            with make_or_load_nwbfile(
+                nwbfile_path=self.nwbfile_path,
+                metadata=dict(NWBFile=dict(session_start_time=datetime.now().astimezone())),
+                overwrite=True,
+                verbose=False,
+            ) as nwbfile:
+                for index, movie_file in enumerate(movie_files):
+                    iterator = MovieDataChunkIterator(
+                        movie_file,
+                        buffer_gb=4 * np.prod(frame_shape) / 1e9,
+                        chunk_shape=(1, *frame_shape),
+                        prefetch_buffers=1,
+                    )
+                    iterator.writes_round_robin = True
+                    nwbfile.add_acquisition(ImageSeries(name=f"movie{index}", data=iterator, unit="na", rate=1.0))
+
+        # The second movie is decoded while the first one still is, rather than once it has been written
+        self.assertEqual([len(times) for times in decode_times.values()], [5, 5])
+        self.assertLess(decode_times[movie_files[1]][0][0], decode_times[movie_files[0]][-1][1])
+        with NWBHDF5IO(path=self.nwbfile_path, mode="r") as io:
+            acquisition = io.read().acquisition
+            assert_array_equal(acquisition["movie0"].data[:], acquisition["movie1"].data[:])
+
     def test_small_buffer_size(self):
         frame_size_mb = np.prod(self.frame_shape) / 1e6
         buffer_size = frame_size_mb / 1e3 / 2
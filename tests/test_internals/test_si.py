@@ -1,7 +1,10 @@
 import unittest
+import warnings
 from unittest.mock import Mock
 from pathlib import Path
 from datetime import datetime
+from shutil import rmtree
+from tempfile import mkdtemp
 
 import psutil
 import numpy as np
@@ -23,12 +26,17 @@ from neuroconv.tools.spikeinterface import (
     check_if_recording_traces_fit_into_memory,
     add_electrodes,
     add_electrical_series,
+    add_multiple_electrical_series,
     add_units_table,
 )
 from neuroconv.tools.spikeinterface.spikeinterfacerecordingdatachunkiterator import (
     SpikeInterfaceRecordingDataChunkIterator,
 )
-from neuroconv.tools.nwb_helpers import get_module
+from neuroconv.tools.spikeinterface.fanoutrecordings import DecimatedRecording
+from neuroconv.tools.spikeinterface.spikeinterface import _get_electrode_id_to_row
+from neuroconv.tools.hdmf import HAVE_HDMF_ZARR, DirectChunkWriteH5DataIO
+from neuroconv.tools.memory_budget import get_memory_budget, set_memory_budget
+from neuroconv.tools.nwb_helpers import get_module, make_or_load_nwbfile
 
 testing_session_time = datetime.now().astimezone()
 
@@ -109,6 +117,40 @@ class TestAddElectricalSeriesWriting(unittest.TestCase):
         expected_data = self.test_recording_extractor.get_traces(segment_index=0)
         np.testing.assert_array_almost_equal(expected_data, extracted_data)
 
+    def test_electrode_region_of_appended_stream(self):
+        channel_ids = self.test_recording_extractor.get_channel_ids()
+        offset_recording = self.test_recording_extractor.channel_slice(
+            channel_ids=channel_ids, renamed_channel_ids=channel_ids + 2
+        )
+
+        add_electrical_series(recording=self.test_recording_extractor, nwbfile=self.nwbfile, iterator_type=None)
+        self.nwbfile.add_electrode(
+            id=10,
+            group=self.nwbfile.electrodes["group"][0],
+            location="unknown",
+            x=np.nan,
+            y=np.nan,
+            z=np.nan,
+            imp=-1.0,
+            filtering="none",
+            group_name="0",
+            rel_x=0.0,
+            rel_y=0.0,
+            channel_name="10",
+        )
+        add_electrical_series(recording=offset_recording, nwbfile=self.nwbfile, write_as="lfp", iterator_type=None)
+
+        self.assertListEqual(list(self.nwbfile.electrodes.id.data), [0, 1, 2, 10, 3, 4])
+        lfp_electrical_series = self.nwbfile.processing["ecephys"]["LFP"]["ElectricalSeries_lfp"]
+        self.assertListEqual(list(lfp_electrical_series.electrodes.data), [2, 4, 5])
+
+    def test_electrode_rows_of_table_modified_in_place(self):
+        add_electrical_series(recording=self.test_recording_extractor, nwbfile=self.nwbfile, iterator_type=None)
+        self.assertDictEqual(_get_electrode_id_to_row(nwbfile=self.nwbfile), {0: 0, 1: 1, 2: 2})
+
+        self.nwbfile.electrodes.id.data[:] = [2, 1, 0]
+        self.assertDictEqual(_get_electrode_id_to_row(nwbfile=self.nwbfile), {2: 0, 1: 1, 0: 2})
+
     def test_invalid_write_as_argument_assertion(self):
 
         write_as = "any_other_string_that_is_not_raw_lfp_or_processed"
@@ -149,6 +191,15 @@ class TestAddElectricalSeriesWriting(unittest.TestCase):
         assert compression_parameters["compression"] == compression
         assert "compression_opts" not in compression_parameters
 
+    def test_write_with_automatic_compression(self):
+        add_electrical_series(recording=self.test_recording_extractor, nwbfile=self.nwbfile, compression="auto")
+
+        electrical_series = self.nwbfile.acquisition["ElectricalSeries_raw"]
+        codec_selection = electrical_series.data.codec_selection
+        self.assertIn(codec_selection["name"], [candidate["name"] for candidate in codec_selection["candidates"]])
+        compression_parameters = electrical_series.data.get_io_params()
+        assert compression_parameters["compression"] == codec_selection["data_io_kwargs"]["compression"]
+
 
 class TestAddElectricalSeriesSavingTimestampsVsRates(unittest.TestCase):
     @classmethod
@@ -342,6 +393,23 @@ class TestAddElectricalSeriesVoltsScaling(unittest.TestCase):
         traces_data_in_volts = traces_data_in_micro_volts * 1e-6
         np.testing.assert_array_almost_equal(data_in_volts, traces_data_in_volts)
 
+    def test_write_scaled(self):
+        traces = np.arange(self.num_frames * self.num_channels, dtype="int16").reshape(self.num_frames, -1)
+        recording = NumpyRecording(traces_list=[traces], sampling_frequency=self.sampling_frequency)
+        recording.set_channel_gains(gains=self.gains_variable)
+        recording.set_channel_offsets(offsets=self.offsets_uniform)
+
+        add_electrical_series(recording=recording, nwbfile=self.nwbfile, write_scaled=True)
+
+        electrical_series = self.nwbfile.acquisition["ElectricalSeries_raw"]
+        data_chunk_iterator = electrical_series.data.data
+        self.assertEqual(data_chunk_iterator.dtype, np.dtype("float32"))
+        extracted_data = np.concatenate([data_chunk.data for data_chunk in data_chunk_iterator])
+        self.assertEqual(extracted_data.dtype, np.dtype("float32"))
+        np.testing.assert_array_almost_equal(extracted_data, traces * self.gains_variable + self.offsets_uniform[0])
+        self.assertIsNone(electrical_series.channel_conversion)
+        self.assertEqual(electrical_series.offset, 0.0)
+
     def test_variable_offsets_assertion(self):
 
         gains = self.gains_default
@@ -411,6 +479,95 @@ class TestAddElectricalSeriesChunking(unittest.TestCase):
 
         assert electrical_series_data_iterator.chunk_shape == iterator_opts["chunk_shape"]
 
+    def test_prefetching_iterator(self):
+        iterator_opts = dict(buffer_shape=(10, 3), chunk_shape=(5, 3), prefetch_buffers=2)
+        add_electrical_series(
+            recording=self.test_recording_extractor, nwbfile=self.nwbfile, iterator_opts=iterator_opts
+        )
+
+        electrical_series_data_iterator = self.nwbfile.acquisition["ElectricalSeries_raw"].data.data
+        assert electrical_series_data_iterator.prefetch_buffers == 2
+
+        extracted_data = np.concatenate([data_chunk.data for data_chunk in electrical_series_data_iterator])
+        expected_data = self.test_recording_extractor.get_traces(segment_index=0)
+        np.testing.assert_array_almost_equal(expected_data, extracted_data)
+
+    def test_default_buffers_span_all_channels(self):
+        iterator = SpikeInterfaceRecordingDataChunkIterator(
+            recording=self.test_recording_extractor, chunk_shape=(2, 1), buffer_gb=8 * 3 * 4 / 1e9
+        )
+        assert iterator.buffer_shape == (4, 3)
+
+    def test_channel_split_buffers_read_each_time_block_once(self):
+        recording = NumpyRecording(self.traces_list, self.sampling_frequency, channel_ids=self.channel_ids)
+        recording_segment = recording._recording_segments[0]
+        read_frame_ranges = list()
+        get_traces = recording_segment.get_traces
+
+        def counted_get_traces(start_frame=None, end_frame=None, channel_indices=None):
+            read_frame_ranges.append((start_frame, end_frame))
+            return get_traces(start_frame=start_frame, end_frame=end_frame, channel_indices=channel_indices)
+
+        recording_segment.get_traces = counted_get_traces
+        iterator = SpikeInterfaceRecordingDataChunkIterator(
+            recording=recording, buffer_shape=(10, 1), chunk_shape=(5, 1)
+        )
+
+        extracted_data = np.zeros(shape=(self.num_frames, self.num_channels))
+        for data_chunk in iterator:
+            extracted_data[data_chunk.selection] = data_chunk.data
+        np.testing.assert_array_equal(extracted_data, self.traces_list[0])
+        assert read_frame_ranges == [(0, 10), (10, 20)]
+
+    def test_time_blocks_beyond_the_planned_buffers_are_not_cached(self):
+        # A single row of chunks across all channels exceeds the buffer, so the buffers split the channels
+        iterator = SpikeInterfaceRecordingDataChunkIterator(
+            recording=self.test_recording_extractor, chunk_shape=(10, 1), buffer_gb=8 * 20 / 1e9
+        )
+        self.assertLess(iterator.buffer_shape[1], self.num_channels)
+
+        extracted_data = np.zeros(shape=(self.num_frames, self.num_channels))
+        for data_chunk in iterator:
+            self.assertIsNone(iterator._cached_time_block)
+            extracted_data[data_chunk.selection] = data_chunk.data
+        np.testing.assert_array_equal(extracted_data, self.traces_list[0])
+
+    def test_cached_time_blocks_are_reserved_from_the_memory_budget(self):
+        iterator = SpikeInterfaceRecordingDataChunkIterator(
+            recording=self.test_recording_extractor, buffer_shape=(10, 1), chunk_shape=(5, 1)
+        )
+        next(iterator)
+        time_block_bytes = 10 * self.num_channels * 8
+        self.assertEqual(iterator._cached_time_block[2].nbytes, time_block_bytes)
+        self.assertEqual(get_memory_budget().get_usage()["reserved_bytes"], time_block_bytes + 10 * 8)
+        iterator.close()
+        self.assertEqual(get_memory_budget().get_usage()["reserved_bytes"], 0)
+
+        set_memory_budget(total_gb=20 * 8 / 1e9)  # room for the buffers, but not for a time block
+        try:
+            iterator = SpikeInterfaceRecordingDataChunkIterator(
+                recording=self.test_recording_extractor, buffer_shape=(10, 1), chunk_shape=(5, 1)
+            )
+            next(iterator)
+            self.assertIsNone(iterator._cached_time_block)
+        finally:
+            set_memory_budget()
+
+    def test_parallel_compression(self):
+        iterator_opts = dict(buffer_shape=(10, 3), chunk_shape=(5, 3))
+        add_electrical_series(
+            recording=self.test_recording_extractor,
+            nwbfile=self.nwbfile,
+            iterator_opts=iterator_opts,
+            compression_opts=6,
+            number_of_jobs=2,
+        )
+
+        h5dataiowrapped_electrical_series = self.nwbfile.acquisition["ElectricalSeries_raw"].data
+        assert isinstance(h5dataiowrapped_electrical_series, DirectChunkWriteH5DataIO)
+        assert h5dataiowrapped_electrical_series.number_of_jobs == 2
+        assert h5dataiowrapped_electrical_series.io_settings["compression_opts"] == 6
+
     def test_hdfm_iterator(self):
 
         add_electrical_series(recording=self.test_recording_extractor, nwbfile=self.nwbfile, iterator_type="v1")
@@ -534,6 +691,98 @@ class TestWriteRecording(unittest.TestCase):
         expected_data = self.multiple_segment_recording_extractor.get_traces(segment_index=1)
         np.testing.assert_array_almost_equal(expected_data, extracted_data)
 
+    @unittest.skipIf(not HAVE_HDMF_ZARR, reason="The Zarr backend requires hdmf-zarr!")
+    def test_write_zarr_backend_with_concurrent_writers(self):
+        from hdmf_zarr.nwb import NWBZarrIO
+
+        recording = generate_recording(sampling_frequency=1000.0, num_channels=self.num_channels, durations=[3.0])
+        nwbfile_path = Path(mkdtemp()) / "test_write_zarr_backend.nwb.zarr"
+        write_recording(
+            recording=recording,
+            nwbfile_path=nwbfile_path,
+            metadata=dict(NWBFile=dict(session_start_time=testing_session_time)),
+            iterator_opts=dict(buffer_shape=(500, 3), chunk_shape=(100, 3)),
+            compression_opts=6,
+            number_of_jobs=2,
+            backend="zarr",
+        )
+
+        with NWBZarrIO(path=str(nwbfile_path), mode="r") as io:
+            nwbfile = io.read()
+            np.testing.assert_array_equal(nwbfile.acquisition["ElectricalSeries_raw"].data[:], recording.get_traces())
+        rmtree(nwbfile_path.parent)
+
+
+class TestAddMultipleElectricalSeries(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.traces = (np.random.randn(20000, 4) * 100).astype("int16")
+        self.recording = NumpyRecording(traces_list=[self.traces], sampling_frequency=3000.0)
+        self.recording.set_channel_gains([0.5] * 4)
+        self.recording.set_channel_offsets([0.0] * 4)
+        self.tmpdir = Path(mkdtemp())
+
+    def tearDown(self):
+        rmtree(self.tmpdir)
+
+    def test_single_read_of_each_time_block(self):
+        recording_segment = self.recording._recording_segments[0]
+        read_frames = list()
+        get_traces = recording_segment.get_traces
+
+        def counted_get_traces(start_frame=None, end_frame=None, channel_indices=None):
+            read_frames.append(end_frame - start_frame)
+            return get_traces(start_frame=start_frame, end_frame=end_frame, channel_indices=channel_indices)
+
+        recording_segment.get_traces = counted_get_traces
+        chunking = dict(chunk_shape=(100, 4))
+        metadata = dict(
+            NWBFile=dict(session_start_time=testing_session_time),
+            Ecephys=dict(ElectricalSeriesScaled=dict(name="ElectricalSeriesScaled")),
+        )
+        nwbfile_path = self.tmpdir / "test_single_read_of_each_time_block.nwb"
+        with make_or_load_nwbfile(nwbfile_path=nwbfile_path, metadata=metadata, verbose=False) as nwbfile:
+            add_multiple_electrical_series(
+                recording=self.recording,
+                nwbfile=nwbfile,
+                metadata=metadata,
+                outputs=[
+                    dict(write_as="raw", iterator_opts=chunking),
+                    dict(write_as="lfp", decimation_factor=10, iterator_opts=chunking),
+                    dict(
+                        write_as="processed",
+                        es_key="ElectricalSeriesScaled",
+                        write_scaled=True,
+                        iterator_opts=chunking,
+                    ),
+                ],
+                block_gb=1e-6,
+            )
+
+        self.assertEqual(len(read_frames), 20)
+        self.assertEqual(sum(read_frames), self.traces.shape[0])
+        with NWBHDF5IO(path=str(nwbfile_path), mode="r") as io:
+            nwbfile = io.read()
+            np.testing.assert_array_equal(nwbfile.acquisition["ElectricalSeries_raw"].data[:], self.traces)
+            lfp_electrical_series = nwbfile.processing["ecephys"]["LFP"]["ElectricalSeries_lfp"]
+            self.assertEqual(lfp_electrical_series.rate, 300.0)
+            self.assertEqual(lfp_electrical_series.data.shape, (2000, 4))
+            scaled_electrical_series = nwbfile.processing["ecephys"]["Processed"]["ElectricalSeriesScaled"]
+            np.testing.assert_array_almost_equal(scaled_electrical_series.data[:], self.traces * 0.5)
+
+    def test_decimated_traces_independent_of_requested_frames(self):
+        decimated_recording = DecimatedRecording(recording=self.recording, decimation_factor=10)
+        traces = decimated_recording.get_traces()
+        traces_in_pieces = np.concatenate(
+            [decimated_recording.get_traces(start_frame=start, end_frame=start + 37) for start in range(0, 2000, 37)]
+        )
+        np.testing.assert_array_equal(traces, traces_in_pieces)
+
+        # A constant signal is preserved by the low-pass filter, including at the padded edges
+        constant_recording = NumpyRecording(traces_list=[np.full((1000, 2), 7.0)], sampling_frequency=3000.0)
+        decimated_constant = DecimatedRecording(recording=constant_recording, decimation_factor=10).get_traces()
+        np.testing.assert_array_almost_equal(decimated_constant, np.full((100, 2), 7.0), decimal=2)
+
 
 class TestAddElectrodes(TestCase):
     @classmethod
@@ -616,6 +865,21 @@ class TestAddElectrodes(TestCase):
         expected_properties_in_electrodes_table = ["value_1", "value_1", "value_1", "value_1", "value_2", "value_2"]
         self.assertListEqual(actual_properties_in_electrodes_table, expected_properties_in_electrodes_table)
 
+    def test_many_channels_extension(self):
+        """Append a recording with many channels, half of them already in the table, and a numeric property."""
+        recording = generate_recording(num_channels=1000, durations=[0.01])
+        channel_ids = recording.get_channel_ids()
+        recording.set_property(key="numeric_property", values=np.arange(1000))
+        offset_recording = recording.channel_slice(channel_ids=channel_ids, renamed_channel_ids=channel_ids + 500)
+
+        add_electrodes(recording=recording, nwbfile=self.nwbfile)
+        add_electrodes(recording=offset_recording, nwbfile=self.nwbfile)
+
+        self.assertListEqual(list(self.nwbfile.electrodes.id.data), list(range(1500)))
+        self.assertListEqual(list(self.nwbfile.electrodes["channel_name"].data), [str(id) for id in range(1500)])
+        expected_numeric_property = np.concatenate([np.arange(1000), np.arange(500, 1000)])
+        np.testing.assert_array_equal(self.nwbfile.electrodes["numeric_property"].data, expected_numeric_property)
+
     def test_new_property_addition(self):
         """Add a property only available in a second recording."""
         self.recording_2.set_property(key="added_property", values=["added_value"] * self.num_channels)
@@ -792,6 +1056,28 @@ class TestAddUnitsTable(TestCase):
         unit_names_in_units_table = list(self.nwbfile.units["unit_name"].data)
         self.assertListEqual(unit_names_in_units_table, expected_unit_names_in_units_table)
 
+    def test_no_warnings_on_new_units_table(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            add_units_table(sorting=self.sorting_1, nwbfile=self.nwbfile)
+
+        for unit_index, unit_id in enumerate(self.sorting_1.get_unit_ids()):
+            np.testing.assert_array_equal(
+                self.nwbfile.units["spike_times"][unit_index],
+                self.sorting_1.get_unit_spike_train(unit_id=unit_id, return_times=True),
+            )
+
+    def test_spike_times_across_appends(self):
+        """The spike times of every unit, including those appended to an existing table, match the sorting."""
+        add_units_table(sorting=self.sorting_1, nwbfile=self.nwbfile)
+        add_units_table(sorting=self.sorting_2, nwbfile=self.nwbfile)
+
+        expected_spike_times = [self.sorting_1.get_unit_spike_train(unit_id=id, return_times=True) for id in "abcd"]
+        expected_spike_times += [self.sorting_2.get_unit_spike_train(unit_id=id, return_times=True) for id in "ef"]
+        self.assertEqual(len(self.nwbfile.units), 6)
+        for unit_index, unit_spike_times in enumerate(expected_spike_times):
+            np.testing.assert_array_equal(self.nwbfile.units["spike_times"][unit_index], unit_spike_times)
+
     def test_integer_unit_names_overwrite(self):
         """Ensure unit names merge correctly after appending when unit names are integers."""
         unit_ids = self.base_sorting.get_unit_ids()
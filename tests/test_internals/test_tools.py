@@ -9,6 +9,7 @@ import pytest
 from pynwb import NWBHDF5IO, ProcessingModule, TimeSeries
 from hdmf.testing import TestCase
 
+from neuroconv.tools.hdmf import HAVE_HDMF_ZARR
 from neuroconv.tools.nwb_helpers import (
     get_module,
     make_nwbfile_from_metadata,
@@ -317,6 +318,28 @@ class TestMakeOrLoadNWBFile(TestCase):
             assert "test1" in nwbfile_out.acquisition
             assert "test2" in nwbfile_out.acquisition
 
+    @unittest.skipIf(not HAVE_HDMF_ZARR, reason="The Zarr backend requires hdmf-zarr!")
+    def test_make_or_load_nwbfile_zarr_append(self):
+        from hdmf_zarr.nwb import NWBZarrIO
+
+        nwbfile_path = self.tmpdir / "test_make_or_load_nwbfile_zarr_append.nwb.zarr"
+        with make_or_load_nwbfile(
+            nwbfile_path=nwbfile_path, metadata=self.metadata, overwrite=True, backend="zarr"
+        ) as nwbfile:
+            nwbfile.add_acquisition(self.time_series_1)
+        with make_or_load_nwbfile(nwbfile_path=nwbfile_path, backend="zarr", number_of_jobs=2) as nwbfile:
+            nwbfile.add_acquisition(self.time_series_2)
+        assert nwbfile_path.is_dir()
+        with NWBZarrIO(path=str(nwbfile_path), mode="r") as io:
+            nwbfile_out = io.read()
+            assert "test1" in nwbfile_out.acquisition
+            assert "test2" in nwbfile_out.acquisition
+
+    def test_make_or_load_nwbfile_backend_assertion(self):
+        with self.assertRaisesWith(exc_type=AssertionError, exc_msg="backend (n5) must be one of ['hdf5', 'zarr']!"):
+            with make_or_load_nwbfile(metadata=self.metadata, backend="n5"):
+                pass
+
     def test_make_or_load_nwbfile_pass_nwbfile(self):
         nwbfile_path = self.tmpdir / "test_make_or_load_nwbfile_pass_nwbfile.nwb"
         nwbfile_in = make_nwbfile_from_metadata(metadata=self.metadata)
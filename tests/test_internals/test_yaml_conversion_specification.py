@@ -0,0 +1,142 @@
+import multiprocessing
+from pathlib import Path
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import skipIf
+
+import numpy as np
+import yaml
+from hdmf.testing import TestCase
+from pynwb import NWBHDF5IO, TimeSeries
+
+import neuroconv
+from neuroconv import run_conversion_from_yaml
+from neuroconv.basedatainterface import BaseDataInterface
+from neuroconv.tools.yaml_conversion_specification.yaml_conversion_specification import (
+    MANIFEST_FILE_NAME,
+    _get_dandi_naming_metadata,
+)
+from neuroconv.utils import FilePathType, load_dict_from_file
+
+
+class ToyTimeSeriesInterface(BaseDataInterface):
+    """Adds the numbers of a text file as a TimeSeries."""
+
+    def __init__(self, file_path: FilePathType):
+        super().__init__(file_path=file_path)
+
+    def run_conversion(self, nwbfile, metadata: dict):
+        data = np.loadtxt(self.source_data["file_path"])
+        nwbfile.add_acquisition(TimeSeries(name="ToyTimeSeries", data=data, unit="a.u.", rate=1.0))
+
+
+class TestRunConversionFromYaml(TestCase):
+    def setUp(self):
+        self.data_folder_path = Path(mkdtemp())
+        self.output_folder_path = Path(mkdtemp())
+        self.specification_file_path = self.data_folder_path / "specification.yml"
+        for session_index in range(3):
+            np.savetxt(self.data_folder_path / f"session_{session_index}.txt", np.arange(10) + session_index)
+        neuroconv.ToyTimeSeriesInterface = ToyTimeSeriesInterface  # found by name, like the interfaces of neuroconv
+
+    def tearDown(self):
+        del neuroconv.ToyTimeSeriesInterface
+        rmtree(self.data_folder_path)
+        rmtree(self.output_folder_path)
+
+    def _write_specification(self, file_names: list, named: bool = True):
+        sessions = [
+            dict(
+                source_data=dict(ToyTimeSeriesInterface=dict(file_path=file_name)),
+                metadata=dict(
+                    NWBFile=dict(
+                        session_start_time=f"2020-10-0{session_index + 1}T12:00:00+00:00", session_id=str(session_index)
+                    ),
+                    Subject=dict(subject_id="mouse1", species="Mus musculus", sex="U"),
+                ),
+            )
+            for session_index, file_name in enumerate(file_names)
+        ]
+        if named:
+            for session_index, session in enumerate(sessions):
+                session.update(nwbfile_name=f"session_{session_index}")
+        specification = dict(
+            data_interfaces=["ToyTimeSeriesInterface"], experiments=dict(toy_experiment=dict(sessions=sessions))
+        )
+        with open(file=self.specification_file_path, mode="w") as file:
+            yaml.safe_dump(specification, file)
+
+    def _run_conversion(self, **kwargs):
+        run_conversion_from_yaml(
+            specification_file_path=self.specification_file_path,
+            data_folder_path=self.data_folder_path,
+            output_folder_path=self.output_folder_path,
+            overwrite=True,
+            **kwargs,
+        )
+
+    def test_unnamed_sessions_are_named_from_their_metadata(self):
+        self._write_specification(file_names=["session_0.txt", "session_1.txt"], named=False)
+        self._run_conversion()
+
+        nwbfile_names = sorted(nwbfile_path.name for nwbfile_path in self.output_folder_path.glob("*.nwb"))
+        self.assertEqual(nwbfile_names, ["sub-mouse1_ses-0.nwb", "sub-mouse1_ses-1.nwb"])
+        manifest = load_dict_from_file(file_path=self.output_folder_path / MANIFEST_FILE_NAME)
+        self.assertEqual(
+            sorted(Path(manifest_entry["nwbfile_path"]).name for manifest_entry in manifest.values()), nwbfile_names
+        )
+
+    def test_dandi_naming_metadata_matches_dandi(self):
+        from dandi.metadata import get_metadata
+
+        self._write_specification(file_names=["session_0.txt"])
+        self._run_conversion()
+        nwbfile_path = self.output_folder_path / "session_0.nwb"
+        with NWBHDF5IO(path=str(nwbfile_path), mode="r") as io:
+            dandi_metadata = _get_dandi_naming_metadata(nwbfile=io.read())
+
+        expected_dandi_metadata = get_metadata(nwbfile_path)
+        for field in ["session_id", "subject_id", "species", "sex"]:
+            self.assertEqual(dandi_metadata[field], expected_dandi_metadata[field])
+
+    def test_number_of_jobs_assertion(self):
+        self._write_specification(file_names=["session_0.txt"])
+        with self.assertRaisesWith(AssertionError, exc_msg="number_of_jobs (0) must be positive or -1!"):
+            self._run_conversion(number_of_jobs=0)
+        self.assertEqual(list(self.output_folder_path.iterdir()), [])
+
+    def test_unchanged_sessions_are_skipped(self):
+        self._write_specification(file_names=["session_0.txt", "session_1.txt"])
+        self._run_conversion()
+        modification_times = {
+            nwbfile_path.name: nwbfile_path.stat().st_mtime_ns for nwbfile_path in self.output_folder_path.glob("*.nwb")
+        }
+        self.assertEqual(set(modification_times), {"session_0.nwb", "session_1.nwb"})
+
+        np.savetxt(self.data_folder_path / "session_1.txt", np.arange(20))
+        self._run_conversion()
+        self.assertEqual(
+            (self.output_folder_path / "session_0.nwb").stat().st_mtime_ns, modification_times["session_0.nwb"]
+        )
+        with NWBHDF5IO(path=str(self.output_folder_path / "session_1.nwb"), mode="r") as io:
+            np.testing.assert_array_equal(io.read().acquisition["ToyTimeSeries"].data[:], np.arange(20))
+
+        self._run_conversion(force=True)
+        self.assertNotEqual(
+            (self.output_folder_path / "session_0.nwb").stat().st_mtime_ns, modification_times["session_0.nwb"]
+        )
+
+    @skipIf(multiprocessing.get_start_method() != "fork", reason="The workers must inherit the toy interface!")
+    def test_failed_session_does_not_stop_the_others(self):
+        self._write_specification(file_names=["session_0.txt", "missing.txt", "session_2.txt"])
+        with self.assertRaisesWith(RuntimeError, exc_msg="1 of 3 sessions failed to convert: session_1.nwb!"):
+            self._run_conversion(number_of_jobs=2)
+
+        for session_index in [0, 2]:
+            with NWBHDF5IO(path=str(self.output_folder_path / f"session_{session_index}.nwb"), mode="r") as io:
+                nwbfile = io.read()
+                np.testing.assert_array_equal(
+                    nwbfile.acquisition["ToyTimeSeries"].data[:], np.arange(10) + session_index
+                )
+        self.assertFalse((self.output_folder_path / "session_1.nwb").exists())
+        self.assertIn("missing.txt", (self.output_folder_path / "logs" / "session_1.log").read_text())
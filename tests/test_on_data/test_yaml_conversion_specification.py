@@ -4,6 +4,8 @@ from pathlib import Path
 from jsonschema import validate, RefResolver
 from datetime import datetime
 
+import yaml
+
 from hdmf.testing import TestCase
 from pynwb import NWBHDF5IO
 
@@ -67,6 +69,81 @@ class TestYAMLConversionSpecification(TestCase):
             assert nwbfile.subject.subject_id == "Subject Name"
             assert "spike_times" in nwbfile.units
 
+    def test_run_conversion_from_yaml_with_parallel_sessions(self):
+        self.test_folder = self.test_folder / "test_parallel_sessions"
+        self.test_folder.mkdir(exist_ok=True)
+        path_to_test_yml_files = Path(__file__).parent / "conversion_specifications"
+        yaml_file_path = path_to_test_yml_files / "GIN_conversion_specification.yml"
+        run_conversion_from_yaml(
+            specification_file_path=yaml_file_path,
+            data_folder_path=DATA_PATH,
+            output_folder_path=self.test_folder,
+            overwrite=True,
+            number_of_jobs=2,
+        )
+
+        for session_number, subject_id in zip([1, 2, 3], ["1", "002", "Subject Name"]):
+            assert (self.test_folder / "logs" / f"example_converter_spec_{session_number}.log").exists()
+            with NWBHDF5IO(path=self.test_folder / f"example_converter_spec_{session_number}.nwb", mode="r") as io:
+                nwbfile = io.read()
+                assert nwbfile.lab == "My Lab"
+                assert nwbfile.subject.subject_id == subject_id
+
+    def test_run_conversion_from_yaml_with_parallel_sessions_isolates_failures(self):
+        self.test_folder = self.test_folder / "test_parallel_sessions_failure"
+        self.test_folder.mkdir(exist_ok=True)
+        specification = load_dict_from_file(
+            file_path=Path(__file__).parent / "conversion_specifications" / "GIN_conversion_specification.yml"
+        )
+        specification["experiments"]["ymaze"]["sessions"][1]["source_data"]["SpikeGLXLFPInterface"][
+            "file_path"
+        ] = "spikeglx/not_a_file.lf.bin"
+        yaml_file_path = self.test_folder / "conversion_specification_with_missing_file.yml"
+        with open(file=yaml_file_path, mode="w") as file:
+            yaml.dump(specification, file)
+
+        with self.assertRaisesWith(
+            exc_type=RuntimeError, exc_msg="1 of 3 sessions failed to convert: example_converter_spec_2.nwb!"
+        ):
+            run_conversion_from_yaml(
+                specification_file_path=yaml_file_path,
+                data_folder_path=DATA_PATH,
+                output_folder_path=self.test_folder,
+                overwrite=True,
+                number_of_jobs=2,
+            )
+        assert (self.test_folder / "example_converter_spec_1.nwb").exists()
+        assert not (self.test_folder / "example_converter_spec_2.nwb").exists()
+        assert (self.test_folder / "example_converter_spec_3.nwb").exists()
+        assert "Traceback" in (self.test_folder / "logs" / "example_converter_spec_2.log").read_text()
+
+    def test_run_conversion_from_yaml_skips_unchanged_sessions(self):
+        self.test_folder = self.test_folder / "test_skip_unchanged_sessions"
+        self.test_folder.mkdir(exist_ok=True)
+        yaml_file_path = Path(__file__).parent / "conversion_specifications" / "GIN_conversion_specification.yml"
+        conversion_options = dict(
+            specification_file_path=yaml_file_path,
+            data_folder_path=DATA_PATH,
+            output_folder_path=self.test_folder,
+            overwrite=True,
+        )
+        run_conversion_from_yaml(**conversion_options)
+        manifest = load_dict_from_file(file_path=self.test_folder / "neuroconv_manifest.json")
+        assert set(manifest) == {f"example_converter_spec_{session_number}" for session_number in [1, 2, 3]}
+        nwbfile_paths = [
+            self.test_folder / f"example_converter_spec_{session_number}.nwb" for session_number in [1, 2, 3]
+        ]
+        modification_times = [nwbfile_path.stat().st_mtime_ns for nwbfile_path in nwbfile_paths]
+
+        run_conversion_from_yaml(**conversion_options)
+        assert [nwbfile_path.stat().st_mtime_ns for nwbfile_path in nwbfile_paths] == modification_times
+
+        run_conversion_from_yaml(**conversion_options, force=True)
+        assert all(
+            nwbfile_path.stat().st_mtime_ns > modification_time
+            for nwbfile_path, modification_time in zip(nwbfile_paths, modification_times)
+        )
+
     def test_run_conversion_from_yaml_default_nwbfile_name(self):
         self.test_folder = self.test_folder / "test_organize"
         self.test_folder.mkdir(exist_ok=True)
@@ -103,6 +180,30 @@ class TestYAMLConversionSpecification(TestCase):
             assert nwbfile.subject.subject_id == "Subject Name"
             assert "spike_times" in nwbfile.units
 
+    def test_run_conversion_from_yaml_default_nwbfile_name_ignores_other_files(self):
+        self.test_folder = self.test_folder / "test_organize_other_files"
+        self.test_folder.mkdir(exist_ok=True)
+        (self.test_folder / "not_from_this_conversion.nwb").write_text(
+            "Not an NWBFile; the renaming should not open it."
+        )
+        path_to_test_yml_files = Path(__file__).parent / "conversion_specifications"
+        yaml_file_path = path_to_test_yml_files / "GIN_conversion_specification_missing_nwbfile_names.yml"
+        run_conversion_from_yaml(
+            specification_file_path=yaml_file_path,
+            data_folder_path=DATA_PATH,
+            output_folder_path=self.test_folder,
+            overwrite=True,
+        )
+
+        assert (self.test_folder / "sub-Mouse_1_ses-20201009T211909.nwb").exists()
+        assert (self.test_folder / "example_defined_name.nwb").exists()
+        assert (self.test_folder / "sub-Subject_Name_ses-20201011T211909.nwb").exists()
+        manifest = load_dict_from_file(file_path=self.test_folder / "neuroconv_manifest.json")
+        assert manifest["temp_nwbfile_name_1"]["dandi_metadata"]["subject_id"] == "Mouse 1"
+        assert manifest["temp_nwbfile_name_1"]["nwbfile_path"] == str(
+            self.test_folder / "sub-Mouse_1_ses-20201009T211909.nwb"
+        )
+
     def test_run_conversion_from_yaml_no_nwbfile_name_or_other_metadata_assertion(self):
         self.test_folder = self.test_folder / "test_organize_no_nwbfile_name_or_other_metadata"
         self.test_folder.mkdir(exist_ok=True)